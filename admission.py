@@ -0,0 +1,174 @@
+"""
+Admission control for /run.
+
+Two checks run before a submission is queued:
+
+* A global cap on in-flight executions (queued + running jobs, as counted
+  by the job queue, so it covers every gunicorn worker). Counting and
+  inserting aren't one transaction, so concurrent requests can overshoot
+  the cap by at most the number of request threads.
+* A token bucket per user: ``RUN_BURST`` runs straight away, refilled at
+  ``RUN_RATE_PER_MINUTE``. Buckets live in a small SQLite file shared by
+  the workers on the box, updated under ``BEGIN IMMEDIATE``.
+
+A rejected request gets ``Overloaded`` with the number of seconds to wait,
+which /run turns into a 429 with ``Retry-After``; nothing waits on the
+server. An admitted run that then can't be queued gets its token back
+(``refund``). If the SQLite file is unusable the bucket check fails open.
+"""
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+RATE_PER_MINUTE = float(os.getenv("RUN_RATE_PER_MINUTE", "20"))  # token refill per user; 0 disables buckets
+BURST = int(os.getenv("RUN_BURST", "5"))                         # bucket size
+MAX_IN_FLIGHT = int(os.getenv("RUN_MAX_IN_FLIGHT", "32"))        # queued + running jobs; 0 = no cap
+ADMISSION_PATH = os.getenv("ADMISSION_PATH", os.path.join(tempfile.gettempdir(), "dynocode-admission.db"))
+OVERLOAD_RETRY_AFTER = 2  # seconds suggested when the global cap is hit
+IDLE_BUCKET_TTL = 3600    # full buckets untouched this long are deleted
+PRUNE_EVERY = 500         # bucket writes between sweeps
+
+
+class Overloaded(Exception):
+    """Raised when a run is not admitted; ``retry_after`` is in whole seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, rate_per_minute=RATE_PER_MINUTE, burst=BURST,
+                 max_in_flight=MAX_IN_FLIGHT, path=ADMISSION_PATH):
+        self.rate = rate_per_minute / 60  # tokens per second
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " user_id INTEGER PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _count(self, conn, name):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def _take_token(self, user_id):
+        """Consume one of the user's tokens; returns seconds until one is available, or 0."""
+        now = time.time()
+        conn = self._db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+
+            wait = 0
+            if tokens >= 1:
+                tokens -= 1
+                self._count(conn, "admitted")
+            else:
+                wait = max(1, math.ceil((1 - tokens) / self.rate))
+                self._count(conn, "rate_limited")
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (user_id, tokens, updated) VALUES (?, ?, ?)",
+                (user_id, tokens, now)
+            )
+
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 0:
+                # Untouched for an hour means refilled long ago; a new row starts full anyway
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - IDLE_BUCKET_TTL,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def refund(self, user_id):
+        """Give back the token taken by ``admit`` for a run that was never queued."""
+        if self.rate <= 0:
+            return
+        try:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE buckets SET tokens = MIN(?, tokens + 1) WHERE user_id = ?",
+                    (self.burst, user_id)
+                )
+                self._count(conn, "refunded")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Admission refund skipped: {e}")
+
+    def admit(self, user_id, in_flight):
+        """Raise Overloaded unless ``user_id`` may queue a run now.
+
+        ``in_flight()`` returns the number of queued and running jobs; it is
+        only called when the global cap is enabled.
+        """
+        if self.max_in_flight > 0 and in_flight() >= self.max_in_flight:
+            try:
+                conn = self._db()
+                self._count(conn, "overloaded")
+            except sqlite3.Error:
+                pass
+            raise Overloaded("The runners are busy right now", OVERLOAD_RETRY_AFTER)
+
+        if self.rate <= 0:
+            return
+        try:
+            wait = self._take_token(user_id)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Admission check skipped: {e}")
+            return
+        if wait:
+            raise Overloaded("Too many runs, slow down a little", wait)
+
+    def stats(self, depth):
+        """Shared rejection counters plus the job queue's ``depth`` ({"queued", "running"})."""
+        try:
+            counters = dict(self._db().execute("SELECT name, value FROM counters").fetchall())
+        except sqlite3.Error:
+            counters = {}
+        return {
+            "rate_per_minute": self.rate * 60,
+            "burst": self.burst,
+            "max_in_flight": self.max_in_flight,
+            "queued": depth["queued"],
+            "running": depth["running"],
+            "admitted": counters.get("admitted", 0),
+            "rate_limited": counters.get("rate_limited", 0),
+            "overloaded": counters.get("overloaded", 0),
+            "refunded": counters.get("refunded", 0),
+        }
+
+
+admission = AdmissionController()
@@ -1,13 +1,27 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, Response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.http import quote_etag
 from functools import wraps
 import json
+import hashlib
 import os
 import logging
+from datetime import datetime
 from dotenv import load_dotenv
-from models import db, Problem, User, Submission
+from models import db, User
 from runner.code_runner import evaluate_code
-from sqlalchemy import func
+from runner.pool import pool_stats
+from runner.remote import service_stats
+from runner import precheck, bundles, languages, stress
+from runner.result_cache import result_cache
+from jobs import create_job_queue, stream_slots
+from admission import admission, Overloaded
+from catalog import catalog, ProblemNotFound
+import progress
+import rankings
+from submission_sink import create_submission_sink
+import metrics
+import static_assets
 
 # Load env variables
 load_dotenv()
@@ -26,6 +40,9 @@ if not database_url:
 
 app.config["SQLALCHEMY_DATABASE_URI"] = database_url
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+if database_url.startswith("sqlite"):
+    # Local runs and bench.py: wait for SQLite's write lock instead of failing with "database is locked"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 30}}
 
 # Initialize DB with App
 db.init_app(app)
@@ -45,6 +62,11 @@ if __name__ != '__main__':
 
 logger = logging.getLogger(__name__)
 
+# Request latency and DB query metrics for /metrics
+metrics.install(app)
+# Fingerprinted, gzipped CSS/JS under /assets/, see static_assets.py
+static_assets.install(app)
+
 # ======================================================
 # AUTH HELPERS
 # ======================================================
@@ -69,43 +91,131 @@ def inject_user():
 # ======================================================
 
 def load_problem(problem_id):
-    """Fetch specific problem from DB."""
-    problem = db.session.get(Problem, problem_id)
-    if not problem:
-        raise Exception(f"Problem {problem_id} not found")
-    # Return as dictionary for compatibility with runner and template
-    return problem.to_dict()
+    """Fetch specific problem for display, without test cases (cached per catalog version)."""
+    # Return as dictionary for compatibility with the template
+    return catalog.problem(problem_id)
+
+def load_problem_for_run(problem_id):
+    """Fetch specific problem including its test cases, for the runner."""
+    return catalog.problem_for_run(problem_id)
 
 def load_problem_index():
-    """Build sidebar from all DB problems."""
-    problems = Problem.query.order_by(Problem.id).all()
-    
-    # Grouping by Difficulty for better UX
-    groups = {}
-    for p in problems:
-        diff = p.difficulty or "Unknown"
-        if diff not in groups:
-            groups[diff] = []
-        
-        groups[diff].append({
-            "id": p.id,
-            "title": p.title,
-            "difficulty": p.difficulty,
-            "tags": p.tags
-        })
+    """Build sidebar from all DB problems (cached per catalog version)."""
+    return catalog.index()
 
-    index = []
-    # Sort order: Easy, Medium, Hard
-    for diff in ["Easy", "Medium", "Hard"]:
-        if diff in groups:
-            index.append({"day": f"{diff} Problems", "problems": groups[diff]})
-            
-    # Add any others
-    for diff in groups:
-        if diff not in ["Easy", "Medium", "Hard"]:
-            index.append({"day": f"{diff} Problems", "problems": groups[diff]})
-            
-    return index
+def mark_solved(sidebar, solved_ids):
+    """Add 'solved' flags and per-group counts to a sidebar copy."""
+    for group in sidebar:
+        group_solved = 0
+        for p in group['problems']:
+            is_solved = (p['id'] in solved_ids)
+            p['solved'] = is_solved
+            if is_solved:
+                group_solved += 1
+
+        group['solved_count'] = group_solved
+        group['total_count'] = len(group['problems'])
+    return sidebar
+
+# ======================================================
+# HTTP CACHING
+# ======================================================
+
+API_VERSION = 1  # bump when the JSON payloads change shape, so old ETags stop matching
+
+def make_etag(*parts):
+    return hashlib.sha256(":".join(str(p) for p in (API_VERSION,) + parts).encode()).hexdigest()[:20]
+
+def problem_etag(problem):
+    """Changes whenever the problem row does (Problem.updated_at)."""
+    return make_etag("problem", problem["id"], problem.get("updated_at"))
+
+def sidebar_etag(user_id):
+    """Changes with the catalog and with the user's progress (user_stats.version)."""
+    return make_etag("sidebar", user_id, catalog.version(), progress.user_stats(user_id)["version"])
+
+def conditional_json(etag, build):
+    """JSON of ``build()`` tagged with ``etag``, or 304 without calling it if the client has that version."""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    # Per-user data behind a login: browsers may keep it, but revalidate every time
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# ======================================================
+# RUN QUEUE
+# ======================================================
+
+def run_verdict(passed, details):
+    """One word for a run's outcome: accepted, or the first failing case's verdict."""
+    if passed:
+        return "accepted"
+    for detail in details:
+        if detail["status"] == "failed":
+            return "wrong_answer"
+        if detail["status"] != "passed":
+            return detail.get("verdict", "error")
+    return "error"
+
+def execute_run(user_id, problem_id, code, on_result=None, language="python"):
+    """Evaluate a submission and record it. Runs on a job queue worker thread."""
+    problem_data = load_problem_for_run(problem_id)
+    compile_info = {}
+
+    cached = result_cache.get(code, problem_data, language)
+    if result_cache.enabled:
+        metrics.RESULT_CACHE.inc(result="miss" if cached is None else "hit")
+    if cached is not None:
+        passed, details = cached
+        logger.info(f"♻️ Cached verdict: {problem_id}")
+        if on_result is not None:
+            for detail in details:
+                on_result(detail)
+    else:
+        passed, details = evaluate_code(
+            code, problem_data, on_result=on_result,
+            language=language, on_compile=compile_info.update
+        )
+        result_cache.put(code, problem_data, passed, details, language)
+
+    metrics.VERDICTS.inc(problem=problem_id, verdict=run_verdict(passed, details), language=language)
+    runtime_ms, memory_kb = rankings.summarise(details)
+    performance = {"runtime_ms": runtime_ms, "memory_kb": memory_kb}
+    if compile_info:
+        performance["compile_ms"] = compile_info["compile_ms"]
+        performance["compile_cached"] = compile_info["cached"]
+
+    # Save Submission (write-behind) and, with the same row, progress; see submission_sink.py
+    status = 'passed' if passed else 'failed'
+    submission_sink.add(
+        user_id, problem_id, code, status, datetime.utcnow(), runtime_ms, memory_kb,
+        None if language == "python" else language, difficulty=problem_data.get("difficulty")
+    )
+    if passed:
+        if cached is None:
+            # A cached verdict repeats measurements that are already counted
+            rankings.record(problem_id, runtime_ms, memory_kb, language)
+    db.session.commit()
+
+    if passed:
+        performance.update(rankings.beats(problem_id, runtime_ms, memory_kb, language))
+        logger.info(f"✅ Solved: {problem_id}")
+    else:
+        logger.info(f"❌ Failed: {problem_id}")
+
+    return {
+        "passed": passed,
+        "details": details,
+        "performance": performance,
+        "cached": cached is not None
+    }
+
+submission_sink = create_submission_sink(app)
+job_queue = create_job_queue(app, execute_run)
 
 # ======================================================
 # ROUTES – AUTH
@@ -193,10 +303,7 @@ def show_problem(problem_id=None):
     # Fetch solved IDs for sidebar
     solved_ids = set()
     if 'user_id' in session:
-        submissions = db.session.query(Submission.problem_id).filter_by(
-            user_id=session['user_id'], status='passed'
-        ).distinct().all()
-        solved_ids = set([s[0] for s in submissions])
+        solved_ids = progress.solved_ids(session['user_id'])
 
     try:
         problem = load_problem(problem_id)
@@ -210,7 +317,29 @@ def show_problem(problem_id=None):
         "problem.html",
         problem=problem,
         sidebar=sidebar,
-        solved=solved_ids
+        solved=solved_ids,
+        sidebar_etag=quote_etag(sidebar_etag(session['user_id'])),
+        languages=languages.choices()
+    )
+
+@app.route("/api/problem/<problem_id>")
+@login_required
+def problem_api(problem_id):
+    """Problem content (no test cases) for switching problems in the page."""
+    try:
+        problem = load_problem(problem_id)
+    except ProblemNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    return conditional_json(problem_etag(problem), lambda: problem)
+
+@app.route("/api/sidebar")
+@login_required
+def sidebar_api():
+    """Sidebar groups with solved flags, revalidated by the page after navigation and solves."""
+    user_id = session['user_id']
+    return conditional_json(
+        sidebar_etag(user_id),
+        lambda: {"groups": mark_solved(load_problem_index(), progress.solved_ids(user_id))}
     )
 
 @app.route("/run", methods=["POST"])
@@ -219,99 +348,128 @@ def run_code():
     data = request.json
     code = data.get("code")
     problem_id = data.get("problem_id")
+    language = data.get("language") or languages.DEFAULT_LANGUAGE
     
     if not code or not problem_id:
          return jsonify({"passed": False, "details": [{"status": "error", "error": "Missing code or problem_id"}]})
-    
-    logger.info(f"🚀 Run Code: {problem_id}")
-
-    try:
-        problem_data = load_problem(problem_id)
-        passed, details = evaluate_code(code, problem_data)
-        
-        # Save Submission
-        status = 'passed' if passed else 'failed'
-        new_submission = Submission(
-            user_id=session['user_id'],
-            problem_id=problem_id,
-            code=code,
-            status=status
-        )
-        db.session.add(new_submission)
-        db.session.commit()
-        
-        if passed:
-            logger.info(f"✅ Solved: {problem_id}")
-        else:
-            logger.info(f"❌ Failed: {problem_id}")
 
+    if languages.get(language) is None:
         return jsonify({
-            "passed": passed,
-            "details": details
+            "passed": False,
+            "details": [{"status": "error", "error": f"Language '{language}' is not available"}]
+        }), 400
+    
+    try:
+        admission.admit(session['user_id'], job_queue.in_flight)
+    except Overloaded as e:
+        logger.info(f"🚦 Run rejected ({e}), retry in {e.retry_after}s")
+        db.session.rollback()
+        response = jsonify({
+            "passed": False,
+            "retry_after": e.retry_after,
+            "details": [{"status": "error", "error": f"{e}. Try again in {e.retry_after}s."}]
         })
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 429
+
+    logger.info(f"🚀 Run Code: {problem_id} ({language})")
+
+    try:
+        job_id = job_queue.submit(session['user_id'], problem_id, code, language)
     except Exception as e:
-        logger.error(f"Execution Error: {e}")
+        logger.error(f"Enqueue Error: {e}")
+        db.session.rollback()
+        admission.refund(session['user_id'])
         return jsonify({
             "passed": False,
             "details": [{"status": "error", "error": str(e)}]
         })
 
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+@app.route("/run/<job_id>")
+@login_required
+def run_status(job_id):
+    job = job_queue.get(job_id, session['user_id'])
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route("/run/<job_id>/events")
+@login_required
+def run_events(job_id):
+    """Server-Sent Events: one 'case' event per finished test case, then 'summary'."""
+    # Each stream holds a request thread until the run ends; past the cap the page polls
+    if not stream_slots.acquire():
+        return jsonify({"error": "Too many open streams, poll /run/<job_id>"}), 503, {"Retry-After": "1"}
+    events = job_queue.stream(job_id, session['user_id'])
+    if events is None:
+        stream_slots.release()
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate():
+        for name, data in events:
+            yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    response.call_on_close(stream_slots.release)
+    return response
+
+
+@app.route("/runner/stats")
+@login_required
+def runner_stats():
+    return jsonify({
+        "admission": admission.stats(job_queue.depth()),
+        "event_streams": stream_slots.stats(),
+        "pool": pool_stats(),
+        "service": service_stats(),
+        "precheck": precheck.stats(),
+        "test_bundles": bundles.stats(),
+        "stress_tests": stress.stats(),
+        "languages": languages.cache_stats(),
+        "result_cache": result_cache.stats(),
+        "submission_sink": submission_sink.stats()
+    })
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape target: every process on this box, see metrics.py."""
+    if metrics.METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {metrics.METRICS_TOKEN}":
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+
+    depth = job_queue.depth()
+    gauges = [(
+        "dynocode_run_queue_jobs", "Run jobs by state.",
+        {("queued",): depth["queued"], ("running",): depth["running"]}, ("state",)
+    )]
+    return Response(metrics.render(gauges), mimetype="text/plain; version=0.0.4")
+
 
 @app.route("/dashboard")
 @login_required
 def dashboard():
     user_id = session['user_id']
     
-    # 1. Fetch all problems (for total counts)
-    all_problems = Problem.query.all()
-    
-    # 2. Fetch user's passed submissions (distinct problem_ids)
-    solved_problems = db.session.query(Submission.problem_id).filter_by(
-        user_id=user_id, status='passed'
-    ).distinct().all()
-    solved_ids = set([s[0] for s in solved_problems])
-    
-    # 3. Build Stats
-    stats = {
-        "total": len(all_problems),
-        "solved": len(solved_ids),
-        "easy_total": 0, "easy_solved": 0,
-        "med_total": 0, "med_solved": 0,
-        "hard_total": 0, "hard_solved": 0
-    }
-    
-    # 4. Group by difficulty
-    # We can optimize this later with group_by queries but pure python is fine for <1000 items
-    for p in all_problems:
-        diff = (p.difficulty or "Easy").lower()
-        if "easy" in diff:
-            stats["easy_total"] += 1
-            if p.id in solved_ids: stats["easy_solved"] += 1
-        elif "medium" in diff:
-            stats["med_total"] += 1
-            if p.id in solved_ids: stats["med_solved"] += 1
-        elif "hard" in diff:
-            stats["hard_total"] += 1
-            if p.id in solved_ids: stats["hard_solved"] += 1
+    # 1. Problem totals per difficulty (cached with the catalog)
+    stats = catalog.difficulty_totals()
+
+    # 2. User's precomputed counters and solved set (see progress.py)
+    stats.update(progress.user_stats(user_id))
+    solved_ids = progress.solved_ids(user_id)
             
     # Sidebar is still needed for list details? 
     # Or we can pass a enriched object.
     # Let's pass 'curriculum' object to template with solved flags.
     
-    sidebar = load_problem_index()
-    
     # Inject 'solved' status into sidebar for dashboard view
     # sidebar structure: [{'day': 'Easy Problems', 'problems': [{id, title...}]}]
-    for group in sidebar:
-        group_solved = 0
-        for p in group['problems']:
-            is_solved = (p['id'] in solved_ids)
-            p['solved'] = is_solved
-            if is_solved:
-                group_solved += 1
-        
-        group['solved_count'] = group_solved
-        group['total_count'] = len(group['problems'])
+    sidebar = mark_solved(load_problem_index(), solved_ids)
             
     return render_template("dashboard.html", stats=stats, curriculum=sidebar)
 
@@ -0,0 +1,10 @@
+from app import app, db
+from progress import backfill
+
+# Context ensures app config is loaded
+with app.app_context():
+    print("Creating progress tables...")
+    db.create_all()
+    print("Rebuilding user progress from submissions...")
+    users = backfill()
+    print(f"Progress rebuilt for {users} users!")
@@ -0,0 +1,508 @@
+"""
+Load benchmark: seed a database, start gunicorn, drive it, record latencies.
+
+    python bench.py                                  # SQLite scratch database, defaults below
+    python bench.py --duration 60 --concurrency 32
+    python bench.py --compare bench-results/<old>.json --max-regression 15
+
+Without ``--database-url`` everything happens in a temporary directory: a
+SQLite database is created, migrated and seeded with ``--problems``
+problems, ``--users`` users and ``--submissions`` submissions (with their
+progress and ranking histograms), so no Postgres is needed. With
+``--database-url`` the given database is seeded once and reused by later
+runs; point it at a scratch database, never at production.
+
+The app runs under gunicorn as in the Dockerfile (``--workers`` x
+``--threads``, a warm runner pool of ``--threads`` unless ``RUNNER_POOL_SIZE``
+is set) on a free local port. ``--concurrency`` closed-loop clients,
+each logged in as its own user, pick requests from ``--mix``:
+
+    problem    GET /problem/<random id>
+    dashboard  GET /dashboard
+    run        POST /run with a correct solution, then poll /run/<job_id>
+               until the verdict; the latency is submit-to-verdict
+
+Every run submits a fresh source text so the result cache doesn't answer
+it. Per-user run rate limits are off (``RUN_RATE_PER_MINUTE=0``) unless set
+in the environment; the global in-flight cap still applies and 429s count
+as errors. The first ``--warmup`` seconds are not measured.
+
+Results (throughput, mean/p50/p95/p99/max latency per endpoint, error
+counts, the commit and the configuration) are printed and written as JSON
+to ``--output`` (default ``bench-results/<time>-<commit>.json``), so runs
+on two commits can be compared with ``--compare``.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+from http.cookiejar import CookieJar
+
+RESULTS_DIR = "bench-results"
+PASSWORD = "bench-password"
+POLL_INTERVAL = 0.05   # seconds between /run/<job_id> polls
+RUN_TIMEOUT = 60       # seconds before a run without verdict counts as an error
+START_TIMEOUT = 60     # seconds for gunicorn to answer
+
+# (title, signature, solution body, reference implementation)
+KINDS = [
+    ("Sum of Numbers", "def solve(nums):", "return sum(nums)", lambda nums: sum(nums)),
+    ("Largest Number", "def solve(nums):", "return max(nums)", lambda nums: max(nums)),
+    ("Sorted Numbers", "def solve(nums):", "return sorted(nums)", lambda nums: sorted(nums)),
+    ("Distinct Numbers", "def solve(nums):", "return len(set(nums))", lambda nums: len(set(nums))),
+]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+
+
+def problem_id(i):
+    return f"bench-{i:05d}"
+
+
+def username(i):
+    return f"bench-user-{i}"
+
+
+def solution(i):
+    _, signature, body, _ = KINDS[i % len(KINDS)]
+    return f"{signature}\n    {body}\n"
+
+
+# ======================================================
+# SEEDING
+# ======================================================
+
+def make_problem(i, rng):
+    title, signature, _, reference = KINDS[i % len(KINDS)]
+    tests = []
+    for _ in range(8):
+        nums = [rng.randint(-1000, 1000) for _ in range(rng.randint(1, 50))]
+        tests.append({"input": json.dumps(nums), "output": json.dumps(reference(nums))})
+    return {
+        "id": problem_id(i),
+        "title": f"{title} #{i}",
+        "difficulty": DIFFICULTIES[i % len(DIFFICULTIES)],
+        "tags": ["Lists", "Bench"],
+        "hints": ["Python has a built-in for this."],
+        "function_signature": f"{signature}\n    pass",
+        "description": f"Benchmark problem {i}. " + "Given a list of integers `nums`, compute the answer. " * 20,
+        "test_cases": tests,
+    }
+
+
+def seed(args):
+    """Migrate and seed the database unless an earlier run already did."""
+    import migrate_to_db
+    import migrations
+    import progress
+    import rankings
+    import code_store
+    from models import db, Problem, User, Submission
+    from werkzeug.security import generate_password_hash
+
+    app = migrate_to_db.create_app()
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            # Readers don't block the writer (persists in the database file)
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        migrations.upgrade()
+
+        if db.session.query(User).filter_by(username=username(0)).first() is not None:
+            problems = db.session.query(Problem).filter(Problem.id.like("bench-%")).count()
+            users = db.session.query(User).filter(User.username.like("bench-user-%")).count()
+            submissions = db.session.query(Submission).filter(Submission.problem_id.like("bench-%")).count()
+            print(f"♻️ Reusing seeded database ({problems} problems, {users} users, {submissions} submissions)")
+            return problems, users, submissions
+
+        started = time.perf_counter()
+        rng = random.Random(args.seed)
+        rows = [
+            migrate_to_db.problem_row(migrate_to_db.normalize_problem_data(make_problem(i, rng)))
+            for i in range(args.problems)
+        ]
+        for offset in range(0, len(rows), migrate_to_db.BATCH_SIZE):
+            migrate_to_db.upsert_problems(rows[offset:offset + migrate_to_db.BATCH_SIZE])
+            db.session.commit()
+
+        # One hash for everyone: pbkdf2 per user would dominate seeding time
+        password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256')
+        db.session.execute(
+            db.insert(User),
+            [{"username": username(i), "password_hash": password_hash} for i in range(args.users)]
+        )
+        db.session.commit()
+        user_ids = [u for (u,) in db.session.query(User.id).filter(User.username.like("bench-user-%"))]
+
+        blobs = {}
+        submissions = []
+        now = datetime.utcnow()
+        for _ in range(args.submissions):
+            i = rng.randrange(args.problems)
+            passed = rng.random() < 0.6
+            code = solution(i) if passed else f"def solve(nums):\n    return {rng.randint(0, 9)}\n"
+            digest, blob = code_store.make_blob(code)
+            blobs[digest] = blob
+            runtime_ms = round(rng.uniform(0.5, 20), 2) if passed else None
+            memory_kb = rng.randint(8000, 12000) if passed else None
+            submissions.append({
+                "user_id": rng.choice(user_ids),
+                "problem_id": problem_id(i),
+                "code_hash": digest,
+                "status": "passed" if passed else "failed",
+                "timestamp": now - timedelta(seconds=rng.randint(0, 90 * 86400)),
+                "runtime_ms": runtime_ms,
+                "memory_kb": memory_kb,
+            })
+            if passed:
+                rankings.record(problem_id(i), runtime_ms, memory_kb)
+        code_store.store_blobs(list(blobs.values()))
+        for offset in range(0, len(submissions), 1000):
+            db.session.execute(db.insert(Submission), submissions[offset:offset + 1000])
+        db.session.commit()
+        progress.backfill()
+
+        elapsed = time.perf_counter() - started
+        print(f"🌱 Seeded {args.problems} problems, {args.users} users, {args.submissions} submissions in {elapsed:.1f}s")
+        return args.problems, args.users, args.submissions
+
+
+# ======================================================
+# SERVER
+# ======================================================
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, env, workdir):
+    port = free_port()
+    log_path = os.path.join(workdir, "gunicorn.log")
+    log = open(log_path, "w")
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn", "app:app",
+            "--bind", f"127.0.0.1:{port}",
+            "--workers", str(args.workers),
+            "--threads", str(args.threads),
+            "--log-level", "warning",
+        ],
+        env=env, stdout=log, stderr=subprocess.STDOUT,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            break
+        try:
+            urllib.request.urlopen(base + "/login", timeout=2).read()
+            print(f"🚀 gunicorn on {base} ({args.workers} workers x {args.threads} threads)")
+            return proc, base
+        except OSError:
+            time.sleep(0.2)
+    stop_server(proc)
+    with open(log_path) as f:
+        sys.stderr.write(f.read()[-4000:])
+    raise SystemExit("❌ gunicorn did not start")
+
+
+def stop_server(proc):
+    if proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+# ======================================================
+# LOAD
+# ======================================================
+
+class Client:
+    """One logged-in user issuing requests back to back."""
+
+    def __init__(self, base, user_index, rng):
+        self.base = base
+        self.rng = rng
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        form = urllib.parse.urlencode({"username": username(user_index), "password": PASSWORD}).encode()
+        self.opener.open(base + "/login", data=form, timeout=30).read()
+
+    def request(self, path, body=None):
+        """(status, parsed JSON or None); status 0 for connection errors."""
+        req = urllib.request.Request(self.base + path)
+        if body is not None:
+            req.data = json.dumps(body).encode()
+            req.add_header("Content-Type", "application/json")
+        try:
+            with self.opener.open(req, timeout=RUN_TIMEOUT) as resp:
+                data = resp.read()
+                if resp.headers.get_content_type() == "application/json":
+                    return resp.status, json.loads(data)
+                return resp.status, None
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, None
+        except OSError:
+            return 0, None
+
+    def problem(self, problems):
+        status, _ = self.request(f"/problem/{problem_id(self.rng.randrange(problems))}")
+        return status == 200, status
+
+    def dashboard(self, problems):
+        status, _ = self.request("/dashboard")
+        return status == 200, status
+
+    def run(self, problems):
+        i = self.rng.randrange(problems)
+        # A fresh source text per run, so the result cache doesn't answer it
+        code = solution(i) + f"# {self.rng.getrandbits(64):x}\n"
+        status, data = self.request("/run", {"problem_id": problem_id(i), "code": code, "language": "python"})
+        if status != 202:
+            return False, status
+        deadline = time.monotonic() + RUN_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            status, job = self.request(f"/run/{data['job_id']}")
+            if status != 200:
+                return False, status
+            if job.get("status") == "done":
+                return bool(job.get("passed")), "passed" if job.get("passed") else "failed"
+        return False, "timeout"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("problem", "dashboard", "run"):
+            raise SystemExit(f"❌ Unknown endpoint in --mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def drive(args, base, problems, users):
+    """Run the clients; returns {endpoint: [(started, latency_s, ok, status), ...]} and the window."""
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    samples = {name: [] for name in names}
+    lock = threading.Lock()
+    start = time.monotonic()
+    measure_from = start + args.warmup
+    stop_at = measure_from + args.duration
+
+    def client_loop(n):
+        rng = random.Random(f"{args.seed}:{n}")
+        client = Client(base, n % users, rng)
+        while True:
+            began = time.monotonic()
+            if began >= stop_at:
+                return
+            name = rng.choices(names, weights)[0]
+            ok, status = getattr(client, name)(problems)
+            latency = time.monotonic() - began
+            if began >= measure_from:
+                with lock:
+                    samples[name].append((began, latency, ok, status))
+
+    threads = [threading.Thread(target=client_loop, args=(n,), daemon=True) for n in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    print(f"🏋️ {args.concurrency} clients, {args.warmup}s warmup + {args.duration}s measured, mix {args.mix}")
+    for t in threads:
+        t.join()
+    return samples, args.duration
+
+
+# ======================================================
+# RESULTS
+# ======================================================
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarise(samples, window):
+    latencies = sorted(latency * 1000 for _, latency, _, _ in samples)
+    errors = {}
+    for _, _, ok, status in samples:
+        if not ok:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    ms = lambda v: round(v, 2) if v is not None else None
+    return {
+        "requests": len(samples),
+        "errors": sum(errors.values()),
+        "error_statuses": errors,
+        "throughput_rps": round(len(samples) / window, 2),
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies) if latencies else None),
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def git_commit():
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=here, stderr=subprocess.DEVNULL).decode().strip()
+        dirty = bool(subprocess.check_output(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=here, stderr=subprocess.DEVNULL
+        ).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def print_table(result):
+    print(f"\n{'endpoint':<10} {'reqs':>7} {'err':>5} {'rps':>8} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    rows = list(result["endpoints"].items()) + [("total", result["total"])]
+    for name, s in rows:
+        lat = s["latency_ms"]
+        cells = [f"{lat[k]:8.1f}" if lat[k] is not None else f"{'-':>8}" for k in ("mean", "p50", "p95", "p99", "max")]
+        print(f"{name:<10} {s['requests']:>7} {s['errors']:>5} {s['throughput_rps']:>8.1f} {' '.join(cells)}")
+
+
+def compare(result, baseline_path, max_regression):
+    """Print changes against an earlier result; returns the regressions beyond ``max_regression`` %."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old_commit = (baseline.get("commit") or "unknown")[:10]
+    print(f"\nvs {baseline_path} ({old_commit}):")
+    regressions = []
+    for name, new in list(result["endpoints"].items()) + [("total", result["total"])]:
+        old = baseline["endpoints"].get(name) if name != "total" else baseline.get("total")
+        if not old:
+            continue
+        changes = []
+        for label, before, after, worse_if_higher in [
+            ("rps", old["throughput_rps"], new["throughput_rps"], False),
+            ("p50", old["latency_ms"]["p50"], new["latency_ms"]["p50"], True),
+            ("p95", old["latency_ms"]["p95"], new["latency_ms"]["p95"], True),
+            ("p99", old["latency_ms"]["p99"], new["latency_ms"]["p99"], True),
+        ]:
+            if not before or after is None:
+                continue
+            delta = (after - before) / before * 100
+            changes.append(f"{label} {before:.1f} -> {after:.1f} ({delta:+.1f}%)")
+            worse = delta if worse_if_higher else -delta
+            # p99 is too noisy on short runs to gate on
+            if max_regression is not None and label != "p99" and worse > max_regression:
+                regressions.append(f"{name} {label} {delta:+.1f}%")
+        print(f"  {name:<10} " + ", ".join(changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a database, start gunicorn and measure throughput and latency.")
+    parser.add_argument("--database-url", help="scratch database to seed and reuse (default: temporary SQLite)")
+    parser.add_argument("--problems", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--submissions", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16, help="simultaneous clients")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before that")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--mix", default="problem=6,dashboard=3,run=1", help="endpoint weights")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help=f"result file (default: {RESULTS_DIR}/<time>-<commit>.json)")
+    parser.add_argument("--compare", metavar="RESULT", help="earlier result file to compare with")
+    parser.add_argument("--max-regression", type=float, metavar="PCT",
+                        help="with --compare, exit 1 if throughput, p50 or p95 got this many percent worse")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="dynocode-bench-")
+    database_url = args.database_url or "sqlite:///" + os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = database_url
+
+    env = dict(os.environ)
+    env.setdefault("RUN_RATE_PER_MINUTE", "0")
+    env.setdefault("RUNNER_POOL_SIZE", str(args.threads))
+    env["ADMISSION_PATH"] = os.path.join(workdir, "admission.db")
+    env["METRICS_DIR"] = os.path.join(workdir, "metrics")
+    env.setdefault("SECRET_KEY", "bench")
+
+    proc = None
+    try:
+        problems, users, submissions = seed(args)
+        if not problems or not users:
+            raise SystemExit("❌ Nothing to benchmark: seed at least one problem and one user")
+        proc, base = start_server(args, env, workdir)
+        samples, window = drive(args, base, problems, users)
+    finally:
+        if proc is not None:
+            stop_server(proc)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    from sqlalchemy.engine import make_url
+    commit, dirty = git_commit()
+    all_samples = [s for endpoint in samples.values() for s in endpoint]
+    result = {
+        "version": 1,
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "commit": commit,
+        "dirty": dirty,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "database": make_url(database_url).get_backend_name(),
+            "problems": problems,
+            "users": users,
+            "submissions": submissions,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "workers": args.workers,
+            "threads": args.threads,
+            "mix": parse_mix(args.mix),
+            "seed": args.seed,
+            "env": {k: env[k] for k in sorted(env) if k.startswith(("RUN_", "RUNNER_", "SUBMISSION_", "CATALOG_"))},
+        },
+        "endpoints": {name: summarise(s, window) for name, s in samples.items()},
+        "total": summarise(all_samples, window),
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.utcnow():%Y%m%d-%H%M%S}-{(commit or 'nogit')[:10]}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print_table(result)
+    print(f"\n💾 Results written to {output}")
+
+    if args.compare:
+        regressions = compare(result, args.compare, args.max_regression)
+        if regressions:
+            print("❌ Regressions: " + ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Per-process problem catalog cache.
+
+Holds the grouped sidebar index and the parsed problem dicts so page views
+and /run don't reload the problems table every time. Before serving, the
+cache revalidates against one cheap query (``max(updated_at)`` and
+``count(*)``), at most every ``CATALOG_CHECK_INTERVAL`` seconds, and drops
+everything when the catalog version changes.
+
+Listing paths only select id/title/difficulty/tags. Problem pages load the
+'content' column group, and only the runner loads the 'tests' group, so
+``test_cases`` never reaches a page render. The runner's view of a problem
+(test cases, parsed expected outputs) comes from its compiled test bundle
+(runner/bundles.py), which is built from the 'tests' group only when no
+process on this machine has built it for the current version yet; the same
+goes for generated stress inputs (runner/stress.py).
+
+Callers always get copies, so request code can annotate the sidebar
+(e.g. solved flags) without touching the shared cached structure.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import func
+from sqlalchemy.orm import undefer_group
+
+from models import db, Problem
+from progress import difficulty_bucket
+from runner import bundles, stress
+
+CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "2"))  # seconds between version checks
+
+DIFFICULTY_ORDER = ["Easy", "Medium", "Hard"]
+
+
+class ProblemNotFound(Exception):
+    pass
+
+
+def build_index(problems):
+    """Group problems by difficulty for the sidebar: Easy, Medium, Hard, then others."""
+    groups = {}
+    for p in problems:
+        diff = p.difficulty or "Unknown"
+        if diff not in groups:
+            groups[diff] = []
+
+        groups[diff].append({
+            "id": p.id,
+            "title": p.title,
+            "difficulty": p.difficulty,
+            "tags": p.tags
+        })
+
+    index = []
+    for diff in DIFFICULTY_ORDER:
+        if diff in groups:
+            index.append({"day": f"{diff} Problems", "problems": groups[diff]})
+
+    for diff in groups:
+        if diff not in DIFFICULTY_ORDER:
+            index.append({"day": f"{diff} Problems", "problems": groups[diff]})
+
+    return index
+
+
+class ProblemCatalog:
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._index = None
+        self._totals = None
+        self._problems = {}
+        self._tests = {}
+
+    def _current_version(self):
+        latest, count = db.session.query(
+            func.max(Problem.updated_at), func.count(Problem.id)
+        ).one()
+        return (latest, count)
+
+    def _revalidate(self):
+        """Drop cached data if the catalog changed. Caller holds the lock."""
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.check_interval:
+            return
+        version = self._current_version()
+        self._checked_at = now
+        if version != self._version:
+            self._version = version
+            self._index = None
+            self._totals = None
+            self._problems = {}
+            self._tests = {}
+
+    def version(self):
+        with self._lock:
+            self._revalidate()
+            return self._version
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._index = None
+            self._totals = None
+            self._problems = {}
+            self._tests = {}
+
+    def _load_index(self):
+        """Caller holds the lock and has revalidated."""
+        if self._index is None:
+            rows = db.session.query(
+                Problem.id, Problem.title, Problem.difficulty, Problem.tags
+            ).order_by(Problem.id).all()
+            self._index = build_index(rows)
+        return self._index
+
+    def index(self):
+        """Sidebar groups, as a copy the caller may mutate."""
+        with self._lock:
+            self._revalidate()
+            index = self._load_index()
+
+        return [
+            {**group, "problems": [dict(p) for p in group["problems"]]}
+            for group in index
+        ]
+
+    def difficulty_totals(self):
+        """Problem counts for the dashboard: total, easy_total, med_total, hard_total."""
+        with self._lock:
+            self._revalidate()
+            if self._totals is None:
+                totals = {"total": 0, "easy_total": 0, "med_total": 0, "hard_total": 0}
+                for group in self._load_index():
+                    for p in group["problems"]:
+                        totals["total"] += 1
+                        bucket = difficulty_bucket(p["difficulty"])
+                        if bucket:
+                            totals[f"{bucket}_total"] += 1
+                self._totals = totals
+            return dict(self._totals)
+
+    def problem(self, problem_id):
+        """Problem page dict (Problem.to_dict without test_cases), as a copy the caller may mutate."""
+        with self._lock:
+            self._revalidate()
+            version = self._version
+            data = self._problems.get(problem_id)
+
+        if data is None:
+            problem = db.session.query(Problem).options(undefer_group('content')) \
+                .filter_by(id=problem_id).first()
+            if not problem:
+                raise ProblemNotFound(f"Problem {problem_id} not found")
+            data = problem.to_dict(include_tests=False)
+            with self._lock:
+                # Don't file a row read under an older version into a newer cache
+                if self._version == version:
+                    self._problems[problem_id] = data
+
+        return dict(data)
+
+    def problem_for_run(self, problem_id):
+        """Problem dict with test_cases, parsed expected outputs, test bundle path and stress test, for the runner."""
+        data = self.problem(problem_id)
+
+        with self._lock:
+            version = self._version
+            tests = self._tests.get(problem_id)
+
+        if tests is None:
+            def fetch_cases():
+                row = db.session.query(Problem.test_cases).filter_by(id=problem_id).first()
+                if row is None:
+                    raise ProblemNotFound(f"Problem {problem_id} not found")
+                return row[0] or []
+
+            def fetch_stress_test():
+                row = db.session.query(Problem.stress_test).filter_by(id=problem_id).first()
+                return row[0] if row else None
+
+            tests = bundles.load(problem_id, data.get("updated_at"), fetch_cases) + (
+                stress.load(problem_id, data.get("updated_at"), fetch_stress_test),
+            )
+            with self._lock:
+                if self._version == version:
+                    self._tests[problem_id] = tests
+
+        data["bundle"], data["test_cases"], data["expected"], data["stress_test"] = tests
+        return data
+
+
+catalog = ProblemCatalog()
@@ -0,0 +1,47 @@
+"""
+Content-addressed storage for submission source.
+
+Each distinct source text is stored once in ``code_blobs``, zlib-compressed
+and keyed by its sha256. Submissions reference it through ``code_hash``, so
+re-running the same code costs one small submissions row and no new blob.
+"""
+import hashlib
+import zlib
+
+from models import db, conflict_insert, CodeBlob
+
+COMPRESSION_LEVEL = 6
+
+
+def code_hash(code):
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+def make_blob(code):
+    """Return (hash, blob row values) for ``code``; compress in the caller's thread."""
+    raw = code.encode()
+    digest = hashlib.sha256(raw).hexdigest()
+    return digest, {"hash": digest, "data": zlib.compress(raw, COMPRESSION_LEVEL), "size": len(raw)}
+
+
+def store_blobs(blobs):
+    """Insert blob rows that don't exist yet. ``blobs`` is a list of make_blob() values."""
+    unique = list({b["hash"]: b for b in blobs}.values())
+    if not unique:
+        return
+    stmt = conflict_insert(CodeBlob)
+    if stmt is not None:
+        db.session.execute(stmt.on_conflict_do_nothing(index_elements=["hash"]), unique)
+        return
+    existing = set(
+        r[0] for r in db.session.query(CodeBlob.hash).filter(CodeBlob.hash.in_([b["hash"] for b in unique]))
+    )
+    for b in unique:
+        if b["hash"] not in existing:
+            db.session.add(CodeBlob(**b))
+    db.session.flush()
+
+
+def load_code(digest):
+    blob = db.session.get(CodeBlob, digest)
+    return blob.text() if blob is not None else None
@@ -0,0 +1,32 @@
+import sys
+from app import app, db
+import migrations
+
+USAGE = "Usage: python db_migrate.py [upgrade|status|check-plans]"
+
+# Context ensures app config is loaded
+with app.app_context():
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+
+    if command == "upgrade":
+        print("Applying migrations...")
+        count = migrations.upgrade()
+        print(f"Database schema up to date! ({count} migrations applied)")
+
+    elif command == "status":
+        done = migrations.applied_versions(db.engine)
+        for version, name, _ in migrations.MIGRATIONS:
+            mark = "✅" if version in done else "⏳"
+            print(f"{mark} {version:04d} {name}")
+
+    elif command == "check-plans":
+        failures = migrations.check_query_plans()
+        for label, index, plan in failures:
+            print(f"❌ {label}: expected {index}\n{plan}\n")
+        if failures:
+            sys.exit(1)
+        print(f"✅ All {len(migrations.HOT_QUERIES)} hot queries use their indexes.")
+
+    else:
+        print(USAGE)
+        sys.exit(2)
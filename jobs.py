@@ -0,0 +1,389 @@
+"""
+Asynchronous /run job queue.
+
+``/run`` enqueues a job and returns its id straight away; background worker
+threads in each web process execute jobs and store the result, which the
+client polls through ``GET /run/<job_id>`` or streams per-case results
+from ``GET /run/<job_id>/events``. No external broker is needed:
+
+* ``database`` (default) keeps jobs in the ``run_jobs`` table, so any
+  gunicorn worker can execute a job and any worker can answer a poll.
+* ``memory`` keeps jobs in a per-process dict. Only safe with a single
+  web worker, but has no DB overhead.
+
+An event stream holds a request thread (gunicorn gthread) for the whole
+run, so each process serves at most ``RUN_STREAM_LIMIT`` streams at once.
+Past that ``/run/<job_id>/events`` answers 503 and the page polls instead,
+keeping the other threads free for ordinary requests.
+"""
+import os
+import queue
+import threading
+import time
+import uuid
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import update, func
+
+from models import db, RunJob
+import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUE_BACKEND = os.getenv("RUN_QUEUE_BACKEND", "database")
+QUEUE_WORKERS = int(os.getenv("RUN_QUEUE_WORKERS", "4"))  # executor threads per web process
+POLL_INTERVAL = 0.2     # seconds between DB polls when idle
+PROGRESS_INTERVAL = 0.1 # seconds between per-case progress writes / stream polls
+STREAM_TIMEOUT = 300    # seconds an event stream may stay open
+STREAM_LIMIT = int(os.getenv("RUN_STREAM_LIMIT", "2"))  # open streams per process, below --threads (0 = no streams)
+JOB_TTL = 3600          # seconds a finished job is kept for polling
+STALE_AFTER = 300       # seconds before a 'running' job is considered abandoned
+
+
+def _new_job_id():
+    return uuid.uuid4().hex
+
+
+def _error_result(message):
+    return {"passed": False, "details": [{"status": "error", "error": message}]}
+
+
+class _WorkerThreads:
+    """Starts executor threads lazily, once per process (gunicorn forks after import)."""
+
+    def __init__(self, count, target):
+        self._count = count
+        self._target = target
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            for i in range(self._count):
+                threading.Thread(
+                    target=self._target, name=f"run-worker-{i}", daemon=True
+                ).start()
+
+
+class StreamSlots:
+    """Counts this process's open event streams against ``STREAM_LIMIT``."""
+
+    def __init__(self, limit=STREAM_LIMIT):
+        self.limit = limit
+        self.open = 0
+        self.refused = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.open >= self.limit:
+                self.refused += 1
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"open": self.open, "limit": self.limit, "refused": self.refused}
+
+
+stream_slots = StreamSlots()
+
+
+# ======================================================
+# IN-PROCESS BACKEND
+# ======================================================
+
+class MemoryJobQueue:
+    def __init__(self, app, handler, workers=QUEUE_WORKERS):
+        self.app = app
+        self.handler = handler
+        self._jobs = {}
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._threads = _WorkerThreads(workers, self._work)
+
+    def submit(self, user_id, problem_id, code, language="python"):
+        self._threads.ensure_started()
+        job_id = _new_job_id()
+        job = {
+            "job_id": job_id,
+            "user_id": user_id,
+            "problem_id": problem_id,
+            "code": code,
+            "language": language,
+            "status": "queued",
+            "queued_at": time.monotonic(),
+            "progress": [],
+            "result": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        self._pending.put(job)
+        return job_id
+
+    def depth(self):
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {"queued": statuses.count("queued"), "running": statuses.count("running")}
+
+    def in_flight(self):
+        depth = self.depth()
+        return depth["queued"] + depth["running"]
+
+    def get(self, job_id, user_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["user_id"] != user_id:
+                return None
+            data = {"job_id": job_id, "status": job["status"]}
+            if job["status"] == "done":
+                data.update(job["result"])
+            return data
+
+    def stream(self, job_id, user_id):
+        """Return a generator of ("case", detail) / ("summary", result) events, or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["user_id"] != user_id:
+                return None
+        return self._events(job)
+
+    def _events(self, job):
+        sent = 0
+        deadline = time.monotonic() + STREAM_TIMEOUT
+        while time.monotonic() < deadline:
+            with self._changed:
+                if len(job["progress"]) == sent and job["status"] != "done":
+                    self._changed.wait(1.0)
+                new = job["progress"][sent:]
+                done = job["status"] == "done"
+            for detail in new:
+                yield "case", detail
+            sent += len(new)
+            if done:
+                yield "summary", job["result"]
+                return
+
+    def _work(self):
+        while True:
+            job = self._pending.get()
+            with self._lock:
+                job["status"] = "running"
+            metrics.RUN_QUEUE_WAIT.observe(time.monotonic() - job["queued_at"], queue="memory")
+
+            def on_result(detail):
+                with self._changed:
+                    job["progress"].append(detail)
+                    self._changed.notify_all()
+
+            result = _run_handler(
+                self.app, self.handler, job["user_id"], job["problem_id"], job["code"],
+                job["language"], on_result
+            )
+            with self._changed:
+                job["result"] = result
+                job["status"] = "done"
+                job["finished_at"] = time.monotonic()
+                self._changed.notify_all()
+                self._prune()
+
+    def _prune(self):
+        cutoff = time.monotonic() - JOB_TTL
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+# ======================================================
+# DATABASE BACKEND (SQLite / Postgres)
+# ======================================================
+
+class DatabaseJobQueue:
+    def __init__(self, app, handler, workers=QUEUE_WORKERS):
+        self.app = app
+        self.handler = handler
+        self._wakeup = threading.Event()
+        self._threads = _WorkerThreads(workers, self._work)
+        self._last_cleanup = 0.0
+
+    def submit(self, user_id, problem_id, code, language="python"):
+        self._threads.ensure_started()
+        job = RunJob(
+            id=_new_job_id(),
+            user_id=user_id,
+            problem_id=problem_id,
+            code=code,
+            language=None if language == "python" else language,
+            status='queued'
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._wakeup.set()
+        return job.id
+
+    def depth(self):
+        counts = dict(
+            db.session.query(RunJob.status, func.count())
+            .filter(RunJob.status.in_(('queued', 'running')))
+            .group_by(RunJob.status).all()
+        )
+        return {"queued": counts.get('queued', 0), "running": counts.get('running', 0)}
+
+    def in_flight(self):
+        return db.session.query(func.count()).select_from(RunJob) \
+            .filter(RunJob.status.in_(('queued', 'running'))).scalar()
+
+    def get(self, job_id, user_id):
+        self._threads.ensure_started()
+        job = db.session.get(RunJob, job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job.to_dict()
+
+    def stream(self, job_id, user_id):
+        """Return a generator of ("case", detail) / ("summary", result) events, or None."""
+        job = db.session.get(RunJob, job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        db.session.close()
+        return self._events(job_id)
+
+    def _events(self, job_id):
+        sent = 0
+        deadline = time.monotonic() + STREAM_TIMEOUT
+        while time.monotonic() < deadline:
+            row = db.session.query(RunJob.status, RunJob.progress, RunJob.result) \
+                .filter_by(id=job_id).first()
+            # End the read transaction so the next poll sees new writes
+            db.session.commit()
+            if row is None:
+                return
+            status, progress, result = row
+            progress = progress or []
+            for detail in progress[sent:]:
+                yield "case", detail
+            sent = max(sent, len(progress))
+            if status == 'done':
+                yield "summary", result
+                return
+            time.sleep(PROGRESS_INTERVAL)
+
+    def _progress_writer(self, job_id):
+        """Return an on_result callback that persists progress, throttled."""
+        details = []
+        last_write = [0.0]
+
+        def on_result(detail):
+            details.append(detail)
+            now = time.monotonic()
+            if now - last_write[0] < PROGRESS_INTERVAL:
+                return
+            last_write[0] = now
+            with db.engine.begin() as conn:
+                conn.execute(
+                    update(RunJob).where(RunJob.id == job_id).values(progress=list(details))
+                )
+
+        return on_result
+
+    def _claim(self):
+        """Atomically move one queued job to 'running'; returns it or None."""
+        candidates = db.session.query(RunJob.id).filter_by(status='queued') \
+            .order_by(RunJob.created_at).limit(QUEUE_WORKERS).all()
+        for (job_id,) in candidates:
+            # Guarded update: only one worker (in any process) wins the row
+            claimed = RunJob.query.filter_by(id=job_id, status='queued').update(
+                {"status": "running", "started_at": datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.session.commit()
+            if claimed:
+                job = db.session.get(RunJob, job_id)
+                metrics.RUN_QUEUE_WAIT.observe(
+                    (job.started_at - job.created_at).total_seconds(), queue="database"
+                )
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    job = self._claim()
+                    if job is None:
+                        self._cleanup()
+                except Exception as e:
+                    logger.error(f"Job queue poll failed: {e}")
+                    db.session.rollback()
+                    job = None
+
+                if job is not None:
+                    user_id, problem_id, code, job_id = job.user_id, job.problem_id, job.code, job.id
+                    language = job.language or "python"
+                    db.session.close()
+                    result = _run_handler(
+                        self.app, self.handler, user_id, problem_id, code, language,
+                        self._progress_writer(job_id)
+                    )
+                    RunJob.query.filter_by(id=job_id).update(
+                        {"status": "done", "progress": result["details"], "result": result,
+                         "finished_at": datetime.utcnow()},
+                        synchronize_session=False
+                    )
+                    db.session.commit()
+                    continue
+
+            self._wakeup.wait(POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def _cleanup(self):
+        now = time.monotonic()
+        if now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+
+        utcnow = datetime.utcnow()
+        RunJob.query.filter(
+            RunJob.status == 'done',
+            RunJob.finished_at < utcnow - timedelta(seconds=JOB_TTL)
+        ).delete(synchronize_session=False)
+        # Jobs whose worker died mid-run: fail them rather than run twice
+        RunJob.query.filter(
+            RunJob.status == 'running',
+            RunJob.started_at < utcnow - timedelta(seconds=STALE_AFTER)
+        ).update(
+            {"status": "done", "result": _error_result("Runner stopped before finishing"),
+             "finished_at": utcnow},
+            synchronize_session=False
+        )
+        db.session.commit()
+
+
+def _run_handler(app, handler, user_id, problem_id, code, language, on_result):
+    with app.app_context():
+        try:
+            return handler(user_id, problem_id, code, on_result, language)
+        except Exception as e:
+            logger.error(f"Execution Error: {e}")
+            db.session.rollback()
+            return _error_result(str(e))
+
+
+def create_job_queue(app, handler):
+    if QUEUE_BACKEND == "memory":
+        return MemoryJobQueue(app, handler)
+    return DatabaseJobQueue(app, handler)
@@ -0,0 +1,473 @@
+"""
+Prometheus metrics and a sampling profiler for slow requests.
+
+Every process (gunicorn workers, and runner services started from the same
+checkout) keeps its counters and histograms in memory and writes them to
+``METRICS_DIR/<pid>.json`` every ``METRICS_FLUSH_INTERVAL`` seconds. ``GET
+/metrics`` merges all files in the directory, so any worker answers for the
+whole box. Files left by processes that have exited are folded into
+``archive.json`` during a scrape, so counters never go backwards when a
+worker is recycled and the directory doesn't grow with every restart.
+
+``install(app)`` hooks into Flask and SQLAlchemy:
+
+* request latency per route, method and status
+* per request: number of DB queries and time spent in them (queries outside
+  a request, e.g. on job queue threads, are counted as "background")
+
+Other modules record their own measurements with the metrics defined
+below: runner spawn and execution time (runner/code_runner.py), time jobs
+wait in the run queue (jobs.py) and verdicts per problem (app.py).
+
+Profiler: with ``PROFILE_SLOW_MS`` set, each request thread is sampled
+every ``PROFILE_INTERVAL_MS`` and requests slower than the threshold dump
+a profile to ``PROFILE_DIR``: the SQL statements run, grouped and counted
+(an N+1 shows up as one statement executed N times), then the sampled
+stacks in folded format (one ``frame;frame;frame count`` line per stack,
+the input of flamegraph.pl / speedscope).
+"""
+import atexit
+import fcntl
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import logging
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "dynocode-metrics"))  # empty = this process only
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))  # seconds between writes of this process's file
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")                    # if set, /metrics needs "Authorization: Bearer <token>"
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))        # profile requests slower than this; 0 = profiler off
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "dynocode-profiles"))
+MAX_PROFILE_STATEMENTS = 1000  # statements kept per profiled request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+# ======================================================
+# METRIC TYPES
+# ======================================================
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value if not isinstance(value, list) else list(value)]
+                    for key, value in self._values.items()]
+
+
+class CounterMetric(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        _ensure_flusher()
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """Cumulative buckets are computed at exposition; stored per bucket plus sum and count."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        _ensure_flusher()
+        key = self._key(labels)
+        slot = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                slot = i
+                break
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                # one count per bucket, +Inf, then sum
+                values = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            values[slot] += 1
+            values[-1] += value
+
+
+REGISTRY = []
+
+HTTP_LATENCY = Histogram(
+    "dynocode_http_request_duration_seconds", "Time to handle a request.",
+    ("method", "route", "status"))
+REQUEST_QUERIES = Histogram(
+    "dynocode_http_request_db_queries", "Database queries run by one request.",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS)
+REQUEST_DB_TIME = Histogram(
+    "dynocode_http_request_db_seconds", "Time one request spent waiting on the database.",
+    ("method", "route"))
+DB_QUERIES = CounterMetric(
+    "dynocode_db_queries_total", "Database queries.", ("context",))
+DB_TIME = CounterMetric(
+    "dynocode_db_query_seconds_total", "Time spent in database queries.", ("context",))
+RUNNER_SPAWN = Histogram(
+    "dynocode_runner_spawn_seconds", "Time to get a harness running a job (process start, pool checkout or service handshake).",
+    ("backend",))
+RUNNER_EXECUTE = Histogram(
+    "dynocode_runner_execute_seconds", "Wall time of one harness job, from spawn to its last event.",
+    ("backend", "language"))
+RUN_QUEUE_WAIT = Histogram(
+    "dynocode_run_queue_wait_seconds", "Time a /run job waited in the queue before a worker took it.",
+    ("queue",))
+VERDICTS = CounterMetric(
+    "dynocode_verdicts_total", "Judged runs by problem and verdict.",
+    ("problem", "verdict", "language"))
+RESULT_CACHE = CounterMetric(
+    "dynocode_result_cache_lookups_total", "Verdict cache lookups for /run jobs (hit or miss).",
+    ("result",))
+
+
+# ======================================================
+# CROSS-PROCESS AGGREGATION
+# ======================================================
+
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def _ensure_flusher():
+    """Start this process's flush thread (once per pid: gunicorn forks after import)."""
+    global _flusher_pid
+    if _flusher_pid == os.getpid() or not METRICS_DIR:
+        return
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+        threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+        atexit.register(flush)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError as e:
+            logger.warning(f"⚠️ Metrics flush failed: {e}")
+
+
+def _snapshot():
+    return {metric.name: metric.snapshot() for metric in REGISTRY}
+
+
+def _write_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def flush():
+    """Write this process's metrics to its file in METRICS_DIR."""
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    _write_json(os.path.join(METRICS_DIR, f"{os.getpid()}.json"), _snapshot())
+
+
+def _merge(total, data):
+    for name, series in data.items():
+        merged = total.setdefault(name, {})
+        for key, value in series:
+            key = tuple(key)
+            if key not in merged:
+                merged[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                merged[key] = [a + b for a, b in zip(merged[key], value)]
+            else:
+                merged[key] += value
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Metrics of every process on the box: {name: {label values: value}}."""
+    total = {}
+    if not METRICS_DIR:
+        _merge(total, _snapshot())
+        return total
+
+    flush()
+    with open(os.path.join(METRICS_DIR, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive_path = os.path.join(METRICS_DIR, "archive.json")
+        archive = {}
+        if os.path.exists(archive_path):
+            with open(archive_path) as f:
+                _merge(archive, json.load(f))
+
+        dead = []
+        for name in os.listdir(METRICS_DIR):
+            match = re.fullmatch(r"(\d+)\.json", name)
+            if not match:
+                continue
+            path = os.path.join(METRICS_DIR, name)
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if _alive(int(match.group(1))):
+                _merge(total, data)
+            else:
+                _merge(archive, data)
+                dead.append(path)
+
+        if dead:
+            # Fold exited processes into the archive so their counts survive
+            _write_json(archive_path, {
+                name: [[list(key), value] for key, value in series.items()]
+                for name, series in archive.items()
+            })
+            for path in dead:
+                os.unlink(path)
+
+    _merge(total, {name: [[list(k), v] for k, v in series.items()] for name, series in archive.items()})
+    return total
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def render(gauges=()):
+    """Prometheus text exposition of every process's metrics.
+
+    ``gauges`` adds point-in-time values read by the caller, as
+    ``(name, help, {label tuple: value}, label names)``.
+    """
+    data = collect()
+    lines = []
+    for metric in REGISTRY:
+        series = data.get(metric.name, {})
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key in sorted(series):
+            value = series[key]
+            if metric.kind == "counter":
+                lines.append(f"{metric.name}{_labels(metric.labels, key)} {_format_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + ("+Inf",), value[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{metric.name}_bucket{_labels(metric.labels, key, le)} {cumulative}")
+            lines.append(f"{metric.name}_sum{_labels(metric.labels, key)} {_format_number(value[-1])}")
+            lines.append(f"{metric.name}_count{_labels(metric.labels, key)} {cumulative}")
+
+    for name, help_text, values, label_names in gauges:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for key, value in sorted(values.items()):
+            lines.append(f"{name}{_labels(label_names, key)} {_format_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ======================================================
+# SAMPLING PROFILER
+# ======================================================
+
+class SamplingProfiler:
+    """Samples the stacks of registered threads from a background thread."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = {}  # thread id -> Counter of folded stacks
+        self._pid = None
+
+    def start(self, thread_id):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="profiler", daemon=True).start()
+            self._active[thread_id] = Counter()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._active.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_fold(frame)] += 1
+
+
+def _fold(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        # "flask/app.py" vs "package/app.py": the directory tells same-named files apart
+        filename = os.path.join(*code.co_filename.split(os.sep)[-2:])
+        stack.append(f"{filename}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000)
+
+
+def _write_profile(method, path, elapsed_ms, state, stacks):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    filename = os.path.join(PROFILE_DIR, f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}-{method}-{slug}-{os.getpid()}.txt")
+
+    grouped = {}
+    for statement, seconds in state.statements:
+        count, total = grouped.get(statement, (0, 0.0))
+        grouped[statement] = (count + 1, total + seconds)
+
+    with open(filename, "w") as f:
+        f.write(f"# {method} {path}: {elapsed_ms:.1f} ms, {state.queries} queries "
+                f"({state.db_seconds * 1000:.1f} ms in the database), {sum(stacks.values())} samples\n")
+        f.write("\n# SQL statements (count, total ms), most frequent first\n")
+        for statement, (count, total) in sorted(grouped.items(), key=lambda item: -item[1][0]):
+            f.write(f"{count:6d} {total * 1000:9.1f}  {' '.join(statement.split())}\n")
+        f.write("\n# Stacks (folded)\n")
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    return filename
+
+
+# ======================================================
+# FLASK / SQLALCHEMY HOOKS
+# ======================================================
+
+class _RequestState:
+    def __init__(self, profiling):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.status = 500
+        self.statements = [] if profiling else None
+
+
+_local = threading.local()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    state = getattr(_local, "request", None)
+    context_name = "request" if state is not None else "background"
+    DB_QUERIES.inc(context=context_name)
+    DB_TIME.inc(elapsed, context=context_name)
+    if state is not None:
+        state.queries += 1
+        state.db_seconds += elapsed
+        if state.statements is not None and len(state.statements) < MAX_PROFILE_STATEMENTS:
+            state.statements.append((statement, elapsed))
+
+
+def install(app):
+    """Time every request and count its DB queries; profile slow ones if enabled."""
+    from flask import request
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def start_request_metrics():
+        profiling = PROFILE_SLOW_MS > 0
+        _local.request = _RequestState(profiling)
+        if profiling:
+            profiler.start(threading.get_ident())
+
+    @app.after_request
+    def note_status(response):
+        state = getattr(_local, "request", None)
+        if state is not None:
+            state.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        # Runs after a streamed response has finished, so SSE routes report stream length
+        state = getattr(_local, "request", None)
+        _local.request = None
+        if state is None:
+            return
+        elapsed = time.perf_counter() - state.started
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        method = request.method
+
+        HTTP_LATENCY.observe(elapsed, method=method, route=route, status=state.status)
+        REQUEST_QUERIES.observe(state.queries, method=method, route=route)
+        REQUEST_DB_TIME.observe(state.db_seconds, method=method, route=route)
+
+        if state.statements is None:
+            return
+        stacks = profiler.stop(threading.get_ident())
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms < PROFILE_SLOW_MS:
+            return
+        try:
+            filename = _write_profile(method, request.path, elapsed_ms, state, stacks)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write profile: {e}")
+            return
+        logger.info(f"🐢 Slow request {method} {request.path} ({elapsed_ms:.0f}ms, {state.queries} queries), profile: {filename}")
@@ -1,9 +1,14 @@
 import os
 import json
+import time
+import hashlib
 import logging
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 from flask import Flask
-from models import db, Problem
+from models import db, conflict_insert, Problem
 from dotenv import load_dotenv
+import migrations
 
 # Load env variables
 load_dotenv()
@@ -66,86 +71,141 @@ def normalize_problem_data(p):
         
     return data
 
+PROBLEM_FIELDS = [
+    # (DB column, normalised key, default)
+    ("title", "title", None),
+    ("difficulty", "difficulty", None),
+    ("tags", "tags", []),
+    ("hints", "hints", []),
+    ("signature", "function_signature", None),
+    ("description", "description", None),
+    ("sample_input", "sample_input", None),
+    ("sample_output", "sample_output", None),
+    ("test_cases", "test_cases", []),
+    ("time_limit_ms", "time_limit_ms", None),
+    ("memory_limit_mb", "memory_limit_mb", None),
+    ("float_tolerance", "float_tolerance", None),
+    ("unordered_output", "unordered_output", None),
+    ("stress_test", "stress_test", None),
+]
+
+BATCH_SIZE = 500  # problems per upsert statement / commit
+
+def problem_row(p_norm):
+    """DB row values for a normalised problem, including its content hash."""
+    row = {"id": p_norm["id"]}
+    for column, key, default in PROBLEM_FIELDS:
+        row[column] = p_norm.get(key, default)
+    payload = json.dumps(row, sort_keys=True)
+    row["content_hash"] = hashlib.sha256(payload.encode()).hexdigest()
+    return row
+
+def load_source(path):
+    """Parse and normalise one source file. Runs in a worker process."""
+    with open(path) as f:
+        file_data = json.load(f)
+
+    rows = []
+    for group_key, group_data in file_data.items():
+        for p in group_data.get("problems", []):
+            rows.append(problem_row(normalize_problem_data(p)))
+    return rows
+
+def find_sources():
+    sources = []
+
+    # 1. Main Config
+    if os.path.exists("questions_config.json"):
+        sources.append("questions_config.json")
+
+    # 2. Curriculums Folder
+    if os.path.exists(CURRICULUMS_DIR):
+        for f in sorted(os.listdir(CURRICULUMS_DIR)):
+            if f.endswith(".json"):
+                sources.append(os.path.join(CURRICULUMS_DIR, f))
+
+    return sources
+
+def upsert_problems(rows):
+    """INSERT ... ON CONFLICT (id) DO UPDATE for a batch of problem rows."""
+    now = datetime.utcnow()
+    stmt = conflict_insert(Problem)
+    if stmt is None:
+        for row in rows:
+            db.session.merge(Problem(updated_at=now, **row))
+        return
+
+    stmt = stmt.values([dict(row, created_at=now, updated_at=now) for row in rows])
+    columns = [column for column, _, _ in PROBLEM_FIELDS] + ["content_hash", "updated_at"]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["id"],
+        set_={column: getattr(stmt.excluded, column) for column in columns}
+    )
+    db.session.execute(stmt)
+
 def migrate():
     app = create_app()
+    timings = {}
+
+    def phase(name, started):
+        timings[name] = time.perf_counter() - started
+        return time.perf_counter()
     
     with app.app_context():
         logger.info("🔌 Connecting to Database...")
-        db.create_all()
+        started = time.perf_counter()
+        migrations.upgrade()
         logger.info("✅ Database Tables Created.")
+        started = phase("schema", started)
         
         # Sources to migrate
-        sources = []
-        
-        # 1. Main Config
-        if os.path.exists("questions_config.json"):
-            sources.append("questions_config.json")
-            
-        # 2. Curriculums Folder
-        if os.path.exists(CURRICULUMS_DIR):
-            for f in os.listdir(CURRICULUMS_DIR):
-                if f.endswith(".json"):
-                    sources.append(os.path.join(CURRICULUMS_DIR, f))
-        
+        sources = find_sources()
         if not sources:
              logger.warning("⚠️ No problem sources found (questions_config.json or curriculums/). Skipping data import.")
              return
 
-        count = 0
-        for path in sources:
-            filename = os.path.basename(path)
-            logger.info(f"📖 Processing {filename}...")
-            
+        # 1. Parse all files in parallel; later files win on duplicate ids
+        incoming = {}
+        with ProcessPoolExecutor() as pool:
+            futures = {path: pool.submit(load_source, path) for path in sources}
+            for path in sources:
+                filename = os.path.basename(path)
+                try:
+                    rows = futures[path].result()
+                except Exception as e:
+                    logger.error(f"❌ Failed to process {filename}: {e}")
+                    continue
+                logger.info(f"📖 Parsed {filename} ({len(rows)} problems)")
+                for row in rows:
+                    incoming[row["id"]] = row
+        started = phase("parse", started)
+
+        # 2. One query for every existing problem's hash
+        existing = dict(db.session.query(Problem.id, Problem.content_hash).all())
+        added, updated, unchanged = [], [], 0
+        for row in incoming.values():
+            if row["id"] not in existing:
+                added.append(row)
+            elif existing[row["id"]] != row["content_hash"]:
+                updated.append(row)
+            else:
+                unchanged += 1
+        started = phase("diff", started)
+
+        # 3. Bulk upsert only what changed, so untouched problems keep their updated_at
+        changed = added + updated
+        for offset in range(0, len(changed), BATCH_SIZE):
+            batch = changed[offset:offset + BATCH_SIZE]
             try:
-                with open(path) as f:
-                    file_data = json.load(f)
-                
-                # Iterate groups
-                for group_key, group_data in file_data.items():
-                    problems = group_data.get("problems", [])
-                    
-                    for p in problems:
-                        # Normalize
-                        p_norm = normalize_problem_data(p)
-                        
-                        # Check exist
-                        existing = Problem.query.get(p_norm["id"])
-                        if existing:
-                            logger.info(f"   🔄 Updating {p_norm['id']}")
-                            existing.title = p_norm.get("title")
-                            existing.difficulty = p_norm.get("difficulty")
-                            existing.tags = p_norm.get("tags", [])
-                            existing.hints = p_norm.get("hints", [])
-                            existing.signature = p_norm.get("function_signature")
-                            existing.description = p_norm.get("description")
-                            existing.sample_input = p_norm.get("sample_input")
-                            existing.sample_output = p_norm.get("sample_output")
-                            existing.test_cases = p_norm.get("test_cases", [])
-                        else:
-                            logger.info(f"   ➕ Adding {p_norm['id']}")
-                            new_problem = Problem(
-                                id=p_norm["id"],
-                                title=p_norm.get("title"),
-                                difficulty=p_norm.get("difficulty"),
-                                tags=p_norm.get("tags", []),
-                                hints=p_norm.get("hints", []),
-                                signature=p_norm.get("function_signature"),
-                                description=p_norm.get("description"),
-                                sample_input=p_norm.get("sample_input"),
-                                sample_output=p_norm.get("sample_output"),
-                                test_cases=p_norm.get("test_cases", [])
-                            )
-                            db.session.add(new_problem)
-                        
-                        count += 1
-                
+                upsert_problems(batch)
                 db.session.commit()
-                
             except Exception as e:
-                logger.error(f"❌ Failed to process {filename}: {e}")
+                logger.error(f"❌ Failed to write problems {batch[0]['id']}..{batch[-1]['id']}: {e}")
                 db.session.rollback()
+        phase("write", started)
         
-        logger.info(f"🚀 Migration Complete. Processed {count} problems.")
+        logger.info(f"🚀 Migration Complete. ➕ {len(added)} added, 🔄 {len(updated)} updated, ✅ {unchanged} unchanged.")
+        logger.info("⏱️ " + ", ".join(f"{name} {secs * 1000:.0f}ms" for name, secs in timings.items()))
 
 if __name__ == "__main__":
     migrate()
@@ -0,0 +1,281 @@
+"""
+Versioned schema migrations.
+
+``db.create_all()`` only creates missing tables; it never adds columns or
+indexes to tables that already exist. Changes to existing tables go here
+as numbered migrations, applied once each and recorded in
+``schema_migrations``. Run them with ``python db_migrate.py upgrade``.
+
+Each migration receives the SQLAlchemy engine and must be safe to re-run
+(use IF NOT EXISTS / checkfirst), since a crash can leave it half applied.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+
+from models import db, Submission
+from code_store import make_blob
+import progress
+import rankings
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+# ======================================================
+# HELPERS
+# ======================================================
+
+def create_index(engine, index):
+    """Create ``index`` if missing; on Postgres without blocking writes."""
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    if engine.dialect.name == "postgresql":
+        # CONCURRENTLY can't run inside a transaction block
+        ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(ddl))
+    else:
+        with engine.begin() as conn:
+            conn.execute(text(ddl))
+
+
+def drop_index(engine, name):
+    """Drop index ``name`` if it exists; on Postgres without blocking writes."""
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    else:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def _table_index(table, name):
+    return next(ix for ix in table.indexes if ix.name == name)
+
+
+def has_column(engine, table, column):
+    return any(c["name"] == column for c in inspect(engine).get_columns(table))
+
+
+def add_column(engine, table, column_ddl):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists."""
+    name = column_ddl.split()[0]
+    if has_column(engine, table, name):
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column_ddl}"))
+
+
+# ======================================================
+# MIGRATIONS
+# ======================================================
+
+@migration(1, "submission hot-path indexes")
+def submission_indexes(engine):
+    name = 'ix_submissions_user_problem_passed'
+    logger.info(f"   ➕ Index {name}")
+    create_index(engine, _table_index(Submission.__table__, name))
+
+
+CODE_BATCH_SIZE = 1000  # submissions converted per transaction
+
+
+@migration(2, "deduplicated, compressed submission code")
+def submission_code_blobs(engine):
+    # code_blobs itself comes from create_all(); only existing tables are altered here
+    add_column(engine, "submissions", "code_hash VARCHAR(64) REFERENCES code_blobs (hash)")
+    create_index(engine, _table_index(Submission.__table__, 'ix_submissions_code_hash'))
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE submissions ALTER COLUMN code DROP NOT NULL"))
+
+    # Stream old rows in id order, one short transaction per batch, so the
+    # table is never locked for long and a restart resumes where it stopped
+    blob_insert = text(
+        "INSERT INTO code_blobs (hash, data, size, created_at) VALUES (:hash, :data, :size, :created_at)"
+        " ON CONFLICT (hash) DO NOTHING"
+    )
+    last_id = 0
+    converted = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text("SELECT id, code FROM submissions"
+                     " WHERE id > :last AND code_hash IS NULL AND code IS NOT NULL"
+                     " ORDER BY id LIMIT :n"),
+                {"last": last_id, "n": CODE_BATCH_SIZE}
+            ).all()
+            if not rows:
+                break
+
+            now = datetime.utcnow()
+            blobs = {}
+            updates = []
+            for sub_id, code in rows:
+                digest, blob = make_blob(code)
+                blobs[digest] = dict(blob, created_at=now)
+                updates.append({"id": sub_id, "hash": digest})
+
+            conn.execute(blob_insert, list(blobs.values()))
+            conn.execute(
+                text("UPDATE submissions SET code_hash = :hash, code = NULL WHERE id = :id"),
+                updates
+            )
+        last_id = rows[-1][0]
+        converted += len(rows)
+        logger.info(f"   🔄 Converted {converted} submissions")
+
+
+@migration(3, "problem content hash")
+def problem_content_hash(engine):
+    add_column(engine, "problems", "content_hash VARCHAR(64)")
+
+
+@migration(4, "per-problem resource limits")
+def problem_resource_limits(engine):
+    add_column(engine, "problems", "time_limit_ms INTEGER")
+    add_column(engine, "problems", "memory_limit_mb INTEGER")
+
+
+@migration(5, "submission runtime and memory")
+def submission_performance(engine):
+    # performance_histograms itself comes from create_all()
+    add_column(engine, "submissions", "runtime_ms FLOAT")
+    add_column(engine, "submissions", "memory_kb INTEGER")
+
+
+@migration(6, "problem answer comparison options")
+def problem_compare_options(engine):
+    add_column(engine, "problems", "float_tolerance FLOAT")
+    add_column(engine, "problems", "unordered_output BOOLEAN")
+
+
+@migration(7, "submission language")
+def submission_language(engine):
+    add_column(engine, "run_jobs", "language VARCHAR(20)")
+    add_column(engine, "submissions", "language VARCHAR(20)")
+
+
+@migration(8, "problem stress tests")
+def problem_stress_test(engine):
+    json_type = "JSONB" if engine.dialect.name == "postgresql" else "JSON"
+    add_column(engine, "problems", f"stress_test {json_type}")
+
+
+@migration(9, "drop unused submission indexes")
+def drop_unused_submission_indexes(engine):
+    # Created by early versions of migration 1; no query reads them, and every
+    # submission write paid for them
+    for name in ['ix_submissions_user_timestamp', 'ix_submissions_problem_status']:
+        logger.info(f"   ➖ Index {name}")
+        drop_index(engine, name)
+
+
+# ======================================================
+# RUNNER
+# ======================================================
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version INTEGER PRIMARY KEY,"
+            " name VARCHAR(200) NOT NULL,"
+            " applied_at TIMESTAMP NOT NULL)"
+        ))
+
+
+def applied_versions(engine):
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return set(r[0] for r in conn.execute(text("SELECT version FROM schema_migrations")))
+
+
+def pending(engine):
+    done = applied_versions(engine)
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def upgrade(engine=None):
+    """Create missing tables, then apply pending migrations in order."""
+    engine = engine or db.engine
+    db.create_all()
+
+    applied = 0
+    for version, name, fn in pending(engine):
+        logger.info(f"🛠️ Migration {version}: {name}")
+        fn(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.utcnow()}
+            )
+        applied += 1
+    return applied
+
+
+# ======================================================
+# QUERY PLAN CHECKS
+# ======================================================
+
+# Hot queries, built by the code that sends them, and the indexes each may
+# use (primary keys are named differently on Postgres and SQLite). Values
+# are inlined the way psycopg2 sends them, which is what lets Postgres match
+# the partial index's WHERE clause.
+HOT_QUERIES = [
+    (
+        "progress backfill",
+        lambda: progress.first_solves_query(),
+        ("ix_submissions_user_problem_passed",),
+    ),
+    (
+        "solved set",
+        lambda: progress.solved_ids_query(1),
+        ("user_progress_pkey", "sqlite_autoindex_user_progress_1"),
+    ),
+    (
+        "performance beats",
+        lambda: rankings.histogram_query("p"),
+        ("performance_histograms_pkey", "sqlite_autoindex_performance_histograms_1"),
+    ),
+]
+
+
+def compile_sql(conn, query):
+    """SQL text of a Query or statement with its parameters inlined."""
+    statement = getattr(query, "statement", query)
+    return str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def explain(conn, sql):
+    """Return the query plan as text (Postgres or SQLite)."""
+    if conn.dialect.name == "postgresql":
+        # Ask whether the index is usable at all, independent of table size
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = conn.execute(text(f"EXPLAIN {sql}")).all()
+        return "\n".join(r[0] for r in rows)
+    rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return "\n".join(str(r[-1]) for r in rows)
+
+
+def check_query_plans(engine=None):
+    """Return a list of (label, index, plan) for hot queries that don't use their index."""
+    engine = engine or db.engine
+    failures = []
+    with engine.begin() as conn:
+        for label, build, indexes in HOT_QUERIES:
+            plan = explain(conn, compile_sql(conn, build()))
+            if not any(index in plan for index in indexes):
+                failures.append((label, " or ".join(indexes), plan))
+    return failures
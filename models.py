@@ -1,28 +1,54 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import JSON
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import deferred
 from datetime import datetime
+import zlib
 
 db = SQLAlchemy()
 
+# JSONB on Postgres, plain JSON elsewhere, so the app also runs on SQLite (local runs, bench.py)
+JSONType = JSON().with_variant(postgresql.JSONB(), "postgresql")
+
+def conflict_insert(model):
+    """INSERT supporting on_conflict_do_nothing/do_update, or None on other dialects."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    return None
+
 class Problem(db.Model):
     __tablename__ = 'problems'
     
     id = db.Column(db.String(100), primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     difficulty = db.Column(db.String(50))
-    tags = db.Column(JSONB, default=[]) 
-    hints = db.Column(JSONB, default=[])
-    signature = db.Column(db.Text, nullable=True) # function_signature
-    description = db.Column(db.Text, nullable=True)
-    sample_input = db.Column(db.Text, nullable=True)
-    sample_output = db.Column(db.Text, nullable=True)
-    test_cases = db.Column(JSONB, default=[]) # The actual test cases for evaluation
+    tags = db.Column(JSONType, default=[]) 
+    # Heavy fields are deferred: listing queries never load them, the problem
+    # page undefers 'content' and the runner undefers 'tests' (see catalog.py)
+    hints = deferred(db.Column(JSONType, default=[]), group='content')
+    signature = deferred(db.Column(db.Text, nullable=True), group='content') # function_signature
+    description = deferred(db.Column(db.Text, nullable=True), group='content')
+    sample_input = deferred(db.Column(db.Text, nullable=True), group='content')
+    sample_output = deferred(db.Column(db.Text, nullable=True), group='content')
+    test_cases = deferred(db.Column(JSONType, default=[]), group='tests') # The actual test cases for evaluation
+    stress_test = deferred(db.Column(JSONType, nullable=True), group='tests') # input generator + expected complexity, see runner/stress.py
     
+    # Per-problem resource limits; NULL means the runner default (see runner/code_runner.py)
+    time_limit_ms = db.Column(db.Integer, nullable=True) # CPU time per test case
+    memory_limit_mb = db.Column(db.Integer, nullable=True) # address space per submission
+    # Answer comparison options, see runner/checker.py
+    float_tolerance = db.Column(db.Float, nullable=True) # numbers within this distance match
+    unordered_output = db.Column(db.Boolean, nullable=True) # lists match in any order
+
+    content_hash = db.Column(db.String(64), nullable=True) # hash of the imported fields, see migrate_to_db.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    def to_dict(self):
-        return {
+    def to_dict(self, include_tests=True):
+        data = {
             "id": self.id,
             "title": self.title,
             "difficulty": self.difficulty,
@@ -32,8 +58,16 @@ class Problem(db.Model):
             "description": self.description,
             "sample_input": self.sample_input,
             "sample_output": self.sample_output,
-            "test_cases": self.test_cases 
+            "time_limit_ms": self.time_limit_ms,
+            "memory_limit_mb": self.memory_limit_mb,
+            "float_tolerance": self.float_tolerance,
+            "unordered_output": self.unordered_output,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
+        if include_tests:
+            data["test_cases"] = self.test_cases
+            data["stress_test"] = self.stress_test
+        return data
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -55,10 +89,92 @@ class Submission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     problem_id = db.Column(db.String(100), db.ForeignKey('problems.id'), nullable=False)
-    code = db.Column(db.Text, nullable=False)
+    code = db.Column(db.Text, nullable=True) # legacy inline source; new rows use code_hash
+    code_hash = db.Column(db.String(64), db.ForeignKey('code_blobs.hash'), nullable=True, index=True)
     status = db.Column(db.String(20), nullable=False) # 'passed' or 'failed'
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    runtime_ms = db.Column(db.Float, nullable=True) # CPU time summed over the cases that ran
+    memory_kb = db.Column(db.Integer, nullable=True) # highest per-case peak RSS
+    language = db.Column(db.String(20), nullable=True) # runner/languages.py id; NULL = python
     
+    # Hot-path indexes; existing databases get them from migrations.py
+    __table_args__ = (
+        db.Index(
+            'ix_submissions_user_problem_passed', 'user_id', 'problem_id',
+            postgresql_where=db.text("status = 'passed'"),
+            sqlite_where=db.text("status = 'passed'")
+        ),
+    )
+
     # Relationships
     user = db.relationship('User', backref=db.backref('submissions', lazy=True))
     problem = db.relationship('Problem', backref=db.backref('submissions', lazy=True))
+    blob = db.relationship('CodeBlob')
+
+    @property
+    def source(self):
+        """Submitted code, from the blob store or the legacy inline column."""
+        if self.blob is not None:
+            return self.blob.text()
+        return self.code
+
+class CodeBlob(db.Model):
+    """Content-addressed, compressed submission source, shared by identical submissions."""
+    __tablename__ = 'code_blobs'
+
+    hash = db.Column(db.String(64), primary_key=True) # sha256 of the UTF-8 source
+    data = db.Column(db.LargeBinary, nullable=False) # zlib-compressed source
+    size = db.Column(db.Integer, nullable=False) # uncompressed bytes
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def text(self):
+        return zlib.decompress(self.data).decode()
+
+class RunJob(db.Model):
+    __tablename__ = 'run_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    problem_id = db.Column(db.String(100), nullable=False)
+    code = db.Column(db.Text, nullable=False)
+    language = db.Column(db.String(20), nullable=True) # NULL = python
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True) # 'queued', 'running' or 'done'
+    progress = db.Column(JSONType, nullable=True) # details of the cases finished so far
+    result = db.Column(JSONType, nullable=True) # {"passed": bool, "details": [...]}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        data = {"job_id": self.id, "status": self.status}
+        if self.status == 'done' and self.result is not None:
+            data.update(self.result)
+        return data
+
+class UserProgress(db.Model):
+    """One row per (user, problem) the user has solved. Maintained by progress.py."""
+    __tablename__ = 'user_progress'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    problem_id = db.Column(db.String(100), db.ForeignKey('problems.id'), primary_key=True)
+    solved_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UserStats(db.Model):
+    """Precomputed per-user solved counters. Maintained by progress.py."""
+    __tablename__ = 'user_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    solved = db.Column(db.Integer, nullable=False, default=0)
+    easy_solved = db.Column(db.Integer, nullable=False, default=0)
+    med_solved = db.Column(db.Integer, nullable=False, default=0)
+    hard_solved = db.Column(db.Integer, nullable=False, default=0)
+    version = db.Column(db.Integer, nullable=False, default=0) # bumped on every change
+
+class PerformanceHistogram(db.Model):
+    """Per-problem distribution of accepted runtimes and memory. Maintained by rankings.py."""
+    __tablename__ = 'performance_histograms'
+
+    problem_id = db.Column(db.String(100), db.ForeignKey('problems.id'), primary_key=True)
+    metric = db.Column(db.String(16), primary_key=True) # 'runtime' or 'memory', e.g. 'runtime.cpp' for other languages
+    bucket = db.Column(db.Integer, primary_key=True) # log-scale bucket, see rankings.bucket_for
+    count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,118 @@
+"""
+Incrementally maintained per-user progress.
+
+``user_progress`` holds one row per solved (user, problem) and ``user_stats``
+holds the per-difficulty counters the dashboard shows. ``record_solve`` is
+called in the same transaction as the passing Submission, so both pages
+read progress with a constant number of small queries instead of scanning
+``submissions``.
+
+Counters are bucketed by the problem's difficulty at solve time; run
+``backfill_progress.py`` to rebuild everything from ``submissions`` (e.g.
+after changing problem difficulties).
+"""
+from sqlalchemy import update
+
+from models import db, conflict_insert, Problem, Submission, UserProgress, UserStats
+
+DIFFICULTY_COUNTERS = {"easy": "easy_solved", "med": "med_solved", "hard": "hard_solved"}
+
+
+def difficulty_bucket(difficulty):
+    """Map a free-form difficulty to 'easy', 'med', 'hard' or None."""
+    diff = (difficulty or "Easy").lower()
+    if "easy" in diff:
+        return "easy"
+    if "medium" in diff:
+        return "med"
+    if "hard" in diff:
+        return "hard"
+    return None
+
+
+def _insert_ignore(model, values):
+    """INSERT ... ON CONFLICT DO NOTHING; returns True if a row was inserted."""
+    stmt = conflict_insert(model)
+    if stmt is None:
+        keys = [values[c.name] for c in model.__table__.primary_key.columns]
+        if db.session.get(model, tuple(keys)) is not None:
+            return False
+        db.session.add(model(**values))
+        db.session.flush()
+        return True
+    return db.session.execute(stmt.values(**values).on_conflict_do_nothing()).rowcount > 0
+
+
+def record_solve(user_id, problem_id, difficulty):
+    """Mark a problem solved for a user. Call inside the Submission's transaction."""
+    if not _insert_ignore(UserProgress, {"user_id": user_id, "problem_id": problem_id}):
+        return False
+
+    _insert_ignore(UserStats, {"user_id": user_id})
+    changes = {
+        "solved": UserStats.solved + 1,
+        "version": UserStats.version + 1,
+    }
+    counter = DIFFICULTY_COUNTERS.get(difficulty_bucket(difficulty))
+    if counter:
+        changes[counter] = getattr(UserStats, counter) + 1
+    db.session.execute(
+        update(UserStats).where(UserStats.user_id == user_id).values(**changes)
+    )
+    return True
+
+
+def solved_ids_query(user_id):
+    return db.session.query(UserProgress.problem_id).filter_by(user_id=user_id)
+
+
+def solved_ids(user_id):
+    rows = solved_ids_query(user_id).all()
+    return set(r[0] for r in rows)
+
+
+def user_stats(user_id):
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        return {"solved": 0, "easy_solved": 0, "med_solved": 0, "hard_solved": 0, "version": 0}
+    return {
+        "solved": stats.solved,
+        "easy_solved": stats.easy_solved,
+        "med_solved": stats.med_solved,
+        "hard_solved": stats.hard_solved,
+        "version": stats.version,
+    }
+
+
+def first_solves_query():
+    """(user_id, problem_id, first accepted timestamp) for every solved pair."""
+    return db.session.query(
+        Submission.user_id, Submission.problem_id, db.func.min(Submission.timestamp)
+    ).filter_by(status='passed').group_by(Submission.user_id, Submission.problem_id)
+
+
+def backfill():
+    """Rebuild user_progress and user_stats from submissions. Returns the number of users."""
+    first_solves = first_solves_query().all()
+
+    difficulties = dict(db.session.query(Problem.id, Problem.difficulty).all())
+    # Keep versions moving forward so clients holding an old version see a change
+    old_versions = dict(db.session.query(UserStats.user_id, UserStats.version).all())
+
+    db.session.query(UserProgress).delete()
+    db.session.query(UserStats).delete()
+
+    stats = {}
+    for user_id, problem_id, solved_at in first_solves:
+        db.session.add(UserProgress(user_id=user_id, problem_id=problem_id, solved_at=solved_at))
+        counters = stats.setdefault(user_id, {"solved": 0, "easy_solved": 0, "med_solved": 0, "hard_solved": 0})
+        counters["solved"] += 1
+        counter = DIFFICULTY_COUNTERS.get(difficulty_bucket(difficulties.get(problem_id)))
+        if counter:
+            counters[counter] += 1
+
+    for user_id, counters in stats.items():
+        db.session.add(UserStats(user_id=user_id, version=old_versions.get(user_id, 0) + 1, **counters))
+
+    db.session.commit()
+    return len(stats)
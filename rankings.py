@@ -0,0 +1,103 @@
+"""
+Runtime and memory ranking against accepted submissions.
+
+Each problem keeps a log-scale histogram per metric in
+``performance_histograms``: one row per (problem, metric, bucket) holding a
+count. ``record`` bumps two counters when a submission is accepted, and
+``beats`` reads at most a few hundred rows for the problem, so "faster than
+80% of accepted submissions" costs the same whether the problem has ten
+accepted submissions or ten million.
+
+Buckets are ``BUCKETS_PER_DOUBLING`` per factor of two (about 9% wide), which
+is finer than the run-to-run noise of the measurements themselves.
+
+Languages are ranked separately (a C++ solution beating every Python one
+says nothing): other languages use metrics suffixed with their id, e.g.
+``runtime.cpp``, while Python keeps the plain names.
+"""
+import math
+
+from models import db, conflict_insert, PerformanceHistogram
+
+BUCKETS_PER_DOUBLING = 8
+MIN_VALUE = 0.001  # values are clamped here before taking the log
+
+METRICS = ("runtime", "memory")
+
+
+def bucket_for(value):
+    return math.floor(math.log2(max(value, MIN_VALUE)) * BUCKETS_PER_DOUBLING)
+
+
+def summarise(details):
+    """Submission aggregates from runner details: (total CPU ms, peak memory KB).
+
+    Either value is None when the runner did not report it (process mode).
+    """
+    cpu = [d["cpu_ms"] for d in details if d.get("cpu_ms") is not None]
+    memory = [d["memory_kb"] for d in details if d.get("memory_kb") is not None]
+    runtime_ms = round(sum(cpu), 2) if cpu else None
+    memory_kb = max(memory) if memory else None
+    return runtime_ms, memory_kb
+
+
+def _metric_names(language):
+    if language == "python":
+        return METRICS
+    return tuple(f"{metric}.{language}" for metric in METRICS)
+
+
+def _increment(problem_id, metric, bucket):
+    stmt = conflict_insert(PerformanceHistogram)
+    if stmt is None:
+        row = db.session.get(PerformanceHistogram, (problem_id, metric, bucket))
+        if row is None:
+            db.session.add(PerformanceHistogram(problem_id=problem_id, metric=metric, bucket=bucket, count=1))
+        else:
+            row.count += 1
+        db.session.flush()
+        return
+    stmt = stmt.values(problem_id=problem_id, metric=metric, bucket=bucket, count=1)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["problem_id", "metric", "bucket"],
+        set_={"count": PerformanceHistogram.count + 1}
+    ))
+
+
+def record(problem_id, runtime_ms, memory_kb, language="python"):
+    """Add an accepted submission to the problem's histograms. Call inside its transaction."""
+    for metric, value in zip(_metric_names(language), (runtime_ms, memory_kb)):
+        if value is not None:
+            _increment(problem_id, metric, bucket_for(value))
+
+
+def histogram_query(problem_id, language="python"):
+    """(metric, bucket, count) rows of a problem's histograms in one language."""
+    return db.session.query(
+        PerformanceHistogram.metric, PerformanceHistogram.bucket, PerformanceHistogram.count
+    ).filter(
+        PerformanceHistogram.problem_id == problem_id,
+        PerformanceHistogram.metric.in_(_metric_names(language))
+    )
+
+
+def beats(problem_id, runtime_ms, memory_kb, language="python"):
+    """Percentage of accepted submissions in the same language that used more time / memory."""
+    names = _metric_names(language)
+    rows = histogram_query(problem_id, language).all()
+
+    result = {}
+    for metric, name, value in zip(METRICS, names, (runtime_ms, memory_kb)):
+        if value is None:
+            continue
+        mine = bucket_for(value)
+        total = worse = 0
+        for row_metric, bucket, count in rows:
+            if row_metric != name:
+                continue
+            total += count
+            if bucket > mine:
+                worse += count
+        if total:
+            result[f"{metric}_beats"] = round(100 * worse / total, 1)
+    return result
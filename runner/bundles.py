@@ -0,0 +1,133 @@
+"""
+Compiled test bundles, cached on local disk per problem version.
+
+A problem's ``test_cases`` store each input as source text (``"[1, 2], 3"``)
+that used to be shipped to the harness and parsed again by ``eval`` on
+every run. For inputs with 10^5-element arrays that parse dominates the run.
+
+``load`` compiles the cases once per ``(problem id, updated_at)``: literal
+inputs are parsed with ``ast.literal_eval`` into argument tuples and pickled
+one record per case, next to the parsed expected outputs. The file lives in
+``RUNNER_BUNDLE_DIR``; harness processes memory-map it (see
+runner/harness.py) and unpickle only the cases they run, and every web
+worker on the box reads the same file instead of fetching and re-parsing
+``test_cases`` from the database.
+
+Files are written to a temporary name and renamed, so readers never see a
+partial bundle. Writing a new version removes the problem's older ones.
+Set ``RUNNER_BUNDLE_DIR`` to an empty string to disable bundles.
+"""
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import logging
+
+from runner.checker import parse_expected
+from runner.harness import TestBundle, parse_input, BUNDLE_MAGIC, BUNDLE_VERSION, BUNDLE_HEADER, BUNDLE_ENTRY
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_DIR = os.getenv("RUNNER_BUNDLE_DIR", os.path.join(tempfile.gettempdir(), "dynocode-bundles"))
+
+_lock = threading.Lock()
+_stats = {"loaded": 0, "built": 0, "build_ms": 0.0, "source_cases": 0}
+
+
+def _problem_key(problem_id):
+    return hashlib.sha256(str(problem_id).encode()).hexdigest()[:16]
+
+
+def bundle_path(problem_id, version, extension=".bundle"):
+    version_key = hashlib.sha256(str(version).encode()).hexdigest()[:16]
+    return os.path.join(BUNDLE_DIR, f"{_problem_key(problem_id)}-{version_key}{extension}")
+
+
+def write_bundle(path, test_cases, expected):
+    """Compile ``test_cases`` into a bundle at ``path``; returns the number of non-literal inputs."""
+    records = [parse_input(case["input"]) for case in test_cases]
+    write_records(path, records, {"test_cases": test_cases, "expected": expected})
+    return sum(1 for record in records if record[0] == "source")
+
+
+def write_records(path, records, meta):
+    """Write case ``records`` and a ``meta`` dict as a bundle at ``path``, replacing older versions."""
+    blobs = [pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL) for record in records]
+    meta = pickle.dumps(meta, protocol=pickle.HIGHEST_PROTOCOL)
+
+    offset = BUNDLE_HEADER.size + BUNDLE_ENTRY.size * len(blobs)
+    entries = []
+    for blob in blobs:
+        entries.append(BUNDLE_ENTRY.pack(offset, len(blob)))
+        offset += len(blob)
+    header = BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(blobs), offset, len(meta))
+
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(b"".join(entries))
+            for blob in blobs:
+                f.write(blob)
+            f.write(meta)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # Same problem and file type, other version
+    name, extension = os.path.splitext(os.path.basename(path))
+    for old in glob.glob(os.path.join(os.path.dirname(path), name.split("-")[0] + "-*" + extension)):
+        if old != path:
+            try:
+                os.unlink(old)
+            except OSError:
+                pass
+
+
+def load(problem_id, version, fetch_cases):
+    """Return ``(bundle path or None, test_cases, parsed expected outputs)`` for a problem version.
+
+    ``fetch_cases()`` is only called when no bundle exists yet.
+    """
+    if not BUNDLE_DIR or version is None:
+        cases = fetch_cases()
+        return None, cases, [parse_expected(case["output"]) for case in cases]
+
+    path = bundle_path(problem_id, version)
+    try:
+        meta = TestBundle(path).meta()
+        with _lock:
+            _stats["loaded"] += 1
+        return path, meta["test_cases"], meta["expected"]
+    except (OSError, ValueError, pickle.UnpicklingError):
+        pass
+
+    start = time.perf_counter()
+    cases = fetch_cases()
+    expected = [parse_expected(case["output"]) for case in cases]
+    try:
+        source_cases = write_bundle(path, cases, expected)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not write test bundle for {problem_id}: {e}")
+        return None, cases, expected
+
+    elapsed = (time.perf_counter() - start) * 1000
+    with _lock:
+        _stats["built"] += 1
+        _stats["build_ms"] += elapsed
+        _stats["source_cases"] += source_cases
+    logger.info(f"📦 Compiled test bundle for {problem_id} ({len(cases)} cases, {elapsed:.0f}ms)")
+    return path, cases, expected
+
+
+def stats():
+    with _lock:
+        return dict(_stats, dir=BUNDLE_DIR or None, build_ms=round(_stats["build_ms"], 1))
@@ -0,0 +1,150 @@
+"""
+Structured comparison of solve() results against expected outputs.
+
+The harness sends ``solve()``'s return value as JSON (lists, dicts, numbers,
+strings, booleans, None), with tuples and sets turned into lists. Expected
+outputs are stored as text in ``test_cases`` and parsed here once per problem
+version (see catalog.py), as JSON first and then as a Python literal, so
+both ``"[0, 1]"`` and ``"(0, 1)"`` or ``"True"`` work.
+
+Per-problem options (``Problem.float_tolerance``, ``Problem.unordered_output``):
+
+* ``tolerance``: numbers match when within this relative or absolute distance.
+* ``unordered``: lists match regardless of order, at every nesting level.
+
+With both set, items are paired up by tolerance rather than by their sorted
+text, which would put ``9.9999999`` and ``10.0`` in different places: flat
+lists are sorted numerically and compared in order, and lists of lists or
+dicts are matched item by item (each expected item used once).
+
+Values that can't be parsed or serialised fall back to comparing text, the
+way the runner always did.
+"""
+import ast
+import json
+import math
+
+TEXT = "text"
+VALUE = "value"
+
+
+def _plain(value):
+    """Literal-eval output (tuples, sets) as the JSON-shaped value the harness would send."""
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_plain(v) for v in value), key=_canonical)
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    return value
+
+
+def parse_expected(text):
+    """Parse an expected output once: ``(VALUE, parsed, text)`` or ``(TEXT, None, text)``."""
+    text = (text or "").strip()
+    try:
+        return VALUE, json.loads(text), text
+    except ValueError:
+        pass
+    try:
+        return VALUE, _plain(ast.literal_eval(text)), text
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return TEXT, None, text
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def _sorted_deep(value):
+    if isinstance(value, list):
+        return sorted((_sorted_deep(v) for v in value), key=_canonical)
+    if isinstance(value, dict):
+        return {k: _sorted_deep(v) for k, v in value.items()}
+    return value
+
+
+def _order(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return 0, value, ""
+    return 1, 0, _canonical(value)
+
+
+def _same_items(actual, expected, tolerance):
+    """Unordered list match under a tolerance: a one-to-one pairing of close items."""
+    if len(actual) != len(expected):
+        return False
+    actual, expected = sorted(actual, key=_order), sorted(expected, key=_order)
+    if all(_equal(a, e, tolerance, True) for a, e in zip(actual, expected)):
+        return True
+    if not any(isinstance(v, (list, dict)) for v in actual + expected):
+        return False  # sorted numerically, so no other pairing of scalars can do better
+
+    # Nested items: bipartite matching, each expected item claimed by one actual item
+    owner = [None] * len(expected)
+
+    def claim(i, seen):
+        for j, e in enumerate(expected):
+            if j not in seen and _equal(actual[i], e, tolerance, True):
+                seen.add(j)
+                if owner[j] is None or claim(owner[j], seen):
+                    owner[j] = i
+                    return True
+        return False
+
+    return all(claim(i, set()) for i in range(len(actual)))
+
+
+def _equal(actual, expected, tolerance, unordered=False):
+    if isinstance(actual, bool) or isinstance(expected, bool):
+        return isinstance(actual, bool) and isinstance(expected, bool) and actual == expected
+    if isinstance(actual, (int, float)) and isinstance(expected, (int, float)):
+        if tolerance:
+            return math.isclose(actual, expected, rel_tol=tolerance, abs_tol=tolerance)
+        return actual == expected
+    if isinstance(actual, list) and isinstance(expected, list):
+        if unordered:
+            return _same_items(actual, expected, tolerance)
+        return len(actual) == len(expected) and all(
+            _equal(a, e, tolerance) for a, e in zip(actual, expected)
+        )
+    if isinstance(actual, dict) and isinstance(expected, dict):
+        return actual.keys() == expected.keys() and all(
+            _equal(actual[k], expected[k], tolerance, unordered) for k in actual
+        )
+    return type(actual) == type(expected) and actual == expected
+
+
+def values_match(actual, expected, tolerance=None, unordered=False):
+    """Structural equality, with the problem's tolerance / ordering options."""
+    if unordered and tolerance:
+        return _equal(actual, expected, tolerance, unordered=True)
+    if unordered:
+        actual, expected = _sorted_deep(actual), _sorted_deep(expected)
+    return _equal(actual, expected, tolerance)
+
+
+def check(event, expected, tolerance=None, unordered=False):
+    """Compare a harness "ok" event with a parsed expected output.
+
+    Returns ``(passed, got)`` where ``got`` is the answer as shown to the user.
+    """
+    kind, want, text = expected
+
+    if "result" in event:
+        actual = event["result"]
+        if actual is None and event.get("stdout") and not (kind == VALUE and want is None):
+            # solve() printed its answer instead of returning it
+            return check({"result_text": event["stdout"]}, expected, tolerance, unordered)
+        got = json.dumps(actual)
+        if kind == VALUE:
+            return values_match(actual, want, tolerance, unordered), got
+        return got == text or str(actual) == text, got
+
+    # Not JSON-serialisable (or printed): compare as text, parsing it if we can
+    got = event.get("result_text", "").strip()
+    if kind == VALUE:
+        got_kind, got_value, _ = parse_expected(got)
+        if got_kind == VALUE and values_match(got_value, want, tolerance, unordered):
+            return True, got
+    return got == text, got
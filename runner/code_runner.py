@@ -1,91 +1,94 @@
 import subprocess
 import tempfile
 import sys
+import os
+import json
+import math
+import time
+import select
+import queue
+import signal
+import threading
 import logging
 
+from runner.pool import get_pool
+from runner.remote import get_client
+from runner.precheck import precheck
+from runner import languages, stress
+from runner.checker import check, parse_expected
+import metrics
+
 logger = logging.getLogger(__name__)
 
+# "batch" runs every test case in one interpreter (runner/harness.py),
+# "process" starts a fresh harness for every test case.
+RUNNER_MODE = os.getenv("RUNNER_MODE", "batch")
 
-def evaluate_code(user_code, problem):
-    logger.info(f"Runner started for problem: {problem.get('id', 'unknown')}")
-    results = []
+# Resource limits, overridable per problem (Problem.time_limit_ms / memory_limit_mb).
+# Time is CPU time, so a busy host slows a run down without failing it; the
+# wall-clock deadline is only a backstop for code that blocks or sleeps.
+DEFAULT_TIME_LIMIT_MS = int(os.getenv("RUNNER_TIME_LIMIT_MS", "2000"))    # CPU time per test case
+DEFAULT_MEMORY_LIMIT_MB = int(os.getenv("RUNNER_MEMORY_LIMIT_MB", "256"))  # 0 = no memory limit
+WALL_TIME_FACTOR = float(os.getenv("RUNNER_WALL_FACTOR", "3"))            # wall deadline = CPU limit x factor + 1s
 
-    for idx, case in enumerate(problem["test_cases"], start=1):
+# Parallel mode: shard one submission's cases across up to this many
+# harness processes (1 = sequential). Shards beyond the first come from a
+# process-wide budget of one per core but one, so one submission can't take
+# every core; a single-core host always runs sequentially.
+RUNNER_PARALLELISM = int(os.getenv("RUNNER_PARALLELISM", "1"))
+MIN_CASES_PER_SHARD = 4
+CANCEL_POLL = 0.05  # seconds between cancellation checks while a shard waits
+_extra_shards = threading.BoundedSemaphore(max(0, (os.cpu_count() or 1) - 1))
 
-        full_code = (
-            user_code.strip()
-            + "\n\n"
-            + "if __name__ == '__main__':\n"
-            + f"    result = solve({case['input']})\n"
-            + "    if result is not None:\n"
-            + "        print(result)\n"
-        )
+HARNESS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "harness.py")
 
-        with tempfile.NamedTemporaryFile(
-            suffix=".py", mode="w", delete=False
-        ) as f:
-            f.write(full_code)
-            filename = f.name
 
-        try:
-            proc = subprocess.run(
-                [sys.executable, filename],
-                capture_output=True,
-                text=True,
-                timeout=2
-            )
-            
-            if proc.stderr:
-                results.append({
-                    "index": idx,
-                    "status": "error",
-                    "error": proc.stderr.strip()
-                })
-                logger.warning(f"Result: ERROR (Stderr) - {proc.stderr.strip()[:100]}...")
-                break
-                
-        except subprocess.TimeoutExpired:
-            logger.warning("Result: TIMEOUT (2s)")
-            results.append({
-                "index": idx,
-                "status": "error",
-                "error": "Time Limit Exceeded (2s)"
-            })
-            break
-        except Exception as e:
-            results.append({
-                "index": idx,
-                "status": "error",
-                "error": f"Internal Execution Error: {str(e)}"
-            })
-            break
-        finally:
-            # Clean up the temp file
-            import os
-            try:
-                os.unlink(filename)
-            except OSError:
-                pass
-
-        output = proc.stdout.strip()
-        expected = case["output"]
-
-        if output == expected:
-            results.append({
-                "index": idx,
-                "status": "passed"
-            })
-        else:
-            results.append({
-                "index": idx,
-                "status": "failed",    
-                "input": case["input"],
-                "expected": expected,
-                "got": output
-            })
-            break
+def evaluate_code(user_code, problem, on_result=None, language=languages.DEFAULT_LANGUAGE, on_compile=None):
+    """Run every test case; ``on_result(detail)`` is called as each case finishes.
+
+    For compiled languages ``on_compile({"compile_ms", "cached"})`` is called
+    once the program is built (see runner/languages.py).
+    """
+    logger.info(f"Runner started for problem: {problem.get('id', 'unknown')} ({language})")
+
+    # Syntax errors, no solve(), wrong arity: answer without starting a process
+    rejected = precheck(user_code.strip(), problem) if language == "python" else None
+    if rejected is not None:
+        logger.info(f"Result: REJECTED by pre-check ({rejected['verdict']})")
+        if on_result is not None:
+            on_result(rejected)
+        return False, [rejected]
+
+    limits = resource_limits(problem)
+    options = compare_options(problem)
+    cases = _prepare_cases(problem)
+
+    if language != "python":
+        # Built once, then one process per case: there is no interpreter state to share
+        details = _evaluate_batch(user_code, cases, limits, options, language=language, on_compile=on_compile)
+    elif RUNNER_MODE == "process":
+        details = _evaluate_per_process(user_code, cases, limits, options)
+    elif RUNNER_PARALLELISM > 1:
+        details = _evaluate_parallel(user_code, cases, limits, options)
+    else:
+        details = _evaluate_batch(user_code, cases, limits, options)
+
+    results = []
+    for detail in details:
+        results.append(detail)
+        if on_result is not None:
+            on_result(detail)
 
     passed_all = all(r["status"] == "passed" for r in results)
+
+    # Correct on the fixed cases: now check how the running time grows
+    stress_test = problem.get("stress_test")
+    if passed_all and stress_test is not None:
+        detail = _evaluate_stress(user_code, stress_test, limits, len(results) + 1, language)
+        results.append(detail)
+        if on_result is not None:
+            on_result(detail)
+        passed_all = detail["status"] == "passed"
     
     if passed_all:
         logger.info("Result: PASSED ALL TESTS")
@@ -93,3 +96,486 @@ def evaluate_code(user_code, problem):
         logger.info(f"Result: FAILED (Passed {sum(1 for r in results if r['status']=='passed')}/{len(problem['test_cases'])})")
 
     return passed_all, results
+
+
+def resource_limits(problem):
+    """CPU (ms per case) and memory (MB) limits for a problem, falling back to the defaults."""
+    return {
+        "cpu_ms": problem.get("time_limit_ms") or DEFAULT_TIME_LIMIT_MS,
+        "memory_mb": problem.get("memory_limit_mb") or DEFAULT_MEMORY_LIMIT_MB,
+    }
+
+
+def compare_options(problem):
+    """Keyword arguments for checker.check from the problem's comparison settings."""
+    return {
+        "tolerance": problem.get("float_tolerance"),
+        "unordered": bool(problem.get("unordered_output")),
+    }
+
+
+def _prepare_cases(problem):
+    """Test cases with their parsed expected output and their position in the problem's test bundle.
+
+    The catalog supplies both the parsed outputs and the bundle (runner/bundles.py);
+    without them outputs are parsed here and inputs are sent as source text.
+    """
+    cases = problem["test_cases"]
+    expected = problem.get("expected")
+    if expected is None:
+        expected = [parse_expected(case["output"]) for case in cases]
+    bundle = problem.get("bundle")
+    return [
+        dict(case, expected=value, position=position, bundle=bundle)
+        for position, (case, value) in enumerate(zip(cases, expected))
+    ]
+
+
+def _wall_timeout(limits):
+    return limits["cpu_ms"] / 1000 * WALL_TIME_FACTOR + 1
+
+
+def _limit_detail(index, verdict, limits, usage=None):
+    """Error detail for a test case stopped by a resource limit."""
+    if verdict == "time_limit":
+        error = f"Time Limit Exceeded ({limits['cpu_ms']} ms CPU)"
+    else:
+        error = f"Memory Limit Exceeded ({limits['memory_mb']} MB)"
+    logger.warning(f"Result: {error}")
+    detail = {
+        "index": index,
+        "status": "error",
+        "verdict": verdict,
+        "error": error
+    }
+    if usage is not None:
+        detail.update(usage)
+    return detail
+
+
+# ======================================================
+# BATCH MODE (one interpreter per submission)
+# ======================================================
+
+class HarnessProcess:
+    """A dedicated harness interpreter started for one submission."""
+
+    kind = "process"
+
+    def __init__(self, job):
+        self.buffer = b""
+        self._read_fd, write_fd = os.pipe()
+        self._stderr = tempfile.TemporaryFile(mode="w+")
+        try:
+            self.proc = subprocess.Popen(
+                [sys.executable, HARNESS_PATH, str(write_fd)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=self._stderr,
+                pass_fds=(write_fd,),
+                start_new_session=True,  # killed as a group, with any program it started
+                text=True
+            )
+        except Exception:
+            os.close(self._read_fd)
+            self._stderr.close()
+            raise
+        finally:
+            os.close(write_fd)
+
+        try:
+            self.proc.stdin.write(json.dumps(job))
+            self.proc.stdin.close()
+        except OSError:
+            # The child died before reading its job; reported as a crash
+            pass
+
+    def fileno(self):
+        return self._read_fd
+
+    def read(self):
+        return os.read(self._read_fd, 65536)
+
+    def kill(self):
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def exit_status(self):
+        return self.proc.wait()
+
+    def crash_error(self, returncode=None):
+        self.proc.wait()
+        self._stderr.seek(0)
+        error = self._stderr.read().strip()
+        if not error and self.proc.returncode < 0:
+            error = f"Process killed by {signal.Signals(-self.proc.returncode).name}"
+        return error or f"Process exited with code {self.proc.returncode}"
+
+    def close(self):
+        os.close(self._read_fd)
+        self.kill()
+        self.proc.wait()
+        self._stderr.close()
+
+
+def start_local_harness(job):
+    """Run ``job`` on this machine: in a warm pooled child if there is a pool, else a new interpreter."""
+    pool = get_pool()
+    if pool is not None:
+        return pool.start(job)
+    return HarnessProcess(job)
+
+
+def _start_harness(job):
+    client = get_client()
+    if client is not None:
+        # Standalone runner service (runner/service.py)
+        return client.start(job)
+    return start_local_harness(job)
+
+
+def _bundle_readable(bundle):
+    """Whether the process that runs the job can open the bundle file by path."""
+    if not bundle or not os.path.exists(bundle):
+        return False
+    client = get_client()
+    return client is None or client.shares_files()
+
+
+def _evaluate_batch(user_code, cases, limits, options, first_index=1, cancel=None,
+                    language="python", on_compile=None):
+    """Run ``cases`` (numbered from ``first_index``) in one harness; stops early if ``cancel`` is set."""
+    if not cases:
+        return
+
+    job = {
+        "code": user_code.strip(),
+        "first_index": first_index,
+        "limits": limits,
+    }
+    if language != "python":
+        job["language"] = language
+    bundle = cases[0].get("bundle")
+    if _bundle_readable(bundle):
+        job["bundle"] = {"path": bundle, "cases": [case["position"] for case in cases]}
+    else:
+        # No bundle, a newer problem version replaced it a moment ago, or a
+        # runner node on another machine
+        job["cases"] = [case["input"] for case in cases]
+
+    started = time.perf_counter()
+    try:
+        session = _start_harness(job)
+    except Exception as e:
+        yield {
+            "index": first_index,
+            "status": "error",
+            "verdict": "internal_error",
+            "error": f"Internal Execution Error: {str(e)}"
+        }
+        return
+    metrics.RUNNER_SPAWN.observe(time.perf_counter() - started, backend=session.kind)
+
+    completed = 0
+    drained = False
+    exit_status = None
+    try:
+        wall_timeout = _wall_timeout(limits)
+        for event in _read_events(session, wall_timeout, cancel):
+            if event is None:
+                logger.warning(f"Result: TIMEOUT ({wall_timeout:g}s wall clock)")
+                yield {
+                    "index": first_index + completed,
+                    "status": "error",
+                    "verdict": "time_limit",
+                    "error": f"Wall Time Limit Exceeded ({wall_timeout:g}s)"
+                }
+                break
+
+            if event["event"] in ("loaded", "heartbeat"):
+                continue
+
+            if event["event"] == "compiled":
+                logger.info(f"🛠 Compiled in {event['compile_ms']:.0f}ms" + (" (cached)" if event["cached"] else ""))
+                if on_compile is not None:
+                    on_compile({"compile_ms": round(event["compile_ms"], 2), "cached": event["cached"]})
+                continue
+
+            if event["event"] == "compile_error":
+                logger.warning(f"Result: COMPILE ERROR - {event['error'][:100]}...")
+                yield {
+                    "index": first_index,
+                    "status": "error",
+                    "verdict": "compile_error",
+                    "error": event["error"]
+                }
+                break
+
+            if event["event"] == "exited":
+                # Pooled runner's exit status (see runner/zygote.py)
+                exit_status = event["returncode"]
+                continue
+
+            if event["event"] == "load_error":
+                logger.warning(f"Result: ERROR (Load) - {event['error'][:100]}...")
+                internal = event["error"].startswith("Internal Execution Error")
+                yield {
+                    "index": first_index,
+                    "status": "error",
+                    "verdict": "internal_error" if internal else "runtime_error",
+                    "error": event["error"]
+                }
+                break
+
+            detail = _case_detail(event, cases[event["index"] - first_index], limits, options)
+            completed += 1
+            yield detail
+            if detail["status"] != "passed":
+                break
+        else:
+            if cancel is not None and cancel.is_set():
+                return
+            drained = True
+            if completed < len(cases):
+                # Channel closed early: the interpreter crashed, exited, or
+                # was stopped by RLIMIT_CPU while stuck in C code
+                if exit_status is None:
+                    exit_status = session.exit_status()
+                if exit_status == -signal.SIGXCPU:
+                    yield _limit_detail(first_index + completed, "time_limit", limits)
+                    return
+                error = session.crash_error(exit_status)
+                logger.warning(f"Result: ERROR (Crash) - {error[:100]}...")
+                yield {
+                    "index": first_index + completed,
+                    "status": "error",
+                    "verdict": "crash",
+                    "error": error
+                }
+    finally:
+        if not drained:
+            # Stopped early (failure/timeout): don't let the child run on
+            session.kill()
+        session.close()
+        metrics.RUNNER_EXECUTE.observe(time.perf_counter() - started, backend=session.kind, language=language)
+
+
+def _read_events(session, timeout, cancel=None):
+    """Yield decoded events from a harness session, or None after ``timeout`` seconds without one.
+
+    Returns early, without a timeout marker, once ``cancel`` is set.
+    """
+    buffer = session.buffer
+    fd = session.fileno()
+    deadline = time.monotonic() + timeout
+    while True:
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            deadline = time.monotonic() + timeout
+            yield json.loads(line)
+
+        if cancel is not None and cancel.is_set():
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            yield None
+            return
+        wait = remaining if cancel is None else min(remaining, CANCEL_POLL)
+        ready, _, _ = select.select([fd], [], [], wait)
+        if not ready:
+            continue
+        try:
+            chunk = session.read()
+        except ConnectionResetError:
+            chunk = b""
+        if not chunk:
+            return
+        buffer += chunk
+
+
+# ======================================================
+# PARALLEL MODE (cases sharded across harness processes)
+# ======================================================
+
+def _evaluate_parallel(user_code, cases, limits, options):
+    """Shard ``cases`` across harness processes and yield details in index order.
+
+    The first failing shard cancels the others. Cases after the lowest
+    failing index are dropped, and cases before it that a cancelled shard
+    never reached are run afterwards, in order, so the output is exactly
+    the sequential fail-fast output.
+    """
+    wanted = min(RUNNER_PARALLELISM, len(cases) // MIN_CASES_PER_SHARD)
+    extra = 0
+    while extra < wanted - 1 and _extra_shards.acquire(blocking=False):
+        extra += 1
+    if extra == 0:
+        yield from _evaluate_batch(user_code, cases, limits, options)
+        return
+
+    shard_count = extra + 1
+    size = -(-len(cases) // shard_count)
+    cancel = threading.Event()
+    finished = queue.Queue()
+
+    def run_shard(start):
+        try:
+            for detail in _evaluate_batch(user_code, cases[start:start + size], limits, options, start + 1, cancel):
+                finished.put(detail)
+                if detail["status"] != "passed":
+                    cancel.set()
+        finally:
+            finished.put(None)
+
+    threads = [
+        threading.Thread(target=run_shard, args=(start,), daemon=True)
+        for start in range(0, len(cases), size)
+    ]
+    try:
+        for t in threads:
+            t.start()
+
+        by_index = {}
+        first_failure = None
+        next_index = 1
+        running = len(threads)
+        while running:
+            detail = finished.get()
+            if detail is None:
+                running -= 1
+                continue
+            by_index.setdefault(detail["index"], detail)
+            if detail["status"] != "passed" and (first_failure is None or detail["index"] < first_failure):
+                first_failure = detail["index"]
+
+            # Release the contiguous, in-order prefix as soon as it is known
+            while next_index in by_index and (first_failure is None or next_index <= first_failure):
+                yield by_index[next_index]
+                next_index += 1
+                if first_failure is not None and next_index > first_failure:
+                    cancel.set()
+
+        # Cancelled shards leave gaps before the failure: fill them in order
+        end = first_failure if first_failure is not None else len(cases) + 1
+        index = next_index
+        while index < end:
+            if index in by_index:
+                yield by_index[index]
+                index += 1
+                continue
+            gap_end = index
+            while gap_end < end and gap_end not in by_index:
+                gap_end += 1
+            for detail in _evaluate_batch(user_code, cases[index - 1:gap_end - 1], limits, options, index):
+                yield detail
+                if detail["status"] != "passed":
+                    return  # fails earlier than the cancelled shards' failure
+            index = gap_end
+        if first_failure is not None and first_failure >= next_index:
+            yield by_index[first_failure]
+    finally:
+        cancel.set()
+        for t in threads:
+            t.join()
+        for _ in range(extra):
+            _extra_shards.release()
+
+
+def _usage(event):
+    """Per-case measurements reported by the harness (see runner/harness.py)."""
+    return {
+        "time_ms": round(event["time_ms"], 2),
+        "cpu_ms": round(event["cpu_ms"], 2),
+        "memory_kb": event["memory_kb"],
+    }
+
+
+def _case_detail(event, case, limits, options):
+    idx = event["index"]
+    usage = _usage(event)
+
+    if event["status"] in ("time_limit", "memory_limit"):
+        return _limit_detail(idx, event["status"], limits, usage)
+
+    if event["status"] == "exception":
+        logger.warning(f"Result: ERROR (Exception) - {event['error'][:100]}...")
+        return {
+            "index": idx,
+            "status": "error",
+            "verdict": "runtime_error",
+            "error": event["error"],
+            **usage
+        }
+
+    if case.get("unchecked"):
+        # Generated stress input: timed only, there is no expected output
+        return {"index": idx, "status": "passed", **usage}
+
+    passed, got = check(event, case["expected"], **options)
+    if passed:
+        return {
+            "index": idx,
+            "status": "passed",
+            **usage
+        }
+    detail = {
+        "index": idx,
+        "status": "failed",
+        "input": case["input"],
+        "expected": case["output"],
+        "got": got,
+        **usage
+    }
+    if event.get("stdout"):
+        detail["stdout"] = event["stdout"]
+    return detail
+
+
+# ======================================================
+# COMPLEXITY CHECK (generated inputs, see runner/stress.py)
+# ======================================================
+
+def _evaluate_stress(user_code, stress_test, limits, index, language="python"):
+    """One detail for the complexity check, reported as test case ``index``."""
+    cases = stress.cases(stress_test)
+    if not _bundle_readable(stress_test["path"]):
+        for case in cases:
+            case["input"] = stress.input_text(stress_test["path"], case["position"])
+
+    fastest = {}
+    for detail in _evaluate_batch(user_code, cases, limits, {}, first_index=index, language=language):
+        if detail["status"] != "passed":
+            size = cases[detail["index"] - index]["size"]
+            expected = stress.label(stress_test["complexity"])
+            return {
+                "index": index,
+                "status": "error",
+                "verdict": detail.get("verdict", "runtime_error"),
+                "error": f"On a generated input (n={size}, expected {expected}): {detail.get('error', 'Failed')}",
+                "complexity": {"expected": expected},
+            }
+        size = cases[detail["index"] - index]["size"]
+        fastest[size] = min(fastest.get(size, math.inf), detail["cpu_ms"])
+
+    result = stress.judge(sorted(fastest.items()), stress_test["complexity"])
+    logger.info(f"Result: COMPLEXITY {result['message']}")
+    detail = {"index": index, "status": "passed" if result.pop("ok") else "error", "complexity": result}
+    if detail["status"] != "passed":
+        detail["verdict"] = "complexity"
+        detail["error"] = result["message"]
+    return detail
+
+
+# ======================================================
+# PROCESS MODE (one interpreter per test case)
+# ======================================================
+
+def _evaluate_per_process(user_code, cases, limits, options):
+    for idx, case in enumerate(cases, start=1):
+        detail = None
+        for detail in _evaluate_batch(user_code, [case], limits, options, first_index=idx):
+            yield detail
+        if detail is None or detail["status"] != "passed":
+            break
@@ -0,0 +1,412 @@
+"""
+Batch harness: loads the user's code once and runs every test case inside
+the same interpreter.
+
+The parent (runner/code_runner.py) starts this file with
+``[sys.executable, harness.py, <result_fd>]``, writes the job as JSON on
+stdin and reads one JSON line per event from ``result_fd``:
+
+    {"event": "loaded"}
+    {"event": "case", "index": 1, "status": "ok", "result": [0, 1], "stdout": "...", "time_ms": 0.4, ...}
+    {"event": "case", "index": 2, "status": "exception", "error": "Traceback ...", "time_ms": 1.2, ...}
+    {"event": "case", "index": 3, "status": "time_limit", "time_ms": 1000.3, ...}
+    {"event": "case", "index": 4, "status": "memory_limit", "time_ms": 12.5, ...}
+    {"event": "load_error", "error": "Traceback ..."}
+
+Every case event also carries ``cpu_ms`` (user + system CPU time) and
+``memory_kb`` (peak RSS during the case; the high-water mark is reset
+before each case where Linux allows it).
+
+``solve()``'s return value travels as JSON in ``result``; values JSON can't
+represent are sent as ``result_text`` (their ``str()``) instead. User
+stdout is captured per case, capped at ``STDOUT_LIMIT`` characters, and
+sent separately as ``stdout``, so debug prints never affect the verdict.
+
+Inputs come either as source text in ``job["cases"]`` (each evaluated as
+``solve(<input>)``) or, for problems with a compiled test bundle
+(runner/bundles.py), as ``job["bundle"] = {"path": ..., "cases": [positions]}``:
+the bundle file is memory-mapped and only the listed cases are unpickled.
+
+Jobs with a ``job["language"]`` other than Python are built and run as
+separate programs by runner/languages.py, which adds its own events.
+
+``job["limits"]`` (optional) holds ``cpu_ms`` per case and ``memory_mb`` for
+the whole job. CPU time is enforced with a profiling timer (the harness
+reports ``time_limit`` and exits) backed by ``RLIMIT_CPU`` for code stuck
+in C; memory with ``RLIMIT_AS`` on top of what the interpreter already
+maps, so an allocation past the limit raises MemoryError in the user's code.
+"""
+import io
+import json
+import linecache
+import math
+import mmap
+import os
+import pickle
+import resource
+import signal
+import struct
+import sys
+import time
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+
+SOLUTION_FILENAME = "<solution>"
+STDOUT_LIMIT = 64 * 1024  # characters of user output kept per case
+
+# Test bundle layout: header, then one (offset, length) entry per case, then
+# the pickled records. A case record is ("args", args, kwargs) for literal
+# inputs or ("source", text) for anything else; the meta record holds the
+# raw test cases and parsed expected outputs for the web process.
+BUNDLE_MAGIC = b"DCTB"
+BUNDLE_VERSION = 1
+BUNDLE_HEADER = struct.Struct("<4sIIQQ")  # magic, version, case count, meta offset, meta length
+BUNDLE_ENTRY = struct.Struct("<QQ")       # record offset, record length
+
+
+def parse_input(text):
+    """Case record for an input string: pre-parsed arguments, or the source if it isn't literal."""
+    import ast
+    try:
+        call = ast.parse(f"f({text})", mode="eval").body
+        if not isinstance(call, ast.Call):
+            raise ValueError  # e.g. "1), g(2"
+        if any(kw.arg is None for kw in call.keywords):
+            raise ValueError  # **kwargs unpacking
+        args = tuple(ast.literal_eval(arg) for arg in call.args)
+        kwargs = {kw.arg: ast.literal_eval(kw.value) for kw in call.keywords}
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return ("source", text)
+    return ("args", args, kwargs)
+
+
+class TestBundle:
+    """Read-only, memory-mapped view of a compiled test bundle."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self._meta_offset, self._meta_length = \
+            BUNDLE_HEADER.unpack_from(self._map, 0)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError(f"Not a version {BUNDLE_VERSION} test bundle: {path}")
+
+    def _record(self, offset, length):
+        return pickle.loads(self._map[offset:offset + length])
+
+    def case(self, position):
+        offset, length = BUNDLE_ENTRY.unpack_from(
+            self._map, BUNDLE_HEADER.size + position * BUNDLE_ENTRY.size
+        )
+        return self._record(offset, length)
+
+    def meta(self):
+        return self._record(self._meta_offset, self._meta_length)
+
+
+class CappedOutput(io.TextIOBase):
+    """Text sink that keeps the first ``limit`` characters and drops the rest."""
+
+    def __init__(self, limit=STDOUT_LIMIT):
+        self.limit = limit
+        self.truncated = False
+        self._parts = []
+        self._size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        room = self.limit - self._size
+        if room > 0:
+            part = text[:room]
+            self._parts.append(part)
+            self._size += len(part)
+        if len(text) > room:
+            self.truncated = True
+        return len(text)
+
+    def getvalue(self):
+        text = "".join(self._parts)
+        if self.truncated:
+            text += "\n... (output truncated)"
+        return text
+
+
+def _jsonable(value):
+    """``value`` as plain JSON types; raises TypeError for anything else."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_jsonable(v) for v in value), key=lambda v: json.dumps(v, sort_keys=True))
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def serialise_result(result):
+    try:
+        return {"result": _jsonable(result)}
+    except (TypeError, ValueError, RecursionError):
+        pass
+    try:
+        return {"result_text": str(result)}
+    except Exception:
+        return {"result_text": f"<unprintable {type(result).__name__}>"}
+
+
+def _format_exception(exc):
+    """Format a traceback showing only the frames from the user's code."""
+    te = traceback.TracebackException.from_exception(exc)
+    te.stack = traceback.StackSummary(
+        frame for frame in te.stack if frame.filename == SOLUTION_FILENAME
+    )
+    return "".join(te.format()).strip()
+
+
+def load_solution(code):
+    """Compile and exec the user's code once, returning its namespace."""
+    linecache.cache[SOLUTION_FILENAME] = (
+        len(code), None, code.splitlines(True), SOLUTION_FILENAME
+    )
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    compiled = compile(code, SOLUTION_FILENAME, "exec")
+    with redirect_stdout(CappedOutput(0)), redirect_stderr(CappedOutput(0)):
+        exec(compiled, namespace)
+    return namespace
+
+
+def _address_space():
+    """Bytes currently mapped by this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except OSError:
+        return None
+
+
+def _cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def start_measurement():
+    """Reset the peak-RSS mark and return the starting clocks for ``measurement``."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass  # not Linux, or not permitted: memory_kb is the process-wide peak
+    return time.perf_counter(), _cpu_seconds()
+
+
+def measurement(started):
+    """Wall time, CPU time and peak RSS since ``start_measurement()``."""
+    wall_start, cpu_start = started
+    return {
+        "time_ms": (time.perf_counter() - wall_start) * 1000,
+        "cpu_ms": (_cpu_seconds() - cpu_start) * 1000,
+        "memory_kb": _peak_rss_kb(),
+    }
+
+
+def limit_memory(memory_mb):
+    """Cap the address space at what is mapped now plus ``memory_mb``."""
+    base = _address_space()
+    if base is None:
+        return
+    limit = base + memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+class CpuLimit:
+    """Per-case CPU budget: ITIMER_PROF for Python code, RLIMIT_CPU as the backstop."""
+
+    def __init__(self, cpu_ms, case_count, on_exceeded):
+        self.seconds = cpu_ms / 1000
+        self._on_exceeded = on_exceeded
+        signal.signal(signal.SIGPROF, self._expired)
+        # Hard cap for the whole job (load + every case); the per-case soft
+        # limit below sends SIGXCPU, which terminates the process
+        self._hard = math.ceil(_cpu_seconds() + self.seconds * (case_count + 1)) + 2
+        resource.setrlimit(resource.RLIMIT_CPU, (self._hard, self._hard))
+
+    def arm(self):
+        soft = min(math.ceil(_cpu_seconds() + self.seconds), self._hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, self._hard))
+        signal.setitimer(signal.ITIMER_PROF, self.seconds)
+
+    def disarm(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+
+    def _expired(self, signum, frame):
+        # Don't raise into the user's code, where a bare except could swallow it
+        self._on_exceeded()
+        os._exit(0)
+
+
+def run_case(namespace, index, case, started=None):
+    """Run one case record (``("source", text)`` or ``("args", args, kwargs)``) and return a result event."""
+    out = CappedOutput()
+    started = started or start_measurement()
+    try:
+        with redirect_stdout(out), redirect_stderr(CappedOutput(0)):
+            if case[0] == "args":
+                result = eval("solve", namespace)(*case[1], **case[2])
+            else:
+                result = eval(f"solve({case[1]})", namespace)
+    except MemoryError:
+        return {
+            "event": "case",
+            "index": index,
+            "status": "memory_limit",
+            **measurement(started),
+        }
+    except BaseException as e:
+        return {
+            "event": "case",
+            "index": index,
+            "status": "exception",
+            "error": _format_exception(e),
+            **measurement(started),
+        }
+
+    usage = measurement(started)
+    return {
+        "event": "case",
+        "index": index,
+        "status": "ok",
+        **serialise_result(result),
+        "stdout": out.getvalue(),
+        **usage,
+    }
+
+
+def prepare_case(namespace, record):
+    """Evaluate a ``("source", text)`` record's arguments, so the case's clocks only time solve().
+
+    Large generated inputs (runner/stress.py) reach remote runners as text;
+    parsing them inside the timed region would skew the complexity fit.
+    """
+    if record[0] != "source":
+        return record
+    parsed = parse_input(record[1])
+    if parsed[0] == "args":
+        return parsed
+    try:
+        # Not literal: evaluated in the solution's namespace, as the call would
+        args, kwargs = eval(f"(lambda *args, **kwargs: (args, kwargs))({record[1]})", namespace)
+    except Exception:
+        return record  # run_case reports the error
+    return ("args", args, kwargs)
+
+
+def run_job(job, emit):
+    """Load ``job["code"]`` once, then emit one event per test case.
+
+    Cases are numbered from ``job["first_index"]`` (default 1) so a shard of
+    a larger problem reports the problem's own case indices.
+    """
+    if "bundle" in job:
+        try:
+            bundle = TestBundle(job["bundle"]["path"])
+        except (OSError, ValueError) as e:
+            emit({"event": "load_error", "error": f"Internal Execution Error: {e}"})
+            return
+        positions = job["bundle"]["cases"]
+        case_count = len(positions)
+        cases = (bundle.case(position) for position in positions)
+    else:
+        case_count = len(job["cases"])
+        cases = (("source", text) for text in job["cases"])
+
+    language = job.get("language", "python")
+    if language != "python":
+        try:
+            from runner import languages
+        except ImportError:
+            import languages  # started as a script: runner/ is on sys.path
+        if "bundle" not in job:
+            # A program can only receive literal arguments
+            cases = (parse_input(text) for text in job["cases"])
+        languages.run_job(job, enumerate(cases, start=job.get("first_index", 1)), emit)
+        return
+
+    limits = job.get("limits") or {}
+    current = {"index": job.get("first_index", 1), "started": start_measurement()}
+
+    def time_limit_exceeded():
+        emit({
+            "event": "case",
+            "index": current["index"],
+            "status": "time_limit",
+            **measurement(current["started"]),
+        })
+
+    cpu_limit = None
+    if limits.get("cpu_ms"):
+        cpu_limit = CpuLimit(limits["cpu_ms"], case_count, time_limit_exceeded)
+    if limits.get("memory_mb"):
+        limit_memory(limits["memory_mb"])
+
+    # Top-level code counts against the first case's budget
+    if cpu_limit:
+        cpu_limit.arm()
+    try:
+        namespace = load_solution(job["code"])
+    except MemoryError:
+        emit({"event": "case", "index": current["index"], "status": "memory_limit",
+              **measurement(current["started"])})
+        return
+    except BaseException as e:
+        emit({"event": "load_error", "error": _format_exception(e)})
+        return
+    finally:
+        if cpu_limit:
+            cpu_limit.disarm()
+
+    emit({"event": "loaded"})
+
+    # Each record is unpickled (or parsed) before its case's clocks start
+    for idx, case in enumerate(cases, start=job.get("first_index", 1)):
+        case = prepare_case(namespace, case)
+        current["index"], current["started"] = idx, start_measurement()
+        if cpu_limit:
+            cpu_limit.arm()
+        event = run_case(namespace, idx, case, current["started"])
+        if cpu_limit:
+            cpu_limit.disarm()
+        emit(event)
+        if event["status"] != "ok":
+            break
+
+
+def main():
+    result_fd = int(sys.argv[1])
+    os.set_inheritable(result_fd, False)  # not passed on to compiled programs
+    channel = os.fdopen(result_fd, "w", buffering=1)
+
+    def emit(event):
+        channel.write(json.dumps(event) + "\n")
+        channel.flush()
+
+    job = json.loads(sys.stdin.read())
+    run_job(job, emit)
+    channel.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+"""
+Language backends.
+
+Python submissions run inside the harness interpreter (runner/harness.py).
+Every other language is a stand-alone program, built once per submission
+and then started once per test case:
+
+* The harness asks the backend to build the source. Builds are cached in
+  ``RUNNER_ARTIFACT_DIR``, keyed by a hash of the language, the toolchain's
+  version string and the source, so an unchanged resubmission (or the
+  same code on an edited problem) skips compilation.
+* Each case starts the artifact with the case's arguments on stdin, one
+  JSON value per line (``[1, 2, 3]`` then ``2`` for ``solve([1, 2, 3], 2)``),
+  and takes the answer from stdout; stderr is kept as debug output.
+  CPU time and peak memory come from the child's rusage, so they measure
+  the program itself rather than the harness.
+
+Events the harness emits for a compiled job, besides the usual case events:
+
+    {"event": "heartbeat"}                              (once a second while compiling)
+    {"event": "compiled", "compile_ms": 812.4, "cached": false}
+    {"event": "compile_error", "error": "main.cpp:3:5: error: ..."}
+
+Only the standard library is used here: the harness imports this module
+both as ``runner.languages`` and, when started as a script, as ``languages``.
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+
+ARTIFACT_DIR = os.getenv("RUNNER_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "dynocode-artifacts"))
+ARTIFACT_CACHE_ENTRIES = int(os.getenv("RUNNER_ARTIFACT_CACHE", "500"))  # builds kept per language
+COMPILE_TIMEOUT = 30        # seconds per build
+COMPILE_OUTPUT_LIMIT = 8192  # characters of compiler output shown to the user
+OUTPUT_LIMIT = 64 * 1024    # characters of program stdout / stderr kept per case
+FILE_SIZE_LIMIT = 16 * 1024 * 1024  # bytes a program may write (RLIMIT_FSIZE)
+NATIVE_HEADROOM_MB = 32     # address space for a native binary's own mappings, on top of the limit
+GO_HEADROOM_MB = 768        # the Go runtime reserves ~700 MB of address space before main() runs
+
+
+class CompileError(Exception):
+    pass
+
+
+class Language:
+    """A language backend. Subclasses describe how to build and start a program."""
+
+    name = None          # id used by /run and in stored submissions
+    title = None         # shown in the language picker
+    editor = None        # Monaco language id
+    source_name = None   # file name the source is saved under
+    toolchain = None     # executable that must be on PATH
+    version_args = ("--version",)
+    in_process = False   # True only for Python, which the harness runs itself
+    limit_address_space = False  # RLIMIT_AS on the program; V8 reserves far too much address space for it
+    address_headroom_mb = NATIVE_HEADROOM_MB  # added to the memory limit for RLIMIT_AS
+    out_of_memory_markers = ()   # stderr text meaning the program ran out of memory
+    starter = ""
+
+    def available(self):
+        return self.in_process or shutil.which(self.toolchain) is not None
+
+    def compile_command(self, build_dir):
+        """Command run in ``build_dir`` (which holds the source) to build it, or None."""
+        return None
+
+    def run_command(self, artifact_dir, limits):
+        raise NotImplementedError
+
+    def build_env(self):
+        return None
+
+    def run_env(self, limits):
+        """Extra environment variables for the program, e.g. heap limits."""
+        return {}
+
+
+class Python(Language):
+    name = "python"
+    title = "Python 3"
+    editor = "python"
+    in_process = True
+
+
+class Cpp(Language):
+    name = "cpp"
+    title = "C++17"
+    editor = "cpp"
+    source_name = "main.cpp"
+    toolchain = "g++"
+    limit_address_space = True
+    out_of_memory_markers = ("std::bad_alloc",)
+    starter = """#include <bits/stdc++.h>
+using namespace std;
+
+// Each argument of solve() arrives on its own line of stdin as JSON,
+// e.g. "[1, 2, 3]" then "2". Print the answer as JSON, e.g. [0, 1].
+int main() {
+    string line;
+    vector<string> args;
+    while (getline(cin, line)) args.push_back(line);
+
+    cout << "" << endl;
+    return 0;
+}
+"""
+
+    def compile_command(self, build_dir):
+        return [self.toolchain, "-O2", "-std=c++17", "-pipe", "-o", "main", self.source_name]
+
+    def run_command(self, artifact_dir, limits):
+        return [os.path.join(artifact_dir, "main")]
+
+
+class JavaScript(Language):
+    name = "js"
+    title = "JavaScript (Node.js)"
+    editor = "javascript"
+    source_name = "main.js"
+    toolchain = "node"
+    out_of_memory_markers = ("JavaScript heap out of memory",)
+    starter = """// Each argument of solve() arrives on its own line of stdin as JSON,
+// e.g. "[1, 2, 3]" then "2". Print the answer as JSON, e.g. [0, 1].
+const args = require("fs").readFileSync(0, "utf8").trim().split("\\n").map(JSON.parse);
+
+function solve(...args) {
+    return null;
+}
+
+console.log(JSON.stringify(solve(...args)));
+"""
+
+    def compile_command(self, build_dir):
+        # Nothing to build, but syntax errors are reported like compile errors
+        return [self.toolchain, "--check", self.source_name]
+
+    def run_command(self, artifact_dir, limits):
+        command = [self.toolchain]
+        if limits.get("memory_mb"):
+            command.append(f"--max-old-space-size={limits['memory_mb']}")
+        return command + [os.path.join(artifact_dir, self.source_name)]
+
+
+class Go(Language):
+    name = "go"
+    title = "Go"
+    editor = "go"
+    source_name = "main.go"
+    toolchain = "go"
+    version_args = ("version",)
+    # GOMEMLIMIT makes the GC hold the heap under the limit; RLIMIT_AS, with
+    # room for the runtime's up-front reservations, is the hard cap behind it
+    limit_address_space = True
+    address_headroom_mb = GO_HEADROOM_MB
+    out_of_memory_markers = ("runtime: out of memory",)
+    starter = """package main
+
+import (
+	"bufio"
+	"encoding/json"
+	"fmt"
+	"os"
+)
+
+// Each argument of solve() arrives on its own line of stdin as JSON,
+// e.g. "[1, 2, 3]" then "2". Print the answer as JSON, e.g. [0, 1].
+func main() {
+	scanner := bufio.NewScanner(os.Stdin)
+	scanner.Buffer(make([]byte, 1024*1024), 64*1024*1024)
+	var args []json.RawMessage
+	for scanner.Scan() {
+		args = append(args, json.RawMessage(scanner.Text()))
+	}
+
+	answer, _ := json.Marshal(nil)
+	fmt.Println(string(answer))
+}
+"""
+
+    def compile_command(self, build_dir):
+        return [self.toolchain, "build", "-o", "main", self.source_name]
+
+    def run_command(self, artifact_dir, limits):
+        return [os.path.join(artifact_dir, "main")]
+
+    def run_env(self, limits):
+        if limits.get("memory_mb"):
+            return {"GOMEMLIMIT": f"{limits['memory_mb']}MiB"}
+        return {}
+
+    def build_env(self):
+        # The build cache is shared by every build on this runner
+        env = dict(os.environ, GO111MODULE="off", CGO_ENABLED="0")
+        env.setdefault("GOCACHE", os.path.join(ARTIFACT_DIR, "go-build"))
+        return env
+
+
+LANGUAGES = {language.name: language for language in (Python(), Cpp(), JavaScript(), Go())}
+DEFAULT_LANGUAGE = "python"
+
+
+def get(name):
+    """The backend for ``name`` if it exists and can run on this machine, else None."""
+    language = LANGUAGES.get(name or DEFAULT_LANGUAGE)
+    if language is None or not language.available():
+        return None
+    return language
+
+
+def choices():
+    """Languages offered in the editor: id, title, Monaco id and starter code."""
+    return [
+        {"name": l.name, "title": l.title, "editor": l.editor, "starter": l.starter}
+        for l in LANGUAGES.values() if l.available()
+    ]
+
+
+# ======================================================
+# ARTIFACT CACHE
+# ======================================================
+
+def _sha256(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def toolchain_version(language):
+    """The toolchain's ``--version`` line, remembered per binary (path, size, mtime)."""
+    path = os.path.realpath(shutil.which(language.toolchain))
+    stat = os.stat(path)
+    fingerprint = _sha256(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")[:16]
+    cached = os.path.join(ARTIFACT_DIR, "toolchains", fingerprint)
+    try:
+        with open(cached) as f:
+            return f.read()
+    except OSError:
+        pass
+
+    output = subprocess.run(
+        [path, *language.version_args], capture_output=True, text=True, timeout=COMPILE_TIMEOUT
+    )
+    version = (output.stdout or output.stderr).strip().splitlines()[0]
+    os.makedirs(os.path.dirname(cached), mode=0o700, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached))
+    with os.fdopen(fd, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, cached)
+    return version
+
+
+def _run_compiler(language, build_dir, heartbeat):
+    proc = subprocess.Popen(
+        language.compile_command(build_dir),
+        cwd=build_dir,
+        env=language.build_env(),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + COMPILE_TIMEOUT
+    while True:
+        try:
+            output, _ = proc.communicate(timeout=1)
+            break
+        except subprocess.TimeoutExpired:
+            if time.monotonic() > deadline:
+                proc.kill()
+                proc.communicate()
+                raise CompileError(f"Compilation took longer than {COMPILE_TIMEOUT}s")
+            heartbeat()
+
+    if proc.returncode != 0:
+        text = output.decode(errors="replace").replace(build_dir + os.sep, "").strip() \
+            or f"Compiler exited with code {proc.returncode}"
+        if len(text) > COMPILE_OUTPUT_LIMIT:
+            text = text[:COMPILE_OUTPUT_LIMIT] + "\n... (truncated)"
+        raise CompileError(text)
+
+
+def _prune(language_dir):
+    entries = []
+    for name in os.listdir(language_dir):
+        if name.startswith("."):
+            continue
+        try:
+            entries.append((os.stat(os.path.join(language_dir, name)).st_mtime, name))
+        except OSError:
+            pass
+    entries.sort()
+    for _, name in entries[:max(0, len(entries) - ARTIFACT_CACHE_ENTRIES)]:
+        shutil.rmtree(os.path.join(language_dir, name), ignore_errors=True)
+
+
+def build(language, source, heartbeat=lambda: None):
+    """Return ``(artifact dir, compile ms, cached)``; raises CompileError."""
+    key = _sha256(json.dumps([language.name, toolchain_version(language), source]))
+    language_dir = os.path.join(ARTIFACT_DIR, language.name)
+    target = os.path.join(language_dir, key[:32])
+    if os.path.isdir(target):
+        os.utime(target)  # most recently used, for pruning
+        return target, 0.0, True
+
+    os.makedirs(language_dir, mode=0o700, exist_ok=True)
+    build_dir = tempfile.mkdtemp(dir=language_dir, prefix=".build-")
+    start = time.perf_counter()
+    try:
+        with open(os.path.join(build_dir, language.source_name), "w") as f:
+            f.write(source)
+        _run_compiler(language, build_dir, heartbeat)
+        compile_ms = (time.perf_counter() - start) * 1000
+        try:
+            os.rename(build_dir, target)
+        except OSError:
+            # Built concurrently by another runner; use theirs
+            shutil.rmtree(build_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    _prune(language_dir)
+    return target, compile_ms, False
+
+
+def cache_stats():
+    stats = {"dir": ARTIFACT_DIR, "languages": {}}
+    for language in LANGUAGES.values():
+        if language.in_process:
+            continue
+        language_dir = os.path.join(ARTIFACT_DIR, language.name)
+        try:
+            entries = sum(1 for name in os.listdir(language_dir) if not name.startswith("."))
+        except OSError:
+            entries = 0
+        stats["languages"][language.name] = {"available": language.available(), "artifacts": entries}
+    return stats
+
+
+# ======================================================
+# RUNNING PROGRAMS
+# ======================================================
+
+# Limits are applied by a tiny shell in front of the program, started with
+# posix_spawn. Linux folds the spawning process's resident high-water mark
+# into the program's ru_maxrss at exec(), so the harness resets its own mark
+# first: small programs then report about the harness's current RSS as a
+# floor (just as Python submissions include the interpreter's own memory).
+LIMIT_SCRIPT = 'ulimit -S -t {cpu} && ulimit -H -t {hard} && ulimit -f {blocks} && ulimit -c 0 {memory}&& exec "$@"'
+
+
+# Programs don't see the server's environment (database URL, secrets)
+PROGRAM_ENV = {"PATH": os.getenv("PATH", "/usr/local/bin:/usr/bin:/bin"), "LANG": "C.UTF-8"}
+
+
+def _spawn(language, artifact_dir, limits, stdin, stdout, stderr):
+    cpu = math.ceil(limits["cpu_ms"] / 1000) if limits.get("cpu_ms") else "unlimited"
+    memory = ""
+    if limits.get("memory_mb") and language.limit_address_space:
+        memory = f"&& ulimit -v {(limits['memory_mb'] + language.address_headroom_mb) * 1024} "
+    script = LIMIT_SCRIPT.format(
+        cpu=cpu, hard=cpu if cpu == "unlimited" else cpu + 1,
+        blocks=FILE_SIZE_LIMIT // 512, memory=memory,
+    )
+    command = language.run_command(artifact_dir, limits)
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    return os.posix_spawn(
+        "/bin/sh", ["sh", "-c", script, "sh", *command], dict(PROGRAM_ENV, **language.run_env(limits)),
+        file_actions=[
+            (os.POSIX_SPAWN_DUP2, stdin.fileno(), 0),
+            (os.POSIX_SPAWN_DUP2, stdout.fileno(), 1),
+            (os.POSIX_SPAWN_DUP2, stderr.fileno(), 2),
+        ],
+    )
+
+
+def _read(f):
+    f.seek(0)
+    text = f.read(OUTPUT_LIMIT + 1).decode(errors="replace")
+    if len(text) > OUTPUT_LIMIT:
+        text = text[:OUTPUT_LIMIT] + "\n... (output truncated)"
+    return text
+
+
+def _stdin_for(record):
+    """One JSON line per argument, or None if the case can't be expressed that way."""
+    if record[0] != "args" or record[2]:
+        return None
+    try:
+        return "".join(json.dumps(arg) + "\n" for arg in record[1]).encode()
+    except (TypeError, ValueError):
+        return None
+
+
+def run_case(language, artifact_dir, index, record, limits):
+    """Start the program for one case record and return a harness case event."""
+    stdin_data = _stdin_for(record)
+    if stdin_data is None:
+        return {
+            "event": "case", "index": index, "status": "exception",
+            "error": f"This test case can't be passed to a {language.title} program "
+                     f"(its input is not a list of JSON values)",
+            "time_ms": 0.0, "cpu_ms": 0.0, "memory_kb": 0,
+        }
+
+    with tempfile.TemporaryFile() as stdin, tempfile.TemporaryFile() as stdout, \
+            tempfile.TemporaryFile() as stderr:
+        stdin.write(stdin_data)
+        stdin.seek(0)
+        started = time.perf_counter()
+        pid = _spawn(language, artifact_dir, limits, stdin, stdout, stderr)
+        # wait4 rather than wait: its rusage is the program's own CPU time and peak RSS
+        _, status, usage = os.wait4(pid, 0)
+        measured = {
+            "time_ms": (time.perf_counter() - started) * 1000,
+            "cpu_ms": (usage.ru_utime + usage.ru_stime) * 1000,
+            "memory_kb": usage.ru_maxrss,
+        }
+        output = _read(stdout)
+        errors = _read(stderr).replace(artifact_dir + os.sep, "")
+
+    event = {"event": "case", "index": index, **measured}
+    code = os.waitstatus_to_exitcode(status)
+    cpu_ms, memory_mb = limits.get("cpu_ms"), limits.get("memory_mb")
+
+    # Past the hard RLIMIT_CPU the kernel sends SIGKILL; the CPU time covers that case
+    if code == -signal.SIGXCPU or (cpu_ms and measured["cpu_ms"] > cpu_ms):
+        event["status"] = "time_limit"
+    elif (memory_mb and measured["memory_kb"] > memory_mb * 1024) or \
+            (code != 0 and any(marker in errors for marker in language.out_of_memory_markers)):
+        event["status"] = "memory_limit"
+    elif code == -signal.SIGXFSZ:
+        event.update(status="exception", error="Output Limit Exceeded")
+    elif code != 0:
+        reason = f"Process killed by {signal.Signals(-code).name}" if code < 0 else f"Process exited with code {code}"
+        event.update(status="exception", error=(errors.strip() + "\n\n" + reason).strip())
+    else:
+        event.update(status="ok", result_text=output, stdout=errors)
+    return event
+
+
+def run_job(job, cases, emit):
+    """Build ``job["code"]`` and run it for each ``(index, record)`` in ``cases``."""
+    language = get(job["language"])
+    if language is None:
+        emit({"event": "load_error", "error": f"Internal Execution Error: {job['language']} is not available on this runner"})
+        return
+
+    try:
+        artifact_dir, compile_ms, cached = build(language, job["code"], lambda: emit({"event": "heartbeat"}))
+    except CompileError as e:
+        emit({"event": "compile_error", "error": str(e)})
+        return
+    except OSError as e:
+        emit({"event": "load_error", "error": f"Internal Execution Error: {e}"})
+        return
+    emit({"event": "compiled", "compile_ms": compile_ms, "cached": cached})
+
+    limits = job.get("limits") or {}
+    for index, record in cases:
+        event = run_case(language, artifact_dir, index, record, limits)
+        emit(event)
+        if event["status"] != "ok":
+            break
@@ -0,0 +1,273 @@
+"""
+Pre-forked warm runner pool.
+
+Each web worker process owns one zygote (runner/zygote.py) that keeps
+``RUNNER_POOL_SIZE`` pre-imported children ready. A submission is handed to
+one freshly forked child, which is used once and then discarded, so
+isolation is the same as spawning a new interpreter.
+
+Sizing: gunicorn runs ``--workers 2 --threads 4``, so a pool size of 4 per
+worker lets every request thread execute without waiting.
+"""
+import atexit
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("RUNNER_POOL_SIZE", "0"))        # 0 disables the pool
+POOL_QUEUE_DEPTH = int(os.getenv("RUNNER_POOL_QUEUE", "16"))  # callers allowed to wait for a slot
+POOL_RECYCLE = int(os.getenv("RUNNER_POOL_RECYCLE", "500"))   # replace the template after N jobs
+POOL_WAIT_TIMEOUT = 10  # seconds a caller may wait for a free slot
+HANDSHAKE_TIMEOUT = 5   # seconds for a child to pick up a connection
+
+ZYGOTE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zygote.py")
+
+
+def exit_error(returncode):
+    """Crash message for a runner's exit status, worded like the process backend's."""
+    if returncode is None:
+        return "Runner process exited unexpectedly"
+    if returncode < 0:
+        return f"Process killed by {signal.Signals(-returncode).name}"
+    return f"Process exited with code {returncode}"
+
+
+class PoolBusy(Exception):
+    """Raised when the pool's wait queue is full or the wait timed out."""
+
+
+class PooledWorker:
+    """A connection to one single-use forked child."""
+
+    kind = "pool"
+
+    def __init__(self, pool, conn, pid):
+        self._pool = pool
+        self.conn = conn
+        self.pid = pid
+        self.buffer = b""
+
+    def fileno(self):
+        return self.conn.fileno()
+
+    def read(self):
+        return self.conn.recv(65536)
+
+    def kill(self):
+        # The child leads a process group with the runner it forked for the job
+        try:
+            os.killpg(self.pid, 9)
+        except ProcessLookupError:
+            pass
+
+    def exit_status(self):
+        # The child belongs to the zygote; the runner's exit status is
+        # reported in-band instead (the "exited" event)
+        return None
+
+    def crash_error(self, returncode=None):
+        return exit_error(returncode)
+
+    def close(self):
+        self.conn.close()
+        self._pool._release()
+
+
+class RunnerPool:
+    def __init__(self, size, queue_depth, recycle_after):
+        self.size = size
+        self.queue_depth = queue_depth
+        self.recycle_after = recycle_after
+
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(size)
+        self._zygote = None
+        self._socket_dir = None
+        self._socket_path = None
+        self._forks = 0
+
+        self.busy = 0
+        self.waiting = 0
+        self.served = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.total_wait_ms = 0.0
+
+    # --------------------------------------------------
+    # Zygote lifecycle
+    # --------------------------------------------------
+
+    def _ensure_zygote(self, failed_path=None):
+        """Return the live template's socket path, (re)starting it when needed.
+
+        ``failed_path`` is the path a caller could not get a child from; the
+        template is only replaced if no other thread has replaced it already.
+        """
+        with self._lock:
+            alive = self._zygote is not None and self._zygote.poll() is None
+            recycle = self._forks >= self.recycle_after
+            failed = failed_path is not None and failed_path == self._socket_path
+            if alive and not recycle and not failed:
+                self._forks += 1
+                return self._socket_path
+            self._start_zygote()
+            self._forks = 1
+            return self._socket_path
+
+    def _start_zygote(self):
+        if self._zygote is not None:
+            if self._zygote.poll() is None:
+                self._zygote.terminate()
+            self._zygote.wait()
+            self.restarts += 1
+        if self._socket_dir:
+            shutil.rmtree(self._socket_dir, ignore_errors=True)
+
+        self._socket_dir = tempfile.mkdtemp(prefix="runner-pool-")
+        self._socket_path = os.path.join(self._socket_dir, "zygote.sock")
+        self._zygote = subprocess.Popen(
+            [sys.executable, ZYGOTE_PATH, self._socket_path, str(self.size)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL
+        )
+
+        deadline = time.monotonic() + HANDSHAKE_TIMEOUT
+        while not os.path.exists(self._socket_path):
+            if self._zygote.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("Runner pool failed to start")
+            time.sleep(0.01)
+        logger.info(f"🧬 Runner pool started (size={self.size}, pid={self._zygote.pid})")
+
+    def shutdown(self):
+        with self._lock:
+            if self._zygote is not None and self._zygote.poll() is None:
+                self._zygote.terminate()
+                self._zygote.wait()
+            if self._socket_dir:
+                shutil.rmtree(self._socket_dir, ignore_errors=True)
+            self._zygote = None
+
+    # --------------------------------------------------
+    # Slots
+    # --------------------------------------------------
+
+    def _acquire(self):
+        with self._lock:
+            if self.waiting >= self.queue_depth:
+                self.rejected += 1
+                raise PoolBusy("Runner pool queue is full")
+            self.waiting += 1
+
+        start = time.monotonic()
+        acquired = self._slots.acquire(timeout=POOL_WAIT_TIMEOUT)
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+                raise PoolBusy("Timed out waiting for a runner")
+            self.busy += 1
+            self.total_wait_ms += (time.monotonic() - start) * 1000
+
+    def _release(self):
+        with self._lock:
+            self.busy -= 1
+            self.served += 1
+        self._slots.release()
+
+    # --------------------------------------------------
+    # Jobs
+    # --------------------------------------------------
+
+    def start(self, job):
+        """Hand ``job`` to a warm child and return a PooledWorker streaming its events."""
+        self._acquire()
+        try:
+            # One retry covers a template that was recycled while we connected
+            socket_path = self._ensure_zygote()
+            worker = self._connect(socket_path, job)
+            if worker is None:
+                socket_path = self._ensure_zygote(failed_path=socket_path)
+                worker = self._connect(socket_path, job)
+            if worker is None:
+                raise RuntimeError("Runner pool did not accept the job")
+            return worker
+        except BaseException:
+            self._release()
+            raise
+
+    def _connect(self, socket_path, job):
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.settimeout(HANDSHAKE_TIMEOUT)
+            conn.connect(socket_path)
+            conn.sendall(json.dumps(job).encode())
+            conn.shutdown(socket.SHUT_WR)
+
+            buffer = b""
+            while b"\n" not in buffer:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    conn.close()
+                    return None
+                buffer += chunk
+        except (OSError, socket.timeout):
+            conn.close()
+            return None
+
+        line, rest = buffer.split(b"\n", 1)
+        started = json.loads(line)
+        conn.settimeout(None)
+        worker = PooledWorker(self, conn, started["pid"])
+        worker.buffer = rest
+        return worker
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "busy": self.busy,
+                "idle": self.size - self.busy,
+                "waiting": self.waiting,
+                "queue_depth": self.queue_depth,
+                "utilisation": round(self.busy / self.size, 3) if self.size else 0.0,
+                "served": self.served,
+                "rejected": self.rejected,
+                "restarts": self.restarts,
+                "avg_wait_ms": round(self.total_wait_ms / self.served, 2) if self.served else 0.0,
+            }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return this process's pool, or None when RUNNER_POOL_SIZE is 0."""
+    global _pool, _pool_pid
+    if POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        # gunicorn forks workers after import; each worker needs its own zygote
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = RunnerPool(POOL_SIZE, POOL_QUEUE_DEPTH, POOL_RECYCLE)
+            _pool_pid = os.getpid()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def pool_stats():
+    pool = get_pool()
+    if pool is None:
+        return {"enabled": False}
+    return dict(enabled=True, **pool.stats())
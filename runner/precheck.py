@@ -0,0 +1,177 @@
+"""
+In-process static checks run before any runner process is started.
+
+Most rejected submissions fail for reasons visible in the source alone: a
+syntax error, no ``solve`` to call, or a ``solve`` that can't take the
+arguments the problem passes. ``precheck`` parses the code with ``ast``
+(nothing is executed) and returns the error detail straight away, so these
+runs never pay for a harness process.
+
+The checks are conservative: anything that might bind ``solve`` at run time
+(an import, an assignment, a star import, ``global solve`` in a function,
+``globals()``, ``exec``, ``setattr``...) is left to the runner, and so is
+the arity of a decorated ``solve``, since the decorator decides what is
+actually called.
+"""
+import ast
+import threading
+import time
+import traceback
+
+from runner.harness import SOLUTION_FILENAME
+
+ENTRY_POINT = "solve"
+
+_lock = threading.Lock()
+_counts = {"checked": 0, "syntax_error": 0, "missing_entry_point": 0, "arity_mismatch": 0}
+_total_ms = 0.0
+
+
+def _module_bindings(node):
+    """Yield (name, node) for every name bound at module level, including inside if/try/with blocks."""
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            yield child.name, child
+            continue  # their bodies are a different scope
+        if isinstance(child, ast.Lambda):
+            continue
+        if isinstance(child, (ast.Import, ast.ImportFrom)):
+            for alias in child.names:
+                yield alias.asname or alias.name.split(".")[0], child
+            continue
+        if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+            yield child.id, child
+        yield from _module_bindings(child)
+
+
+# Calls that can bind module names the AST doesn't show
+DYNAMIC_BINDERS = {"globals", "vars", "locals", "exec", "eval", "setattr", "__import__"}
+
+
+def _binds_dynamically(tree):
+    """True if the code might bind ``solve`` in a way _module_bindings can't see."""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Global) and ENTRY_POINT in node.names:
+            return True
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in DYNAMIC_BINDERS:
+            return True
+        if isinstance(node, ast.Attribute) and node.attr in ("modules", "__dict__", "setattr"):
+            # sys.modules[__name__].solve = ..., module.__dict__[...], builtins.setattr
+            return True
+    return False
+
+
+def _arity(fn):
+    """(required positional args, max positional args or None if *args) for a def."""
+    args = fn.args
+    positional = len(args.posonlyargs) + len(args.args)
+    required = positional - len(args.defaults)
+    maximum = None if args.vararg else positional
+    return required, maximum
+
+
+def _required_kwonly(fn):
+    return [a.arg for a, default in zip(fn.args.kwonlyargs, fn.args.kw_defaults) if default is None]
+
+
+def expected_arity(signature):
+    """Number of positional arguments the problem's reference ``solve`` takes, or None."""
+    try:
+        tree = ast.parse(signature or "")
+    except (SyntaxError, ValueError):
+        return None
+    for name, node in _module_bindings(tree):
+        if name == ENTRY_POINT and isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            return _arity(node)[0]
+    return None
+
+
+def _error(verdict, message, line=None, column=None):
+    detail = {
+        "index": 1,
+        "status": "error",
+        "verdict": verdict,
+        "error": message
+    }
+    if line is not None:
+        detail["line"] = line
+        detail["column"] = column
+    return detail
+
+
+def _check(code, signature):
+    """Return (counter, detail) for the first problem found, or None."""
+    try:
+        tree = ast.parse(code, filename=SOLUTION_FILENAME)
+    except SyntaxError as e:
+        message = "".join(traceback.format_exception_only(type(e), e)).strip()
+        return "syntax_error", _error("compile_error", message, e.lineno, e.offset)
+    except ValueError as e:
+        # e.g. "source code string cannot contain null bytes"
+        return "syntax_error", _error("compile_error", f"SyntaxError: {e}")
+
+    if any(isinstance(n, ast.ImportFrom) and any(a.name == "*" for a in n.names) for n in tree.body):
+        return None
+    if _binds_dynamically(tree):
+        return None
+
+    bindings = [node for name, node in _module_bindings(tree) if name == ENTRY_POINT]
+    if not bindings:
+        return "missing_entry_point", _error(
+            "signature_error",
+            f"No function named '{ENTRY_POINT}' found. Define {ENTRY_POINT}() at the top level of your code."
+        )
+
+    # Only a plain def can be checked; with several, the last one is what runs
+    if not all(isinstance(b, (ast.FunctionDef, ast.AsyncFunctionDef)) for b in bindings):
+        return None
+    fn = bindings[-1]
+    if fn.decorator_list:
+        return None
+
+    expected = expected_arity(signature)
+    if expected is None:
+        return None
+    required, maximum = _arity(fn)
+    kwonly = _required_kwonly(fn)
+    if required <= expected and (maximum is None or expected <= maximum) and not kwonly:
+        return None
+
+    if kwonly:
+        problem = f"requires keyword-only argument(s) {', '.join(kwonly)}"
+    elif maximum is None or required == maximum:
+        problem = f"takes {required} argument(s)"
+    else:
+        problem = f"takes {required} to {maximum} arguments"
+    return "arity_mismatch", _error(
+        "signature_error",
+        f"{ENTRY_POINT}() {problem} but this problem passes {expected}. Keep the signature from the starter code.",
+        fn.lineno, fn.col_offset + 1
+    )
+
+
+def precheck(code, problem):
+    """Return an error detail if ``code`` can't possibly run against ``problem``, else None."""
+    global _total_ms
+    start = time.perf_counter()
+    found = _check(code, problem.get("function_signature"))
+    elapsed = (time.perf_counter() - start) * 1000
+
+    with _lock:
+        _counts["checked"] += 1
+        _total_ms += elapsed
+        if found is not None:
+            _counts[found[0]] += 1
+    return found[1] if found is not None else None
+
+
+def stats():
+    with _lock:
+        checked = _counts["checked"]
+        rejected = sum(v for k, v in _counts.items() if k != "checked")
+        return dict(
+            _counts,
+            short_circuited=rejected,
+            short_circuit_rate=round(rejected / checked, 3) if checked else 0.0,
+            avg_ms=round(_total_ms / checked, 3) if checked else 0.0,
+        )
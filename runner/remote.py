@@ -0,0 +1,417 @@
+"""
+Client for standalone runner services (runner/service.py).
+
+With ``RUNNER_SERVICE`` set, the web app stops executing code itself: every
+harness job is sent to one of the listed runner nodes and its events are
+streamed back, so web serving and user code no longer share a process,
+CPU quota or memory limit. Verdicts are still computed here (checker,
+limits), only the harness runs remotely.
+
+``RUNNER_SERVICE`` is a comma-separated list of node addresses, either
+``unix:/path/to.sock`` or ``host:port`` (an empty host means loopback). Each gunicorn worker keeps a small
+pool of open connections per node and a health thread that pings every
+node; jobs go to the healthy node with the lowest reported load.
+
+Wire protocol: every message is a frame, a 5-byte header (payload length
+as a big-endian uint32, then a type byte) followed by the payload.
+
+    client -> node   JOB {job JSON}     start a harness job
+                     CANCEL             kill the running job
+                     PING               health / load probe
+    node -> client   ACCEPTED           the job has a runner process
+                     DATA <bytes>       harness event stream (JSON lines)
+                     DONE {status}      job over: exit status, crash
+                                        error, and the node's load
+                     PONG {load}        reply to PING
+                     ERROR {error}      the job could not be started
+
+JOB and PING carry ``RUNNER_SERVICE_TOKEN``, a secret shared with the
+nodes (the job JSON gets a ``"token"`` key, PING a ``{"token": ...}``
+payload). A node answers ERROR and hangs up on frames without the right
+token, so only holders of the secret can run code there.
+
+A connection carries one job at a time and goes back to the pool after
+DONE, so it is reused by the next job.
+"""
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import logging
+
+from runner.pool import exit_error
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NODES = os.getenv("RUNNER_SERVICE", "")                         # empty = run code in-process
+SERVICE_TIMEOUT = float(os.getenv("RUNNER_SERVICE_TIMEOUT", "5"))        # connect / handshake seconds
+HEALTH_INTERVAL = float(os.getenv("RUNNER_SERVICE_HEALTH_INTERVAL", "2"))  # seconds between pings
+SERVICE_TOKEN = os.getenv("RUNNER_SERVICE_TOKEN", "")                    # shared secret; required off loopback
+MAX_IDLE_CONNECTIONS = 8  # pooled connections kept per node
+CANCEL_DRAIN_TIMEOUT = 2  # seconds to wait for DONE after CANCEL before dropping the connection
+QUEUE_TIMEOUT = 15        # seconds to wait for ACCEPTED; a full node queues jobs for up to 10s
+
+FRAME_HEADER = struct.Struct(">IB")
+MAX_FRAME = 64 * 1024 * 1024
+
+JOB, CANCEL, PING = 1, 2, 3
+ACCEPTED, DATA, DONE, PONG, ERROR = 11, 12, 13, 14, 15
+
+
+# ======================================================
+# FRAMING
+# ======================================================
+
+def send_frame(sock, kind, payload=b""):
+    if not isinstance(payload, bytes):
+        payload = json.dumps(payload).encode()
+    sock.sendall(FRAME_HEADER.pack(len(payload), kind) + payload)
+
+
+def _recv_exact(sock, size):
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if not count:
+            return None
+        received += count
+    return bytes(data)
+
+
+def recv_frame(sock):
+    """Return ``(kind, payload bytes)``, or None if the peer closed the connection."""
+    header = _recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    size, kind = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ValueError(f"Frame too large ({size} bytes)")
+    payload = _recv_exact(sock, size) if size else b""
+    if payload is None:
+        return None
+    return kind, payload
+
+
+def parse_address(address):
+    """``unix:/path`` -> (AF_UNIX, path); ``host:port`` -> (AF_INET, (host, port)), ``:port`` is loopback."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def is_local(family, sockaddr):
+    return family == socket.AF_UNIX or sockaddr[0] in ("127.0.0.1", "localhost", "::1")
+
+
+# ======================================================
+# CLIENT
+# ======================================================
+
+class RemoteSession:
+    """A harness job running on a runner node; used like a local HarnessProcess."""
+
+    kind = "service"
+
+    def __init__(self, node, conn):
+        self.node = node
+        self.conn = conn
+        self.buffer = b""
+        self._done = None
+        self._cancelled = False
+
+    def fileno(self):
+        return self.conn.fileno()
+
+    def read(self):
+        """Next chunk of the event stream; b"" once the job is over or the node went away."""
+        if self._done is not None:
+            return b""
+        try:
+            frame = recv_frame(self.conn)
+        except socket.timeout:
+            # Only while draining a cancelled job; the node is slow, not gone
+            self._close_connection()
+            return b""
+        except (OSError, ValueError):
+            frame = None
+        if frame is None:
+            self._done = {"returncode": None, "error": f"Runner service connection lost ({self.node.address})"}
+            self.node.mark_down()
+            self._close_connection()
+            return b""
+        kind, payload = frame
+        if kind == DATA:
+            return payload
+        if kind == DONE:
+            self._done = json.loads(payload)
+            self.node.report(self._done)
+        return b""
+
+    def kill(self):
+        if self._done is None and not self._cancelled:
+            self._cancelled = True
+            try:
+                send_frame(self.conn, CANCEL)
+            except OSError:
+                pass
+
+    def exit_status(self):
+        return self._done["returncode"] if self._done else None
+
+    def crash_error(self, returncode=None):
+        done = self._done or {}
+        if done.get("returncode") is None and returncode is not None:
+            # Reported in-band by a pooled runner on the node
+            return exit_error(returncode)
+        return done.get("error") or "Runner process exited unexpectedly"
+
+    def _close_connection(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def close(self):
+        if self.conn is not None and self._done is None:
+            # Cancelled mid-job: wait for the node to confirm before reusing the connection
+            deadline = time.monotonic() + CANCEL_DRAIN_TIMEOUT
+            self.conn.settimeout(CANCEL_DRAIN_TIMEOUT)
+            while self._done is None and self.conn is not None and time.monotonic() < deadline:
+                self.read()
+        if self.conn is not None:
+            if self._done is not None:
+                self.node.checkin(self.conn)
+            else:
+                self.conn.close()
+            self.conn = None
+        self.node.finished()
+
+
+class RunnerNode:
+    def __init__(self, address):
+        self.address = address
+        self.family, self.sockaddr = parse_address(address)
+        self.local = is_local(self.family, self.sockaddr)
+
+        self._lock = threading.Lock()
+        self._idle = []
+        self.healthy = True
+        self.load = 0        # jobs running on the node, as last reported plus those sent since
+        self.capacity = 1
+        self.in_flight = 0   # jobs this web worker has running there
+        self.served = 0
+        self.failures = 0
+        self.last_seen = None
+
+    def score(self):
+        return self.load / max(self.capacity, 1)
+
+    def connect(self):
+        conn = socket.socket(self.family, socket.SOCK_STREAM)
+        try:
+            conn.settimeout(SERVICE_TIMEOUT)
+            conn.connect(self.sockaddr)
+        except OSError:
+            conn.close()
+            raise
+        return conn
+
+    def checkout(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self.connect(), False
+
+    def checkin(self, conn):
+        conn.settimeout(SERVICE_TIMEOUT)
+        with self._lock:
+            if self.healthy and len(self._idle) < MAX_IDLE_CONNECTIONS:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def report(self, status):
+        with self._lock:
+            self.healthy = True
+            self.last_seen = time.time()
+            if "active" in status:
+                self.load = status["active"] + status.get("queued", 0)
+                self.capacity = status.get("capacity", self.capacity)
+
+    def mark_down(self):
+        with self._lock:
+            self.healthy = False
+            self.failures += 1
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def reserve(self):
+        """Count a job against this node before it is sent, so concurrent dispatches spread out."""
+        with self._lock:
+            self.load += 1
+            self.in_flight += 1
+
+    def start(self, job):
+        """Send a reserved ``job`` and wait for ACCEPTED; a stale pooled connection is retried once."""
+        try:
+            conn = self._handshake(json.dumps(dict(job, token=SERVICE_TOKEN)).encode())
+        except BaseException:
+            with self._lock:
+                self.load = max(self.load - 1, 0)
+                self.in_flight -= 1
+            raise
+        with self._lock:
+            self.served += 1
+        return RemoteSession(self, conn)
+
+    def _handshake(self, payload):
+        while True:
+            conn, pooled = self.checkout()
+            try:
+                conn.settimeout(QUEUE_TIMEOUT)
+                send_frame(conn, JOB, payload)
+                frame = recv_frame(conn)
+            except OSError:
+                frame = None
+            if frame is None:
+                conn.close()
+                if pooled:
+                    continue  # the node restarted since this connection was last used
+                raise ConnectionError(f"Runner service {self.address} closed the connection")
+            break
+
+        kind, body = frame
+        if kind == ERROR:
+            self.checkin(conn)
+            raise RuntimeError(json.loads(body)["error"])
+        if kind != ACCEPTED:
+            conn.close()
+            raise ConnectionError(f"Runner service {self.address} sent an unexpected reply")
+        return conn
+
+    def ping(self):
+        conn = self.connect()
+        try:
+            send_frame(conn, PING, {"token": SERVICE_TOKEN})
+            frame = recv_frame(conn)
+        finally:
+            conn.close()
+        if frame is not None and frame[0] == ERROR:
+            raise ConnectionError(json.loads(frame[1])["error"])
+        if frame is None or frame[0] != PONG:
+            raise ConnectionError(f"Runner service {self.address} did not answer the health check")
+        self.report(json.loads(frame[1]))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "address": self.address,
+                "healthy": self.healthy,
+                "load": self.load,
+                "capacity": self.capacity,
+                "in_flight": self.in_flight,
+                "idle_connections": len(self._idle),
+                "served": self.served,
+                "failures": self.failures,
+                "last_seen": self.last_seen,
+            }
+
+
+class RunnerClient:
+    """Least-loaded dispatch over a set of runner nodes, with background health checks."""
+
+    def __init__(self, addresses):
+        self.nodes = [RunnerNode(address) for address in addresses]
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._health = threading.Thread(target=self._check_health, daemon=True)
+        self._health.start()
+
+    def _check_health(self):
+        while True:
+            for node in self.nodes:
+                was_healthy = node.healthy
+                try:
+                    node.ping()
+                except (OSError, ValueError) as e:
+                    if was_healthy:
+                        logger.warning(f"⚠️ Runner service {node.address} failed its health check: {e}")
+                    node.mark_down()
+                    continue
+                if not was_healthy:
+                    logger.info(f"✅ Runner service {node.address} is back")
+            if self._stopped.wait(HEALTH_INTERVAL):
+                return
+
+    def shares_files(self):
+        """True if every node runs on this machine and can read local test bundles."""
+        return all(node.local for node in self.nodes)
+
+    def _pick(self, exclude):
+        with self._lock:
+            nodes = [node for node in self.nodes if node not in exclude]
+            # With every node marked down, try them all rather than fail outright
+            candidates = [node for node in nodes if node.healthy] or nodes
+            if not candidates:
+                return None
+            node = min(candidates, key=RunnerNode.score)
+            node.reserve()
+            return node
+
+    def start(self, job):
+        tried = []
+        error = None
+        while True:
+            node = self._pick(tried)
+            if node is None:
+                break
+            tried.append(node)
+            try:
+                return node.start(job)
+            except OSError as e:
+                error = e
+                node.mark_down()
+            except RuntimeError as e:
+                error = e  # up, but couldn't take the job (e.g. busy); try the next node
+        raise RuntimeError(f"No runner service available ({error})")
+
+    def stop(self):
+        self._stopped.set()
+
+    def stats(self):
+        return [node.stats() for node in self.nodes]
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return this process's runner service client, or None when RUNNER_SERVICE is unset."""
+    global _client, _client_pid
+    addresses = [a.strip() for a in SERVICE_NODES.split(",") if a.strip()]
+    if not addresses:
+        return None
+    with _client_lock:
+        # gunicorn forks workers after import; sockets and threads don't survive the fork
+        if _client is None or _client_pid != os.getpid():
+            _client = RunnerClient(addresses)
+            _client_pid = os.getpid()
+        return _client
+
+
+def service_stats():
+    client = get_client()
+    if client is None:
+        return {"enabled": False}
+    return {"enabled": True, "nodes": client.stats()}
@@ -0,0 +1,220 @@
+"""
+Content-addressed verdict cache.
+
+Identical submissions (same normalised code, same problem version and test
+cases) get the stored verdict instead of a re-run. Entries live in a
+per-process LRU with a TTL and, when ``RESULT_CACHE_PATH`` is set, in a
+SQLite file shared by every gunicorn worker on the box.
+
+The key includes the problem's ``updated_at``, a hash of its
+``test_cases`` and the effective CPU and memory limits (the problem's own,
+or the ``RUNNER_*`` defaults), so editing a problem or changing the default
+limits invalidates its entries automatically. Verdicts that depend on machine load (timeouts, runner failures) are never
+cached.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from runner.code_runner import resource_limits
+
+CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))  # in-memory entries; 0 disables the cache
+CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "3600"))    # seconds
+CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "")           # shared SQLite tier; empty = memory only
+PRUNE_EVERY = 200  # disk writes between expired-row sweeps
+
+# Errors caused by the runner or the host rather than by the code itself.
+# CPU-time and memory limit verdicts don't depend on load and are cached;
+# complexity verdicts and signal kills are never cached (see _is_cacheable).
+_TRANSIENT_ERRORS = (
+    "Wall Time Limit Exceeded",
+    "Internal Execution Error",
+    "Runner process exited unexpectedly",
+    "Runner service",
+)
+
+
+def normalise_code(code):
+    """Normalise line endings and surrounding whitespace (what the runner ignores anyway)."""
+    return code.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _is_cacheable(details):
+    for d in details:
+        if d.get("status") != "error":
+            continue
+        if str(d.get("error", "")).startswith(_TRANSIENT_ERRORS):
+            return False
+        # Timings on generated inputs (runner/stress.py) depend on load
+        if d.get("verdict") == "complexity":
+            return False
+        # SIGKILL may be the OOM killer or the wall-clock backstop, not the code
+        if d.get("verdict") == "crash" and str(d.get("error", "")).startswith("Process killed by"):
+            return False
+    return True
+
+
+class ResultCache:
+    def __init__(self, size=CACHE_SIZE, ttl=CACHE_TTL, path=CACHE_PATH):
+        self.size = size
+        self.ttl = ttl
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, passed, details)
+        self._tests_hashes = OrderedDict()  # (problem_id, updated_at) -> hash of test_cases, LRU
+        self._local = threading.local()
+        self._disk_writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    # --------------------------------------------------
+    # Keys
+    # --------------------------------------------------
+
+    def _tests_hash(self, problem):
+        version = (problem.get("id"), problem.get("updated_at"))
+        with self._lock:
+            cached = self._tests_hashes.get(version)
+            if cached is not None:
+                self._tests_hashes.move_to_end(version)
+        if cached is None:
+            cached = _sha256(json.dumps(problem["test_cases"], sort_keys=True))
+            with self._lock:
+                self._tests_hashes[version] = cached
+                while len(self._tests_hashes) > self.size:
+                    self._tests_hashes.popitem(last=False)
+        return cached
+
+    def key(self, code, problem, language="python"):
+        parts = [
+            str(problem.get("id")),
+            str(problem.get("updated_at")),
+            self._tests_hash(problem),
+            "{cpu_ms}ms/{memory_mb}mb".format(**resource_limits(problem)),
+            _sha256(normalise_code(code)),
+        ]
+        if language != "python":
+            parts.append(language)  # python keys stay as they were
+        return ":".join(parts)
+
+    # --------------------------------------------------
+    # Disk tier
+    # --------------------------------------------------
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                " key TEXT PRIMARY KEY, passed INTEGER NOT NULL,"
+                " details TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _disk_get(self, key, now):
+        row = self._db().execute(
+            "SELECT passed, details, expires_at FROM verdicts WHERE key = ? AND expires_at > ?",
+            (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[2], bool(row[0]), json.loads(row[1])
+
+    def _disk_put(self, key, entry, now):
+        conn = self._db()
+        conn.execute(
+            "INSERT OR REPLACE INTO verdicts (key, passed, details, expires_at) VALUES (?, ?, ?, ?)",
+            (key, int(entry[1]), json.dumps(entry[2]), entry[0])
+        )
+        self._disk_writes += 1
+        if self._disk_writes % PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM verdicts WHERE expires_at <= ?", (now,))
+        conn.commit()
+
+    # --------------------------------------------------
+    # Public API
+    # --------------------------------------------------
+
+    def get(self, code, problem, language="python"):
+        """Return ``(passed, details)`` for a cached verdict, or None."""
+        if not self.enabled:
+            return None
+        key = self.key(code, problem, language)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            if entry is not None:
+                del self._entries[key]
+
+        if self.path:
+            entry = self._disk_get(key, now)
+            if entry is not None:
+                with self._lock:
+                    self._remember(key, entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return entry[1], entry[2]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, code, problem, passed, details, language="python"):
+        if not self.enabled or not _is_cacheable(details):
+            return
+        key = self.key(code, problem, language)
+        now = time.time()
+        entry = (now + self.ttl, passed, details)
+
+        with self._lock:
+            self._remember(key, entry)
+            self.stores += 1
+        if self.path:
+            self._disk_put(key, entry, now)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+result_cache = ResultCache()
@@ -0,0 +1,203 @@
+"""
+Standalone runner service: executes harness jobs for web workers.
+
+    python -m runner.service unix:/tmp/dynocode-runner.sock
+    python -m runner.service 127.0.0.1:7071
+    RUNNER_SERVICE_TOKEN=<secret> python -m runner.service 10.0.0.5:7071
+
+Run from the repository root, as its own process (or container), then point
+the web app at it with ``RUNNER_SERVICE`` (see runner/remote.py for the
+client and the frame protocol). Several nodes can be listed; each reports
+its load so web workers send jobs to the least busy one.
+
+A node runs jobs exactly as the web app would in-process: through its own
+warm pool when ``RUNNER_POOL_SIZE`` is set, else one harness interpreter per
+job. ``RUNNER_SERVICE_CAPACITY`` (default: the pool size, or the core count)
+caps concurrent jobs; further jobs wait up to ``QUEUE_TIMEOUT`` seconds for
+a slot and are then refused, and the client tries another node.
+
+A node runs whatever code it is sent, so it only takes JOB and PING frames
+carrying ``RUNNER_SERVICE_TOKEN`` (compared in constant time), and refuses
+to listen on a non-loopback TCP address without one. Set the same token on
+the web app; unix sockets and loopback may leave it empty.
+
+Test bundles are passed by path, so nodes on other machines need the same
+``RUNNER_BUNDLE_DIR`` contents; web workers only send bundle paths to nodes
+on the local machine (``unix:`` or loopback addresses).
+"""
+import hmac
+import json
+import logging
+import os
+import select
+import signal
+import socket
+import socketserver
+import sys
+import threading
+
+from runner.code_runner import start_local_harness
+from runner.pool import POOL_SIZE
+from runner.remote import (
+    send_frame, recv_frame, parse_address, is_local, SERVICE_TOKEN,
+    JOB, CANCEL, PING, ACCEPTED, DATA, DONE, PONG, ERROR,
+)
+
+logger = logging.getLogger(__name__)
+
+CAPACITY = int(os.getenv("RUNNER_SERVICE_CAPACITY", "0")) or POOL_SIZE or os.cpu_count() or 1
+QUEUE_TIMEOUT = 10  # seconds a job may wait for a free slot
+
+_slots = threading.BoundedSemaphore(CAPACITY)
+_lock = threading.Lock()
+_stats = {"active": 0, "queued": 0, "served": 0, "refused": 0, "cancelled": 0}
+
+
+def authorized(message):
+    token = message.get("token") if isinstance(message, dict) else None
+    return hmac.compare_digest(str(token or "").encode(), SERVICE_TOKEN.encode())
+
+
+def load():
+    with _lock:
+        return dict(_stats, capacity=CAPACITY)
+
+
+class JobHandler(socketserver.BaseRequestHandler):
+    """One client connection: any number of PINGs and JOBs, one job at a time."""
+
+    def handle(self):
+        sock = self.request
+        sock.setblocking(True)
+        while True:
+            try:
+                frame = recv_frame(sock)
+            except (OSError, ValueError):
+                return
+            if frame is None:
+                return
+            kind, payload = frame
+            if kind not in (PING, JOB):
+                continue
+            try:
+                message = json.loads(payload or b"{}")
+            except ValueError:
+                return
+            if not authorized(message):
+                logger.warning(f"🔒 Runner service refused a frame with a bad token from {self.client_address or 'unix socket'}")
+                send_frame(sock, ERROR, {"error": "Runner service refused the job: bad RUNNER_SERVICE_TOKEN"})
+                return
+            if kind == PING:
+                send_frame(sock, PONG, load())
+            else:
+                message.pop("token", None)
+                if not self.run_job(sock, message):
+                    return
+
+    def run_job(self, sock, job):
+        """Run one job, streaming its events; returns False if the client went away."""
+        with _lock:
+            _stats["queued"] += 1
+        acquired = _slots.acquire(timeout=QUEUE_TIMEOUT)
+        with _lock:
+            _stats["queued"] -= 1
+            if not acquired:
+                _stats["refused"] += 1
+        if not acquired:
+            send_frame(sock, ERROR, {"error": "Runner service busy"})
+            return True
+        try:
+            try:
+                session = start_local_harness(job)
+            except Exception as e:
+                send_frame(sock, ERROR, {"error": f"Internal Execution Error: {e}"})
+                return True
+            with _lock:
+                _stats["active"] += 1
+            try:
+                connected = self._stream(sock, session)
+                returncode = session.exit_status()
+                error = session.crash_error(returncode)
+            finally:
+                session.close()
+                with _lock:
+                    _stats["active"] -= 1
+                    _stats["served"] += 1
+        finally:
+            _slots.release()
+
+        if connected:
+            send_frame(sock, DONE, dict(load(), returncode=returncode, error=error))
+        return connected
+
+    def _stream(self, sock, session):
+        send_frame(sock, ACCEPTED)
+        if session.buffer:
+            send_frame(sock, DATA, session.buffer)
+        while True:
+            ready, _, _ = select.select([session.fileno(), sock], [], [])
+            if sock in ready:
+                try:
+                    frame = recv_frame(sock)
+                except (OSError, ValueError):
+                    frame = None
+                # CANCEL, or the client is gone: kill the job and let its stream end
+                session.kill()
+                if frame is None:
+                    return False
+                if frame[0] == CANCEL:
+                    with _lock:
+                        _stats["cancelled"] += 1
+            if session.fileno() in ready:
+                try:
+                    chunk = session.read()
+                except ConnectionResetError:
+                    chunk = b""
+                if not chunk:
+                    return True
+                send_frame(sock, DATA, chunk)
+
+
+class UnixJobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TcpJobServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(address):
+    family, sockaddr = parse_address(address)
+    if not SERVICE_TOKEN and not is_local(family, sockaddr):
+        raise SystemExit(f"Refusing to serve {address} without RUNNER_SERVICE_TOKEN: anyone who can connect could run code")
+    if family == socket.AF_UNIX:
+        if os.path.exists(sockaddr):
+            os.unlink(sockaddr)  # left over from a previous run
+        server = UnixJobServer(sockaddr, JobHandler)
+    else:
+        server = TcpJobServer(sockaddr, JobHandler)
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info(f"🏃 Runner service listening on {address} (capacity={CAPACITY})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if family == socket.AF_UNIX and os.path.exists(sockaddr):
+            os.unlink(sockaddr)
+        logger.info("🛑 Runner service stopped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    serve(sys.argv[1] if len(sys.argv) > 1 else os.getenv("RUNNER_SERVICE_LISTEN", "unix:/tmp/dynocode-runner.sock"))
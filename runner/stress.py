@@ -0,0 +1,242 @@
+"""
+Complexity checks on generated stress inputs.
+
+Fixed test cases can't tell an O(n²) solution from an O(n log n) one, and
+storing inputs large enough to do so in ``test_cases`` is expensive. A
+problem can instead declare a ``stress_test``:
+
+    {
+        "generator": "def generate(n, rng):\\n    return [rng.randint(1, 10**9) for _ in range(n)], 7",
+        "sizes": [2000, 4000, 8000, 16000, 32000],
+        "complexity": "n log n",
+        "seed": 1
+    }
+
+``generate(n, rng)`` returns solve()'s arguments for an input of size ``n``
+(a tuple of arguments; any other value is the only argument). ``rng`` is a
+``random.Random`` seeded from the spec's seed and ``n``, so a spec always
+yields the same inputs. ``load`` runs the generator once per problem version
+and seed and writes the inputs as a test bundle (runner/bundles.py) next to
+the regular ones; harnesses memory-map it like any other bundle.
+
+Once the fixed cases pass, the runner executes every size ``REPEATS`` times
+(interleaved, so drift hits all sizes alike) and keeps the lowest CPU time
+per size. Outputs aren't checked, there is nothing to check them against.
+``judge`` fits the timings to each complexity class as ``a + b·f(n)``
+(least squares on relative error) and fails the run only when a slower
+class explains them clearly better than the expected one, so noise and
+near-indistinguishable classes (n vs n log n) never fail a run. Timings
+too small to measure give no verdict.
+
+Pick sizes where the expected solution's work dominates fixed costs: the
+constant term absorbs start-up (a whole process per case for compiled
+languages), but a curve that barely bends over the sizes can't be judged.
+Generated inputs need ``RUNNER_BUNDLE_DIR``; without it the check is skipped.
+"""
+import math
+import pickle
+import random
+import threading
+import time
+import logging
+
+from runner import bundles
+from runner.harness import TestBundle
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [1000, 2000, 4000, 8000, 16000]
+REPEATS = 3          # runs per size; the fastest counts
+MIN_SIGNAL_MS = 5.0  # the largest input must take this long for a verdict
+MIN_MISFIT = 0.15    # relative RMS error at which the expected class stops explaining the timings
+MARGIN = 2.0         # ... and the slower class must fit this many times better
+
+# (key, label, f(n)), fastest growing last
+CLASSES = [
+    ("1", "O(1)", lambda n: 1.0),
+    ("log n", "O(log n)", lambda n: math.log2(n)),
+    ("n", "O(n)", lambda n: float(n)),
+    ("n log n", "O(n log n)", lambda n: n * math.log2(n)),
+    ("n^2", "O(n²)", lambda n: float(n) ** 2),
+    ("n^3", "O(n³)", lambda n: float(n) ** 3),
+]
+_RANK = {key: rank for rank, (key, _, _) in enumerate(CLASSES)}
+_LABEL = {key: label for key, label, _ in CLASSES}
+
+_lock = threading.Lock()
+_stats = {"generated": 0, "generate_ms": 0.0, "loaded": 0, "errors": 0, "checked": 0, "flagged": 0}
+
+
+def normalise_class(text):
+    """``"O(n log n)"``, ``"nlogn"``, ``"n²"`` ... -> a CLASSES key, or None."""
+    text = str(text).strip().lower()
+    if text.startswith("o(") and text.endswith(")"):
+        text = text[2:-1]
+    text = text.replace(" ", "").replace("*", "").replace("²", "^2").replace("³", "^3")
+    for key, _, _ in CLASSES:
+        if text in (key.replace(" ", ""), key.replace("^", "")):
+            return key
+    return None
+
+
+def label(key):
+    """Display form of a CLASSES key, e.g. "O(n log n)"."""
+    return _LABEL[key]
+
+
+def _generate(problem_id, spec):
+    """Case records for every size in ``spec``."""
+    namespace = {}
+    exec(compile(spec["generator"], f"<stress generator for {problem_id}>", "exec"), namespace)
+    generate = namespace["generate"]
+
+    seed = spec.get("seed", 0)
+    records = []
+    for n in spec["sizes"]:
+        args = generate(n, random.Random(f"{seed}:{n}"))
+        if not isinstance(args, tuple):
+            args = (args,)
+        records.append(("args", args, {}))
+    return records
+
+
+def load(problem_id, version, fetch_spec):
+    """Return ``{"path", "sizes", "complexity"}`` for a problem version, or None without a usable spec.
+
+    ``fetch_spec()`` is only called when no generated inputs exist yet.
+    """
+    if not bundles.BUNDLE_DIR or version is None:
+        return None
+
+    path = bundles.bundle_path(problem_id, version, ".stress")
+    try:
+        meta = TestBundle(path).meta()
+        with _lock:
+            _stats["loaded"] += 1
+        return dict(meta, path=path) if meta.get("sizes") else None
+    except (OSError, ValueError, pickle.UnpicklingError):
+        pass
+
+    spec = fetch_spec()
+    start = time.perf_counter()
+    meta = {"sizes": [], "complexity": None}
+    records = []
+    if spec:
+        try:
+            spec = dict(spec, sizes=sorted(spec.get("sizes") or DEFAULT_SIZES))
+            complexity = normalise_class(spec.get("complexity"))
+            if complexity is None:
+                raise ValueError(f"Unknown complexity {spec.get('complexity')!r}")
+            if len(spec["sizes"]) < 3:
+                raise ValueError("At least three sizes are needed to fit a curve")
+            records = _generate(problem_id, spec)
+            meta = {"sizes": spec["sizes"], "complexity": complexity}
+        except Exception as e:
+            logger.warning(f"⚠️ Stress test for {problem_id} skipped: {e}")
+            with _lock:
+                _stats["errors"] += 1
+
+    try:
+        # Problems without a (working) spec get an empty file, so the spec isn't fetched again
+        bundles.write_records(path, records, meta)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not write stress inputs for {problem_id}: {e}")
+        return None
+
+    if not records:
+        return None
+    elapsed = (time.perf_counter() - start) * 1000
+    with _lock:
+        _stats["generated"] += 1
+        _stats["generate_ms"] += elapsed
+    logger.info(f"🧪 Generated stress inputs for {problem_id} (n={spec['sizes'][-1]} max, {elapsed:.0f}ms)")
+    return dict(meta, path=path)
+
+
+def cases(stress_test):
+    """Runner cases for ``stress_test``: every size, ``REPEATS`` rounds in a row."""
+    return [
+        {
+            "input": f"<generated, n={n}>",
+            "size": n,
+            "position": position,
+            "bundle": stress_test["path"],
+            "unchecked": True,
+        }
+        for _ in range(REPEATS)
+        for position, n in enumerate(stress_test["sizes"])
+    ]
+
+
+def input_text(path, position):
+    """A generated input as source text, for runners that can't read the bundle file."""
+    _, args, _ = TestBundle(path).case(position)
+    return ", ".join(repr(arg) for arg in args)
+
+
+# ======================================================
+# CURVE FIT
+# ======================================================
+
+def _fit(samples, f):
+    """Relative RMS error of the best ``a + b·f(n)`` (a, b >= 0) through ``samples``."""
+    weights = [1 / t ** 2 for _, t in samples]
+    xs = [f(n) for n, _ in samples]
+    ts = [t for _, t in samples]
+
+    sw = sum(weights)
+    sx = sum(w * x for w, x in zip(weights, xs))
+    st = sum(w * t for w, t in zip(weights, ts))
+    sxx = sum(w * x * x for w, x in zip(weights, xs))
+    sxt = sum(w * x * t for w, x, t in zip(weights, xs, ts))
+
+    det = sw * sxx - sx * sx
+    b = (sw * sxt - sx * st) / det if det > 1e-12 * sw * sxx else 0.0
+    a = (st - b * sx) / sw
+    if b < 0:
+        a, b = st / sw, 0.0
+    elif a < 0:
+        a, b = 0.0, sxt / sxx
+
+    residual = sum(w * (a + b * x - t) ** 2 for w, x, t in zip(weights, xs, ts))
+    return math.sqrt(residual / len(samples))
+
+
+def judge(samples, expected):
+    """Complexity verdict for ``[(n, cpu_ms), ...]`` against the expected CLASSES key."""
+    result = {
+        "expected": _LABEL[expected],
+        "measured": None,
+        "samples": [[n, round(t, 2)] for n, t in samples],
+        "ok": True,
+    }
+    if max(t for _, t in samples) < MIN_SIGNAL_MS:
+        result["message"] = "Too fast to measure the growth"
+        return result
+
+    # Sub-resolution timings would dominate a relative fit
+    samples = [(n, max(t, 0.01)) for n, t in samples]
+    errors = {key: _fit(samples, f) for key, _, f in CLASSES}
+    lowest = min(errors.values())
+    # The simplest class that fits about as well as any
+    best = next(key for key, _, _ in CLASSES if errors[key] <= lowest * 1.1 + 0.01)
+    result["measured"] = _LABEL[best]
+    result["fit_error"] = {_LABEL[key]: round(error, 3) for key, error in errors.items()}
+
+    misfit = errors[expected]
+    if _RANK[best] > _RANK[expected] and misfit > MIN_MISFIT and misfit > MARGIN * errors[best]:
+        result["ok"] = False
+        result["message"] = f"Looks {_LABEL[best]}, expected {_LABEL[expected]}"
+    else:
+        result["message"] = f"Growth consistent with {_LABEL[expected]}"
+
+    with _lock:
+        _stats["checked"] += 1
+        if not result["ok"]:
+            _stats["flagged"] += 1
+    return result
+
+
+def stats():
+    with _lock:
+        return dict(_stats, generate_ms=round(_stats["generate_ms"], 1))
@@ -0,0 +1,178 @@
+"""
+Warm template process for the runner pool (runner/pool.py).
+
+Started as ``[sys.executable, zygote.py, <socket_path>, <size>]``.
+The zygote imports the harness and the commonly used stdlib modules once,
+then keeps ``size`` forked children blocked on the listening socket. Each
+child accepts exactly one connection, runs one job and exits; the zygote
+forks a replacement as soon as a child picks up work.
+
+Wire protocol on an accepted connection: the client sends the job JSON and
+shuts down its write side; the child answers with newline-delimited JSON
+events, starting with ``{"event": "started", "pid": <pid>}`` so the client
+can kill it on timeout, followed by the harness events.
+
+The child runs the job in a forked runner of its own and waits for it, so
+that when the runner is killed by a signal (RLIMIT_CPU's SIGXCPU, a
+segfault, or exits early (``os._exit``, ``sys.exit`` escaping the harness),
+it can still report ``{"event": "exited", "returncode": <status>}``, with
+the status of a Popen: negative for a signal.
+Child and runner share a process group, which the client kills as a unit.
+"""
+import importlib
+import json
+import os
+import select
+import signal
+import socket
+import struct
+import sys
+import traceback
+
+import harness
+
+# Imported once in the template so every forked child starts warm
+PRELOAD_MODULES = [
+    "bisect", "collections", "functools", "heapq", "itertools",
+    "math", "random", "re", "string", "typing",
+]
+
+LISTEN_BACKLOG = 64
+PID_FORMAT = "i"
+PID_SIZE = struct.calcsize(PID_FORMAT)
+
+
+class _Shutdown(Exception):
+    pass
+
+
+def _stop(signum, frame):
+    raise _Shutdown()
+
+
+def _serve_one(listener, notify_w, zygote_pid):
+    """Child body: wait for one connection, run its job, exit."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    while True:
+        ready, _, _ = select.select([listener], [], [], 1.0)
+        if os.getppid() != zygote_pid:
+            # Template went away (recycled or crashed); don't linger
+            os._exit(0)
+        if not ready:
+            continue
+        try:
+            conn, _ = listener.accept()
+            break
+        except (BlockingIOError, InterruptedError):
+            # Another idle child won the accept()
+            continue
+
+    os.write(notify_w, struct.pack(PID_FORMAT, os.getpid()))
+    os.close(notify_w)
+    listener.close()
+    os.setpgid(0, 0)
+
+    conn.setblocking(True)
+    channel = conn.makefile("w", buffering=1)
+
+    def emit(event):
+        channel.write(json.dumps(event) + "\n")
+        channel.flush()
+
+    try:
+        emit({"event": "started", "pid": os.getpid()})
+        data = b""
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+        job = json.loads(data)
+
+        runner = os.fork()
+        if runner == 0:
+            # Exit the way a harness interpreter would (runner/code_runner.py)
+            code = 0
+            try:
+                harness.run_job(job, emit)
+                channel.close()
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+
+        _, status = os.waitpid(runner, 0)
+        if os.WIFSIGNALED(status):
+            emit({"event": "exited", "returncode": -os.WTERMSIG(status)})
+        else:
+            emit({"event": "exited", "returncode": os.WEXITSTATUS(status)})
+        channel.close()
+    finally:
+        os._exit(0)
+
+
+def main():
+    socket_path = sys.argv[1]
+    size = int(sys.argv[2])
+
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(LISTEN_BACKLOG)
+    listener.setblocking(False)
+
+    notify_r, notify_w = os.pipe()
+    zygote_pid = os.getpid()
+    owner_pid = os.getppid()
+
+    idle = set()
+    signal.signal(signal.SIGTERM, _stop)
+
+    try:
+        while True:
+            while len(idle) < size:
+                pid = os.fork()
+                if pid == 0:
+                    os.close(notify_r)
+                    _serve_one(listener, notify_w, zygote_pid)
+                idle.add(pid)
+
+            ready, _, _ = select.select([notify_r], [], [], 1.0)
+            if os.getppid() != owner_pid:
+                # The web worker that owns this pool is gone
+                break
+            if ready:
+                data = os.read(notify_r, PID_SIZE * 64)
+                for offset in range(0, len(data) - PID_SIZE + 1, PID_SIZE):
+                    (pid,) = struct.unpack_from(PID_FORMAT, data, offset)
+                    idle.discard(pid)
+
+            # Reap children that finished their job
+            while True:
+                try:
+                    pid, _ = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if pid == 0:
+                    break
+                idle.discard(pid)
+    except _Shutdown:
+        pass
+
+    # Recycled or shut down: stop accepting. Idle children notice the
+    # template is gone and exit; a child that already accepted a job
+    # finishes it, and its client kills it if it overruns.
+    listener.close()
+    try:
+        os.unlink(socket_path)
+    except OSError:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -242,6 +242,8 @@ function loadMonaco() {
   initProgress(); // Initialize sidebar status
   initSidebarState(); // Restore sidebar state
   initResizers(); // Enable drag resizing
+  initLanguageSelect(); // Restore the chosen language
+  initNavigation(); // Switch problems without reloading the page
   require.config({ paths: { vs: MONACO_CDN } });
 
   require(["vs/editor/editor.main"], () => {
@@ -251,11 +253,12 @@ function loadMonaco() {
 }
 
 function createEditor() {
-  const savedCode = localStorage.getItem(`code_${PROBLEM_ID}`);
+  const savedCode = localStorage.getItem(draftKey());
 
   editor = monaco.editor.create(getEditorContainer(), {
-    value: savedCode || INITIAL_CODE,
-    ...EDITOR_CONFIG
+    ...EDITOR_CONFIG,
+    value: savedCode || starterCode(),
+    language: languageInfo().editor
   });
 
   if (savedCode) {
@@ -265,10 +268,51 @@ function createEditor() {
   // Auto-Save Listener
   editor.onDidChangeModelContent(() => {
     const currentCode = editor.getValue();
-    localStorage.setItem(`code_${PROBLEM_ID}`, currentCode);
+    localStorage.setItem(draftKey(), currentCode);
   });
 }
 
+/* ======================================================
+   LANGUAGES
+====================================================== */
+
+let currentLanguage = initialLanguage();
+
+function initialLanguage() {
+  const saved = localStorage.getItem("language");
+  return LANGUAGES.some(l => l.name === saved) ? saved : "python";
+}
+
+function languageInfo() {
+  return LANGUAGES.find(l => l.name === currentLanguage) || { name: "python", editor: "python", starter: "" };
+}
+
+function draftKey() {
+  // Python drafts keep their original key
+  return currentLanguage === "python" ? `code_${PROBLEM_ID}` : `code_${PROBLEM_ID}_${currentLanguage}`;
+}
+
+function starterCode() {
+  return languageInfo().starter || INITIAL_CODE;
+}
+
+function switchLanguage(name) {
+  // The draft of the old language is already saved on every change
+  currentLanguage = name;
+  localStorage.setItem("language", name);
+  if (!editor) return;
+
+  const savedCode = localStorage.getItem(draftKey());
+  monaco.editor.setModelLanguage(editor.getModel(), languageInfo().editor);
+  editor.setValue(savedCode || starterCode());
+  editor.focus();
+}
+
+function initLanguageSelect() {
+  const select = document.getElementById("language-select");
+  if (select) select.value = currentLanguage;
+}
+
 function focusEditor() {
   /* Place cursor inside solve() */
   editor.revealLineInCenter(1);
@@ -290,7 +334,7 @@ function runCode() {
   formatEditorCode();
 
   const code = editor.getValue();
-  showBeginnerWarning(code);
+  if (currentLanguage === "python") showBeginnerWarning(code);
 
   executeCode(code)
     .then(renderTestResults)
@@ -298,15 +342,98 @@ function runCode() {
     .finally(resetRunState);
 }
 
-function executeCode(code) {
+const POLL_INITIAL_MS = 150;
+const POLL_MAX_MS = 1000;
+const RUN_RETRY_LIMIT = 3;      // automatic retries after a 429
+const RUN_RETRY_MAX_S = 60;
+
+function executeCode(code, attempt = 0) {
   return fetch("/run", {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({
       code,
-      problem_id: PROBLEM_ID
+      problem_id: PROBLEM_ID,
+      language: currentLanguage
     })
-  }).then(res => res.json());
+  })
+    .then(res => {
+      if (res.status === 429 && attempt < RUN_RETRY_LIMIT) {
+        // Not admitted: wait as long as the server asks, then try again
+        const seconds = retryAfterSeconds(res);
+        return showRetryCountdown(seconds).then(() => executeCode(code, attempt + 1));
+      }
+      return res.json().then(data => (data.job_id ? streamJob(data.job_id) : data));
+    });
+}
+
+function retryAfterSeconds(res) {
+  const header = res.headers.get("Retry-After") || "";
+  let seconds = Number(header);
+  if (header === "" || Number.isNaN(seconds)) {
+    // HTTP-date form
+    const date = Date.parse(header);
+    seconds = Number.isNaN(date) ? 1 : (date - Date.now()) / 1000;
+  }
+  return Math.min(Math.max(Math.ceil(seconds), 1), RUN_RETRY_MAX_S);
+}
+
+function showRetryCountdown(seconds) {
+  const output = getOutputContainer();
+  output.className = "";
+  return new Promise(resolve => {
+    const tick = remaining => {
+      if (remaining <= 0) {
+        showRunningState();
+        return resolve();
+      }
+      output.innerHTML = `<div class='muted'>🚦 Runners are busy — retrying in ${remaining}s...</div>`;
+      setTimeout(() => tick(remaining - 1), 1000);
+    };
+    tick(seconds);
+  });
+}
+
+function streamJob(jobId) {
+  /* Render each test case as soon as it finishes; resolves with the final result */
+  if (!window.EventSource) return pollJob(jobId);
+
+  return new Promise(resolve => {
+    const source = new EventSource(`/run/${jobId}/events`);
+    let received = 0;
+
+    source.addEventListener("case", e => {
+      const output = getOutputContainer();
+      if (received === 0) output.innerHTML = "";
+      output.appendChild(createTestRow(JSON.parse(e.data)));
+      received++;
+    });
+
+    source.addEventListener("summary", e => {
+      source.close();
+      resolve(JSON.parse(e.data));
+    });
+
+    source.onerror = () => {
+      // Stream dropped (proxy, network) or refused (server at RUN_STREAM_LIMIT): fall back to polling
+      source.close();
+      resolve(pollJob(jobId));
+    };
+  });
+}
+
+function pollJob(jobId, delay = POLL_INITIAL_MS) {
+  /* Wait for the queued run to finish, backing off between polls */
+  return new Promise(resolve => setTimeout(resolve, delay))
+    .then(() => fetch(`/run/${jobId}`))
+    .then(res => {
+      if (!res.ok) throw new Error(`Run status failed (${res.status})`);
+      return res.json();
+    })
+    .then(job => {
+      if (job.status === "done") return job;
+      return pollJob(jobId, Math.min(delay * 2, POLL_MAX_MS));
+    });
 }
 
 /* ======================================================
@@ -359,10 +486,19 @@ function renderTestResults(data) {
 
   output.classList.add(data.passed ? "success" : "failure");
 
+  if (data.cached) {
+    showToast("♻️ Same code as an earlier run — cached result");
+  }
+
+  if (data.passed && data.performance) {
+    output.appendChild(createPerformanceRow(data.performance));
+  }
+
   if (data.passed) {
     if (typeof PROBLEM_ID !== 'undefined') {
       markProblemSolved(PROBLEM_ID);
     }
+    refreshSidebar();
   }
 }
 
@@ -370,6 +506,10 @@ function createTestRow(test) {
   const row = document.createElement("div");
   row.classList.add("test-line");
 
+  if (test.complexity) {
+    return createComplexityRow(test, row);
+  }
+
   if (test.status === "passed") {
     row.classList.add("test-pass");
     row.innerText = `Test Case ${test.index} ✓ Passed`;
@@ -383,6 +523,13 @@ function createTestRow(test) {
       <span><b>Expected:</b> ${test.expected}</span><br>
       <span><b>Got:</b> ${test.got}</span>
     `;
+    if (test.stdout) {
+      // User output is shown as text, never as markup
+      const stdout = document.createElement("pre");
+      stdout.classList.add("test-stdout");
+      stdout.innerText = test.stdout;
+      row.appendChild(stdout);
+    }
   }
 
   else if (test.status === "error") {
@@ -397,6 +544,49 @@ function createTestRow(test) {
   return row;
 }
 
+function createComplexityRow(test, row) {
+  /* Growth check on generated inputs (runner/stress.py) */
+  const info = test.complexity;
+  const passed = test.status === "passed";
+  row.classList.add(passed ? "test-pass" : "test-error");
+  row.innerText = passed
+    ? `Complexity ✓ ${info.message}`
+    : `Complexity ✗ ${test.error}`;
+
+  if (info.samples) {
+    const timings = document.createElement("span");
+    timings.classList.add("muted");
+    timings.innerText = "\n" + info.samples
+      .map(([n, ms]) => `n=${n}: ${ms.toFixed(1)} ms`)
+      .join(", ");
+    row.appendChild(timings);
+  }
+  return row;
+}
+
+function createPerformanceRow(perf) {
+  /* "Runtime 12.3 ms, faster than 80% of accepted submissions" */
+  const row = document.createElement("div");
+  row.classList.add("test-line", "test-performance");
+
+  const parts = [];
+  if (perf.runtime_ms != null) {
+    let text = `⏱ Runtime ${perf.runtime_ms.toFixed(1)} ms`;
+    if (perf.runtime_beats != null) text += `, faster than ${perf.runtime_beats}% of accepted submissions`;
+    parts.push(text);
+  }
+  if (perf.memory_kb != null) {
+    let text = `💾 Memory ${(perf.memory_kb / 1024).toFixed(1)} MB`;
+    if (perf.memory_beats != null) text += `, less than ${perf.memory_beats}%`;
+    parts.push(text);
+  }
+  if (perf.compile_ms != null) {
+    parts.push(`🛠 Compile ${perf.compile_ms.toFixed(0)} ms${perf.compile_cached ? " (cached)" : ""}`);
+  }
+  row.innerHTML = parts.join("<br>");
+  return row;
+}
+
 function showSystemError(err) {
   const output = getOutputContainer();
   output.className = "error";
@@ -409,8 +599,8 @@ function showSystemError(err) {
 
 function resetCode() {
   if (confirm("Reset code to default? Your changes will be lost.")) {
-    editor.setValue(INITIAL_CODE);
-    localStorage.removeItem(`code_${PROBLEM_ID}`);
+    editor.setValue(starterCode());
+    localStorage.removeItem(draftKey());
     editor.focus();
   }
 }
@@ -486,6 +676,174 @@ function markProblemSolved(id) {
   }
 }
 
+/* ======================================================
+   CLIENT-SIDE NAVIGATION
+====================================================== */
+
+const problemCache = new Map(); // id -> { etag, data }
+let sidebarEtag = typeof SIDEBAR_ETAG !== "undefined" ? SIDEBAR_ETAG : null;
+
+function linkProblemId(link) {
+  return link.getAttribute("href").split("/").pop();
+}
+
+function initNavigation() {
+  const sidebar = document.getElementById("sidebar");
+  if (!sidebar || !window.fetch || !window.history.pushState) return;
+
+  history.replaceState({ problemId: PROBLEM_ID }, "", window.location.pathname);
+
+  sidebar.addEventListener("click", e => {
+    const link = e.target.closest("a.problem-link");
+    // New tabs, and clicks during a run (its result belongs to this problem), load normally
+    if (!link || isRunning || e.button !== 0 || e.metaKey || e.ctrlKey || e.shiftKey || e.altKey) return;
+    e.preventDefault();
+    openProblem(linkProblemId(link));
+  });
+
+  window.addEventListener("popstate", e => {
+    if (!e.state || !e.state.problemId) return;
+    if (isRunning) return window.location.reload();
+    openProblem(e.state.problemId, false);
+  });
+}
+
+function fetchProblem(id) {
+  /* Problem content, revalidated against the cached copy's ETag */
+  const cached = problemCache.get(id);
+  const headers = cached ? { "If-None-Match": cached.etag } : {};
+
+  return fetch(`/api/problem/${encodeURIComponent(id)}`, { headers })
+    .then(res => {
+      if (res.status === 304 && cached) return cached.data;
+      // A redirect means the session expired: the login page isn't JSON
+      if (!res.ok || res.redirected) throw new Error(`Problem load failed (${res.status})`);
+      return res.json().then(data => {
+        problemCache.set(id, { etag: res.headers.get("ETag"), data });
+        return data;
+      });
+    });
+}
+
+function openProblem(id, push = true) {
+  if (id === PROBLEM_ID) return;
+
+  // A cached problem shows at once; revalidation only redraws it if it changed
+  const cached = problemCache.get(id);
+  if (cached) showProblem(cached.data, push);
+
+  fetchProblem(id)
+    .then(data => {
+      if (!cached) showProblem(data, push);
+      else if (data !== cached.data && PROBLEM_ID === id) {
+        INITIAL_CODE = data.function_signature || "";
+        renderProblemPanel(data);
+      }
+      refreshSidebar();
+    })
+    .catch(() => {
+      if (!cached) window.location.href = `/problem/${id}`;
+    });
+}
+
+function showProblem(data, push) {
+  PROBLEM_ID = data.id;
+  INITIAL_CODE = data.function_signature || "";
+  renderProblemPanel(data);
+
+  document.querySelectorAll(".sidebar a.problem-link").forEach(link => {
+    link.classList.toggle("active", linkProblemId(link) === data.id);
+  });
+  if (push) history.pushState({ problemId: data.id }, "", `/problem/${data.id}`);
+
+  const output = getOutputContainer();
+  output.className = "";
+  output.innerText = "Run your code to see output";
+
+  if (editor) {
+    editor.setValue(localStorage.getItem(draftKey()) || starterCode());
+    focusEditor();
+  }
+}
+
+function renderProblemPanel(data) {
+  /* Same markup as templates/problem.html; all values go in as text */
+  document.getElementById("problem-title").textContent = data.title;
+
+  const badge = document.getElementById("problem-difficulty");
+  badge.className = `badge badge-${(data.difficulty || "").toLowerCase()}`;
+  badge.textContent = data.difficulty || "";
+
+  const tags = document.getElementById("problem-tags");
+  tags.innerHTML = "";
+  (data.tags || []).forEach(tag => {
+    const span = document.createElement("span");
+    span.classList.add("tag");
+    span.textContent = `#${tag}`;
+    tags.appendChild(span);
+  });
+
+  document.getElementById("problem-description").textContent = data.description || "";
+  document.getElementById("problem-sample-input").textContent = `Input: ${data.sample_input}`;
+  document.getElementById("problem-sample-output").textContent = `Output: ${data.sample_output}`;
+
+  const hints = data.hints || [];
+  const hintBox = document.getElementById("problem-hints");
+  const hintList = document.getElementById("hint-list");
+  hintList.innerHTML = "";
+  hints.forEach(hint => {
+    const item = document.createElement("li");
+    item.textContent = hint;
+    hintList.appendChild(item);
+  });
+  hintBox.hidden = hints.length === 0;
+  hintBox.querySelector("details").open = false;
+
+  document.querySelector(".problem-panel").scrollTop = 0;
+}
+
+function refreshSidebar() {
+  /* Picks up solves and catalog changes; a 304 when nothing changed */
+  const headers = sidebarEtag ? { "If-None-Match": sidebarEtag } : {};
+
+  return fetch("/api/sidebar", { headers })
+    .then(res => {
+      if (res.status !== 200 || res.redirected) return;
+      sidebarEtag = res.headers.get("ETag");
+      return res.json().then(renderSidebar);
+    })
+    .catch(() => {}); // keep the sidebar we have
+}
+
+function renderSidebar(data) {
+  const sidebar = document.getElementById("sidebar");
+  sidebar.querySelectorAll(".day-group").forEach(group => group.remove());
+
+  data.groups.forEach(group => {
+    const groupDiv = document.createElement("div");
+    groupDiv.classList.add("day-group");
+
+    const title = document.createElement("div");
+    title.classList.add("day-title");
+    title.textContent = group.day;
+    groupDiv.appendChild(title);
+
+    group.problems.forEach(p => {
+      const link = document.createElement("a");
+      link.href = `/problem/${p.id}`;
+      link.classList.add("problem-link");
+      link.classList.toggle("active", p.id === PROBLEM_ID);
+      link.classList.toggle("solved", p.solved);
+      link.textContent = p.title;
+      groupDiv.appendChild(link);
+    });
+
+    sidebar.appendChild(groupDiv);
+  });
+
+  initProgress(); // re-apply the localStorage checkmarks
+}
+
 /* ======================================================
    SHORTCUTS & EVENTS
 ====================================================== */
@@ -0,0 +1,117 @@
+"""
+Fingerprinted, precompressed static assets.
+
+Templates link CSS and JS through ``asset_url("style.css")``, which returns
+``/assets/style.<hash>.css``. The hash is taken from the file's content, so
+a URL always means the same bytes and browsers may keep it for a year
+(``Cache-Control: public, max-age=31536000, immutable``); a changed file
+gets a new URL and is fetched again.
+
+At startup every process copies ``static/`` into ``STATIC_ASSET_DIR`` under
+the fingerprinted names, with a ``.gz`` variant (gzip -9) next to each text
+file that compresses. Names are content-addressed, so processes sharing the
+directory write the same files and existing ones are skipped. ``/assets/``
+sends the ``.gz`` file with ``Content-Encoding: gzip`` to clients that
+accept it, without compressing per request. Files of earlier builds are
+left in place, so pages rendered before a deploy still find their assets.
+
+``STATIC_FINGERPRINTS=0`` makes ``asset_url`` return the plain
+``/static/`` URLs, for editing CSS/JS without restarting the app.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+
+from flask import abort, request, send_file, url_for
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+ASSET_DIR = os.getenv("STATIC_ASSET_DIR", os.path.join(tempfile.gettempdir(), "dynocode-assets"))
+FINGERPRINTS = os.getenv("STATIC_FINGERPRINTS", "1") != "0"  # "0" = plain /static/ URLs
+MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = (".css", ".js", ".html", ".svg", ".json", ".txt", ".map")
+
+_manifest = {}  # "style.css" -> "style.<hash>.css"
+
+
+def fingerprint(name, content):
+    """``dir/style.css`` -> ``dir/style.<hash>.css``."""
+    root, ext = os.path.splitext(name)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+
+def _write(path, content):
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def build(static_folder, out_dir=ASSET_DIR):
+    """Copy every file under ``static_folder`` to its fingerprinted name; returns the manifest."""
+    manifest = {}
+    compressed = 0
+    for folder, _, files in os.walk(static_folder):
+        for filename in sorted(files):
+            source = os.path.join(folder, filename)
+            name = os.path.relpath(source, static_folder).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                content = f.read()
+
+            target = fingerprint(name, content)
+            _write(os.path.join(out_dir, target), content)
+            if name.endswith(COMPRESSIBLE):
+                # mtime=0 keeps the output identical across processes and builds
+                packed = gzip.compress(content, 9, mtime=0)
+                if len(packed) < len(content):
+                    _write(os.path.join(out_dir, target + ".gz"), packed)
+                    compressed += 1
+            manifest[name] = target
+
+    logger.info(f"🗜️ Static assets fingerprinted ({len(manifest)} files, {compressed} gzipped) in {out_dir}")
+    return manifest
+
+
+def asset_url(name):
+    """Long-cacheable URL of a file under static/."""
+    if FINGERPRINTS and name in _manifest:
+        return f"/assets/{_manifest[name]}"
+    return url_for("static", filename=name)
+
+
+def serve_asset(filename):
+    path = safe_join(ASSET_DIR, filename)
+    if path is None or filename.endswith(".gz") or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    packed = path + ".gz"
+    if request.accept_encodings["gzip"] and os.path.isfile(packed):
+        response = send_file(packed, mimetype=mimetype, max_age=MAX_AGE)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = send_file(path, mimetype=mimetype, max_age=MAX_AGE)
+
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def install(app):
+    """Build the assets for ``app.static_folder`` and register ``/assets/`` and ``asset_url``."""
+    global _manifest
+    if FINGERPRINTS:
+        try:
+            _manifest = build(app.static_folder)
+        except OSError as e:
+            logger.warning(f"⚠️ Static assets not fingerprinted, serving /static/: {e}")
+    app.add_url_rule("/assets/<path:filename>", "assets", serve_asset)
+    app.jinja_env.globals["asset_url"] = asset_url
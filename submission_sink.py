@@ -0,0 +1,251 @@
+"""
+Write-behind Submission persistence.
+
+Instead of one INSERT + COMMIT per /run, submissions are buffered in
+memory and written as one multi-row insert when the buffer reaches
+``SUBMISSION_BATCH_SIZE`` rows or the oldest row is ``SUBMISSION_FLUSH_MS``
+old. The buffer is flushed on interpreter exit, which covers gunicorn's
+graceful worker shutdown; a hard kill loses at most one batch.
+
+A failed batch goes back into the buffer and is retried. After
+``SUBMISSION_MAX_RETRIES`` failures in a row the rows are written one at a
+time instead, and rows that still fail (e.g. their problem was deleted)
+are logged and dropped, so one bad row can't hold back the rest. While
+the database is down, the buffer keeps at most ``SUBMISSION_BUFFER_LIMIT``
+rows and drops the oldest.
+
+A passing row carries its progress update (progress.record_solve), which
+is written in the same transaction as the row, so a dropped row never
+leaves a problem marked solved without a submission behind it. Users read
+their solved status right back, so a passing row is flushed at once,
+together with whatever else is buffered; only failed runs wait for the
+next batch. ``SUBMISSION_SINK=sync`` restores one commit per submission.
+"""
+import atexit
+import os
+import threading
+import time
+import logging
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from models import db, Submission
+from code_store import make_blob, store_blobs
+import progress
+
+logger = logging.getLogger(__name__)
+
+SINK_MODE = os.getenv("SUBMISSION_SINK", "batch")  # "batch" or "sync"
+BATCH_SIZE = int(os.getenv("SUBMISSION_BATCH_SIZE", "100"))
+FLUSH_MS = int(os.getenv("SUBMISSION_FLUSH_MS", "500"))
+MAX_BUFFER = BATCH_SIZE * 20  # past this, writers flush inline (backpressure)
+MAX_RETRIES = int(os.getenv("SUBMISSION_MAX_RETRIES", "3"))  # failed batch writes before rows go one by one
+BUFFER_LIMIT = int(os.getenv("SUBMISSION_BUFFER_LIMIT", str(MAX_BUFFER * 5)))  # rows kept while writes fail
+
+
+class SubmissionSink:
+    def __init__(self, app, batch_size=BATCH_SIZE, flush_ms=FLUSH_MS):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._rows = []
+        self._oldest = None
+        self._pid = None
+        self._failed_flushes = 0  # consecutive failed batch writes
+
+        self.flushed_rows = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+        self.max_row_latency_ms = 0.0
+
+    def _ensure_started(self):
+        # gunicorn forks after import; each worker needs its own flusher
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._rows = []
+        self._oldest = None
+        threading.Thread(target=self._run, name="submission-sink", daemon=True).start()
+        atexit.register(self.flush)
+
+    def add(self, user_id, problem_id, code, status, timestamp, runtime_ms=None, memory_kb=None, language=None,
+            difficulty=None):
+        """Buffer a submission; a passing one is written now, with its progress (``difficulty`` buckets it)."""
+        digest, blob = make_blob(code)
+        with self._lock:
+            self._ensure_started()
+            self._rows.append(({
+                "user_id": user_id,
+                "problem_id": problem_id,
+                "code_hash": digest,
+                "status": status,
+                "timestamp": timestamp,
+                "runtime_ms": runtime_ms,
+                "memory_kb": memory_kb,
+                "language": language,
+            }, blob, difficulty))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._trim()
+            pending = len(self._rows)
+
+        if pending >= MAX_BUFFER or status == "passed":
+            self.flush()
+        elif pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            with self._lock:
+                due = self._rows and (
+                    len(self._rows) >= self.batch_size
+                    or time.monotonic() - self._oldest >= self.flush_interval
+                )
+            if due:
+                self.flush()
+
+    def flush(self):
+        """Write every buffered row now. Safe to call from any thread."""
+        with self._flush_lock:
+            with self._lock:
+                rows, oldest = self._rows, self._oldest
+                self._rows, self._oldest = [], None
+            if not rows:
+                return 0
+
+            start = time.monotonic()
+            try:
+                with self.app.app_context():
+                    for offset in range(0, len(rows), self.batch_size):
+                        _insert(rows[offset:offset + self.batch_size])
+                    db.session.commit()
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                    self._failed_flushes += 1
+                    retry = self._failed_flushes < MAX_RETRIES
+                    if retry:
+                        self._requeue(rows, oldest)
+                if retry:
+                    logger.error(f"Submission flush failed ({len(rows)} rows), will retry: {e}")
+                    return 0
+                logger.error(f"Submission flush failed {MAX_RETRIES} times ({len(rows)} rows), writing rows one by one: {e}")
+                written = self._write_each(rows, oldest)
+            else:
+                written = len(rows)
+
+            now = time.monotonic()
+            with self._lock:
+                self._failed_flushes = 0
+                self.flushed_rows += written
+                self.batches += 1
+                self.last_flush_ms = (now - start) * 1000
+                self.max_row_latency_ms = max(self.max_row_latency_ms, (now - oldest) * 1000)
+            return written
+
+    def _write_each(self, rows, oldest):
+        """Insert rows one per transaction, dropping those that fail. Returns the number written."""
+        written = 0
+        with self.app.app_context():
+            for position, entry in enumerate(rows):
+                row = entry[0]
+                try:
+                    _insert([entry])
+                    db.session.commit()
+                    written += 1
+                except OperationalError as e:
+                    # Database unreachable or locked: not this row's fault, keep the rest
+                    db.session.rollback()
+                    logger.error(f"Submission write failed, keeping {len(rows) - position} rows: {e}")
+                    with self._lock:
+                        self._requeue(rows[position:], oldest)
+                    break
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(
+                        f"Dropped submission (user {row['user_id']}, problem {row['problem_id']}): {e}"
+                    )
+                    with self._lock:
+                        self.dropped += 1
+        return written
+
+    def _requeue(self, rows, oldest):
+        """Put unwritten rows back in front. Caller holds the lock."""
+        self._rows = rows + self._rows
+        self._oldest = oldest
+        self._trim()
+
+    def _trim(self):
+        """Drop the oldest rows past BUFFER_LIMIT. Caller holds the lock."""
+        excess = len(self._rows) - BUFFER_LIMIT
+        if excess > 0:
+            del self._rows[:excess]
+            self.dropped += excess
+            logger.error(f"Submission buffer full, dropped the {excess} oldest rows")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": "batch",
+                "batch_size": self.batch_size,
+                "flush_ms": int(self.flush_interval * 1000),
+                "buffered": len(self._rows),
+                "flushed_rows": self.flushed_rows,
+                "batches": self.batches,
+                "avg_batch": round(self.flushed_rows / self.batches, 1) if self.batches else 0.0,
+                "last_flush_ms": round(self.last_flush_ms, 2),
+                "max_row_latency_ms": round(self.max_row_latency_ms, 2),
+                "failures": self.failures,
+                "dropped": self.dropped,
+            }
+
+
+def _insert(entries):
+    """Insert buffered ``(row, blob, difficulty)`` entries and the progress of passing ones."""
+    store_blobs([blob for _, blob, _ in entries])
+    db.session.execute(insert(Submission), [row for row, _, _ in entries])
+    for row, _, difficulty in entries:
+        if row["status"] == "passed":
+            progress.record_solve(row["user_id"], row["problem_id"], difficulty)
+
+
+class SyncSubmissionSink:
+    """One INSERT per submission, committed by the caller's transaction."""
+
+    def add(self, user_id, problem_id, code, status, timestamp, runtime_ms=None, memory_kb=None, language=None,
+            difficulty=None):
+        digest, blob = make_blob(code)
+        store_blobs([blob])
+        db.session.add(Submission(
+            user_id=user_id,
+            problem_id=problem_id,
+            code_hash=digest,
+            status=status,
+            timestamp=timestamp,
+            runtime_ms=runtime_ms,
+            memory_kb=memory_kb,
+            language=language
+        ))
+        if status == "passed":
+            progress.record_solve(user_id, problem_id, difficulty)
+
+    def flush(self):
+        return 0
+
+    def stats(self):
+        return {"mode": "sync"}
+
+
+def create_submission_sink(app):
+    if SINK_MODE == "sync":
+        return SyncSubmissionSink()
+    return SubmissionSink(app)
@@ -0,0 +1,70 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# Tests import the top-level modules (models, migrations, runner...) like the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules read their file locations at import, and test modules import them
+# while being collected: point them at a scratch directory before that
+SCRATCH = tempfile.mkdtemp(prefix="dynocode-tests-")
+atexit.register(shutil.rmtree, SCRATCH, ignore_errors=True)
+os.environ.update({
+    "ADMISSION_PATH": os.path.join(SCRATCH, "admission.db"),
+    "METRICS_DIR": os.path.join(SCRATCH, "metrics"),
+    "PROFILE_DIR": os.path.join(SCRATCH, "profiles"),
+    "STATIC_ASSET_DIR": os.path.join(SCRATCH, "assets"),
+    "RUNNER_BUNDLE_DIR": os.path.join(SCRATCH, "bundles"),
+    "RESULT_CACHE_PATH": "",
+})
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """A Flask app on an empty SQLite database, inside an app context."""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    import migrate_to_db
+
+    app = migrate_to_db.create_app()
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture(scope="session")
+def web(tmp_path_factory):
+    """The app.py module, imported once on a scratch SQLite database."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("DATABASE_URL", f"sqlite:///{tmp_path_factory.mktemp('web') / 'web.db'}")
+        import app as web
+
+        yield web
+
+
+@pytest.fixture
+def client(web):
+    """A logged-in test client for user "u" on fresh tables with problems p0..p2."""
+    from werkzeug.security import generate_password_hash
+    from catalog import catalog
+    from models import db, Problem, User
+
+    with web.app.app_context():
+        db.drop_all()
+        db.create_all()
+        for i, difficulty in enumerate(["Easy", "Medium", "Hard"]):
+            db.session.add(Problem(
+                id=f"p{i}", title=f"P{i}", difficulty=difficulty, tags=["t"], hints=["h"],
+                signature="def solve(a, b):\n    pass", description="Add two numbers.",
+                sample_input="1, 2", sample_output="3",
+                test_cases=[{"input": "1, 2", "output": "3"}, {"input": "2, 2", "output": "4"}],
+            ))
+        db.session.add(User(username="u", password_hash=generate_password_hash("p", method="pbkdf2:sha256")))
+        db.session.commit()
+        catalog.invalidate()
+
+    client = web.app.test_client()
+    client.post("/login", data={"username": "u", "password": "p"})
+    return client
@@ -0,0 +1,63 @@
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+@pytest.fixture
+def controller(tmp_path):
+    return AdmissionController(rate_per_minute=6, burst=2, max_in_flight=3, path=str(tmp_path / "admission.db"))
+
+
+def test_burst_then_retry_after_the_refill(controller):
+    controller.admit(1, lambda: 0)
+    controller.admit(1, lambda: 0)
+    with pytest.raises(Overloaded) as e:
+        controller.admit(1, lambda: 0)
+    assert e.value.retry_after == 10  # one token per 10s at 6/minute
+    controller.admit(2, lambda: 0)  # buckets are per user
+
+
+def test_in_flight_cap(controller):
+    with pytest.raises(Overloaded) as e:
+        controller.admit(1, lambda: 3)
+    assert e.value.retry_after == 2
+    assert controller.stats({"queued": 3, "running": 0})["overloaded"] == 1
+
+
+def test_refund_returns_the_token(controller):
+    controller.admit(1, lambda: 0)
+    controller.admit(1, lambda: 0)
+    controller.refund(1)
+    controller.admit(1, lambda: 0)
+    assert controller.stats({"queued": 0, "running": 0})["refunded"] == 1
+
+
+@pytest.fixture
+def one_run_per_minute(web, monkeypatch):
+    monkeypatch.setattr(web.admission, "rate", 1 / 60)
+    monkeypatch.setattr(web.admission, "burst", 1)
+    web.admission._db().execute("DELETE FROM buckets")
+
+
+RUN = {"problem_id": "p0", "code": "def solve(a, b):\n    return a + b"}
+
+
+def test_run_answers_429_with_retry_after(web, client, one_run_per_minute, monkeypatch):
+    monkeypatch.setattr(web.job_queue, "submit", lambda *args: "job1")
+    assert client.post("/run", json=RUN).status_code == 202
+
+    response = client.post("/run", json=RUN)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
+    assert response.get_json()["retry_after"] == 60
+
+
+def test_failed_enqueue_costs_no_token(web, client, one_run_per_minute, monkeypatch):
+    def broken_queue(*args):
+        raise RuntimeError("queue unavailable")
+
+    monkeypatch.setattr(web.job_queue, "submit", broken_queue)
+    assert client.post("/run", json=RUN).get_json()["passed"] is False
+
+    monkeypatch.setattr(web.job_queue, "submit", lambda *args: "job1")
+    assert client.post("/run", json=RUN).status_code == 202
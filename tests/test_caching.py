@@ -0,0 +1,55 @@
+import gzip
+import os
+
+from models import User
+
+
+def test_problem_revalidates_with_304(client):
+    first = client.get("/api/problem/p0")
+    assert first.status_code == 200
+    assert first.get_json()["id"] == "p0"
+    etag = first.headers["ETag"]
+
+    again = client.get("/api/problem/p0", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+    assert client.get("/api/problem/p1", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_sidebar_etag_changes_after_a_solve(web, client):
+    before = client.get("/api/sidebar")
+    etag = before.headers["ETag"]
+    assert client.get("/api/sidebar", headers={"If-None-Match": etag}).status_code == 304
+
+    with web.app.app_context():
+        user_id = User.query.filter_by(username="u").one().id
+        result = web.execute_run(user_id, "p0", "def solve(a, b):\n    return a + b", None, "python")
+    assert result["passed"]
+
+    after = client.get("/api/sidebar", headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != etag
+    solved = {p["id"] for group in after.get_json()["groups"] for p in group["problems"] if p["solved"]}
+    assert solved == {"p0"}
+
+
+def test_assets_are_fingerprinted_and_gzipped_on_request(web, client):
+    with web.app.test_request_context():
+        url = web.static_assets.asset_url("style.css")
+    assert url.startswith("/assets/style.") and url.endswith(".css")
+    with open(os.path.join(web.app.static_folder, "style.css"), "rb") as f:
+        source = f.read()
+
+    packed = client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+    assert packed.status_code == 200
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(packed.data) == source
+    assert "immutable" in packed.headers["Cache-Control"]
+    assert "Accept-Encoding" in packed.headers["Vary"]
+
+    plain = client.get(url)
+    assert "Content-Encoding" not in plain.headers
+    assert plain.data == source
+
+    assert client.get("/assets/style.css.gz").status_code == 404
@@ -0,0 +1,13 @@
+from runner.checker import values_match
+
+
+def test_unordered_with_tolerance_pairs_near_equal_numbers():
+    assert values_match([9.9999999, 5], [10.0, 5], tolerance=1e-6, unordered=True)
+    assert values_match([5, 9.9999999], [10.0, 5], tolerance=1e-6, unordered=True)
+    assert not values_match([9.9, 5], [10.0, 5], tolerance=1e-6, unordered=True)
+
+
+def test_unordered_with_tolerance_matches_nested_items():
+    assert values_match([[9.9999999, 1], [2, 3]], [[3, 2], [1, 10.0]], tolerance=1e-6, unordered=True)
+    assert values_match({"a": [2, 1.0000001]}, {"a": [1, 2]}, tolerance=1e-6, unordered=True)
+    assert not values_match([[1.0], [1.0]], [[1.0], [2.0]], tolerance=1e-6, unordered=True)
@@ -0,0 +1,162 @@
+import shutil
+import uuid
+
+import pytest
+
+from runner import code_runner
+
+PROBLEM = {
+    "id": "sum",
+    "test_cases": [{"input": "[1, 2, 3], 2", "output": "8"}, {"input": "[5], 0", "output": "5"}],
+    "time_limit_ms": 1000,
+    "memory_limit_mb": 64,
+}
+
+TOOLCHAINS = {"cpp": "g++", "js": "node", "go": "go"}
+
+PROGRAMS = {
+    "cpp": {
+        "ok": """#include <bits/stdc++.h>
+using namespace std;
+int main() {
+    string xs; long long k, x, s = 0;
+    getline(cin, xs); cin >> k;
+    for (char &c : xs) if (c == '[' || c == ']' || c == ',') c = ' ';
+    stringstream ss(xs);
+    while (ss >> x) s += x;
+    cout << s + k << endl;
+}
+""",
+        "compile_error": "int main( { return 0; }\n",
+        "tle": "int main() { volatile long long i = 0; while (1) i++; }\n",
+        # Far past the limit, so RLIMIT_AS makes the allocation itself fail
+        "mle": "#include <vector>\nint main() { std::vector<char> v(512u << 20, 1); return v[10]; }\n",
+        "wrong": "#include <cstdio>\nint main() { puts(\"7\"); }\n",
+    },
+    "js": {
+        "ok": """const args = require("fs").readFileSync(0, "utf8").trim().split("\\n").map(JSON.parse);
+console.log(JSON.stringify(args[0].reduce((a, b) => a + b, 0) + args[1]));
+""",
+        "compile_error": "function (\n",
+        "tle": "while (true) {}\n",
+        "mle": "const a = []; while (true) a.push(new Array(1e6).fill(1));\n",
+        "wrong": "console.log(7);\n",
+    },
+    "go": {
+        "ok": """package main
+
+import (
+	"bufio"
+	"encoding/json"
+	"fmt"
+	"os"
+)
+
+func main() {
+	scanner := bufio.NewScanner(os.Stdin)
+	var xs []int
+	var k int
+	scanner.Scan()
+	json.Unmarshal(scanner.Bytes(), &xs)
+	scanner.Scan()
+	json.Unmarshal(scanner.Bytes(), &k)
+	for _, x := range xs {
+		k += x
+	}
+	fmt.Println(k)
+}
+""",
+        "compile_error": "package main\n\nfunc main() { x := 1 }\n",
+        "tle": "package main\n\nfunc main() {\n\tfor {\n\t}\n}\n",
+        # Keeps every chunk alive, so only the RLIMIT_AS cap behind GOMEMLIMIT stops it
+        "mle": """package main
+
+func main() {
+	var chunks [][]byte
+	for i := 0; i < 64; i++ {
+		chunk := make([]byte, 8<<20)
+		for j := range chunk {
+			chunk[j] = 1
+		}
+		chunks = append(chunks, chunk)
+	}
+	println(len(chunks))
+}
+""",
+        "wrong": "package main\n\nimport \"fmt\"\n\nfunc main() { fmt.Println(7) }\n",
+    },
+}
+
+
+def languages_with(program):
+    return [
+        pytest.param(language, marks=pytest.mark.skipif(
+            shutil.which(TOOLCHAINS[language]) is None, reason=f"{TOOLCHAINS[language]} is not on PATH"))
+        for language, programs in PROGRAMS.items() if program in programs
+    ]
+
+
+@pytest.fixture(scope="module")
+def artifact_dir(tmp_path_factory):
+    # One cache for the module, so Go builds its standard library once
+    return tmp_path_factory.mktemp("artifacts")
+
+
+@pytest.fixture(autouse=True)
+def artifacts(artifact_dir, monkeypatch):
+    # Read by the harness process at import
+    monkeypatch.setenv("RUNNER_ARTIFACT_DIR", str(artifact_dir))
+
+
+def evaluate(language, program, source=None):
+    compiled = {}
+    passed, details = code_runner.evaluate_code(
+        source or PROGRAMS[language][program], PROBLEM, language=language, on_compile=compiled.update
+    )
+    return passed, details, compiled
+
+
+@pytest.mark.parametrize("language", languages_with("ok"))
+def test_compiles_once_and_reuses_the_artifact(language):
+    # A fresh source, so the first run is a real build
+    source = PROGRAMS[language]["ok"] + f"// {uuid.uuid4().hex}\n"
+
+    passed, details, compiled = evaluate(language, "ok", source)
+    assert passed, details
+    assert compiled["cached"] is False
+
+    passed, details, compiled = evaluate(language, "ok", source)
+    assert passed, details
+    assert compiled == {"compile_ms": 0.0, "cached": True}
+
+
+@pytest.mark.parametrize("language", languages_with("compile_error"))
+def test_compile_error(language):
+    passed, details, compiled = evaluate(language, "compile_error")
+    assert not passed
+    assert compiled == {}
+    assert [d["verdict"] for d in details] == ["compile_error"]
+
+
+@pytest.mark.parametrize("language", languages_with("tle"))
+def test_time_limit(language):
+    passed, details, _ = evaluate(language, "tle")
+    assert not passed
+    assert details[0]["verdict"] == "time_limit"
+
+
+@pytest.mark.parametrize("language", languages_with("mle"))
+def test_memory_limit(language):
+    passed, details, _ = evaluate(language, "mle")
+    assert not passed
+    assert details[0]["verdict"] == "memory_limit"
+    # Stopped by the cap, not measured afterwards: each program asks for 512 MB
+    assert details[0]["memory_kb"] < 256 * 1024, details
+
+
+@pytest.mark.parametrize("language", languages_with("wrong"))
+def test_wrong_answer(language):
+    passed, details, _ = evaluate(language, "wrong")
+    assert not passed
+    assert details[0]["status"] == "failed"
+    assert details[0]["got"] == "7"
@@ -0,0 +1,29 @@
+import threading
+
+from runner import code_runner
+
+# Cases 1-4 are slow, case 5 fails at once: its shard cancels the first
+# shard before that one reports anything.
+CODE = """import time
+
+def solve(x):
+    if x < 5:
+        time.sleep(0.3)
+    return x
+"""
+PROBLEM = {
+    "id": "gaps",
+    "test_cases": [{"input": str(x), "output": str(x if x != 5 else -1)} for x in range(1, 9)],
+}
+
+
+def test_cancelled_shards_leave_no_gaps(monkeypatch):
+    monkeypatch.setattr(code_runner, "RUNNER_MODE", "batch")
+    monkeypatch.setattr(code_runner, "RUNNER_PARALLELISM", 2)
+    monkeypatch.setattr(code_runner, "_extra_shards", threading.BoundedSemaphore(1))
+
+    passed, details = code_runner.evaluate_code(CODE, PROBLEM)
+
+    assert not passed
+    assert [d["index"] for d in details] == [1, 2, 3, 4, 5]
+    assert [d["status"] for d in details] == ["passed"] * 4 + ["failed"]
@@ -0,0 +1,21 @@
+from runner.precheck import precheck
+
+PROBLEM = {"function_signature": "def solve(a, b):\n    pass"}
+
+
+def test_wrong_arity_is_rejected():
+    detail = precheck("def solve(a):\n    return a", PROBLEM)
+    assert detail["verdict"] == "signature_error"
+    assert "takes 1 argument(s) but this problem passes 2" in detail["error"]
+
+
+def test_decorated_solve_is_left_to_the_runner():
+    code = (
+        "def star(f):\n"
+        "    return lambda *a: f(a)\n"
+        "\n"
+        "@star\n"
+        "def solve(args):\n"
+        "    return sum(args)\n"
+    )
+    assert precheck(code, PROBLEM) is None
@@ -0,0 +1,33 @@
+from sqlalchemy import inspect, text
+
+import migrations
+from models import db
+
+
+def test_hot_queries_use_their_indexes(app):
+    migrations.upgrade()
+    assert migrations.check_query_plans() == []
+
+
+def test_check_reports_a_missing_index(app):
+    migrations.upgrade()
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_submissions_user_problem_passed"))
+
+    failures = migrations.check_query_plans()
+    assert [label for label, _, _ in failures] == ["progress backfill"]
+
+
+def test_unused_submission_indexes_are_dropped(app):
+    migrations.upgrade()
+    # A database from before migration 9
+    with db.engine.begin() as conn:
+        conn.execute(text("CREATE INDEX ix_submissions_user_timestamp ON submissions (user_id, timestamp)"))
+        conn.execute(text("CREATE INDEX ix_submissions_problem_status ON submissions (problem_id, status)"))
+        conn.execute(text("DELETE FROM schema_migrations WHERE version = 9"))
+
+    migrations.upgrade()
+
+    indexes = {ix["name"] for ix in inspect(db.engine).get_indexes("submissions")}
+    assert "ix_submissions_user_problem_passed" in indexes
+    assert not indexes & {"ix_submissions_user_timestamp", "ix_submissions_problem_status"}
@@ -0,0 +1,16 @@
+import socket
+import threading
+
+from runner.remote import DATA, recv_frame, send_frame
+
+
+def test_large_frames_arrive_whole():
+    payload = bytes(range(256)) * 40000  # ~10 MB, many recv() calls
+    left, right = socket.socketpair()
+    with left, right:
+        sender = threading.Thread(target=send_frame, args=(left, DATA, payload))
+        sender.start()
+        assert recv_frame(right) == (DATA, payload)
+        sender.join()
+        left.close()
+        assert recv_frame(right) is None
@@ -0,0 +1,34 @@
+from runner import code_runner
+from runner.result_cache import ResultCache
+
+PASSED = [{"index": 1, "status": "passed"}]
+
+
+def problem(version=1, **extra):
+    return dict({"id": "p0", "updated_at": f"v{version}", "test_cases": [{"input": "1", "output": "1"}]}, **extra)
+
+
+def test_verdict_is_served_for_identical_code():
+    cache = ResultCache(size=8, path="")
+    cache.put("def solve(x):\n    return x\n", problem(), True, PASSED)
+    assert cache.get("def solve(x):\r\n    return x", problem()) == (True, PASSED)
+    assert cache.get("def solve(x):\n    return x", problem(version=2)) is None
+
+
+def test_default_limits_are_part_of_the_key(monkeypatch):
+    cache = ResultCache(size=8, path="")
+    cache.put("code", problem(), True, PASSED)
+
+    monkeypatch.setattr(code_runner, "DEFAULT_TIME_LIMIT_MS", code_runner.DEFAULT_TIME_LIMIT_MS * 2)
+    assert cache.get("code", problem()) is None
+    # A problem's own limits don't depend on the defaults
+    cache.put("code", problem(time_limit_ms=500, memory_limit_mb=64), True, PASSED)
+    monkeypatch.undo()
+    assert cache.get("code", problem(time_limit_ms=500, memory_limit_mb=64)) == (True, PASSED)
+
+
+def test_test_case_hashes_are_bounded():
+    cache = ResultCache(size=4, path="")
+    for version in range(50):
+        cache.key("code", problem(version))
+    assert len(cache._tests_hashes) == 4
@@ -0,0 +1,40 @@
+import jobs
+from models import db, RunJob, User
+
+
+def add_finished_job(web):
+    with web.app.app_context():
+        user = User.query.filter_by(username="u").one()
+        db.session.add(RunJob(
+            id="job1", user_id=user.id, problem_id="p0", code="", status="done",
+            progress=[{"status": "passed"}], result={"passed": True, "details": [{"status": "passed"}]},
+        ))
+        db.session.commit()
+
+
+def test_stream_sends_cases_then_summary_and_frees_its_slot(web, client):
+    add_finished_job(web)
+    with client.get("/run/job1/events") as response:
+        body = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert body.index("event: case") < body.index("event: summary")
+    assert jobs.stream_slots.open == 0
+
+
+def test_streams_past_the_limit_are_refused(web, client, monkeypatch):
+    add_finished_job(web)
+    monkeypatch.setattr(jobs.stream_slots, "limit", 1)
+    assert jobs.stream_slots.acquire()
+    try:
+        response = client.get("/run/job1/events")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        # Polling still answers
+        assert client.get("/run/job1").get_json()["passed"] is True
+    finally:
+        jobs.stream_slots.release()
+
+
+def test_unknown_job_frees_its_slot(client):
+    assert client.get("/run/nope/events").status_code == 404
+    assert jobs.stream_slots.open == 0
@@ -0,0 +1,67 @@
+import math
+import random
+
+from runner import harness
+from runner.stress import judge
+
+SIZES = [1000, 2000, 4000, 8000, 16000]
+
+
+def timings(f, noise=0.0, seed=1):
+    rng = random.Random(seed)
+    return [(n, (2 + f(n)) * (1 + rng.uniform(-noise, noise))) for n in SIZES]
+
+
+def linear(n):
+    return n / 200
+
+
+def n_log_n(n):
+    return n * math.log2(n) / 2000
+
+
+def quadratic(n):
+    return n * n / 2e6
+
+
+def test_linear_timings_pass_as_linear():
+    result = judge(timings(linear), "n")
+    assert result["ok"]
+    assert result["measured"] == "O(n)"
+
+
+def test_quadratic_timings_fail_a_linear_expectation():
+    result = judge(timings(quadratic), "n")
+    assert not result["ok"]
+    assert result["measured"] == "O(n²)"
+    assert result["message"] == "Looks O(n²), expected O(n)"
+
+
+def test_noise_does_not_fail_a_correct_solution():
+    for seed in range(20):
+        assert judge(timings(linear, noise=0.15, seed=seed), "n")["ok"]
+        assert judge(timings(n_log_n, noise=0.15, seed=seed), "n log n")["ok"]
+
+
+def test_noise_does_not_hide_a_quadratic_solution():
+    for seed in range(20):
+        assert not judge(timings(quadratic, noise=0.15, seed=seed), "n")["ok"]
+
+
+def test_close_classes_are_not_failed():
+    assert judge(timings(n_log_n), "n")["ok"]
+
+
+def test_timings_too_small_give_no_verdict():
+    result = judge([(n, 0.5) for n in SIZES], "1")
+    assert result["ok"]
+    assert result["measured"] is None
+
+
+def test_source_inputs_are_parsed_before_the_clock_starts():
+    events = []
+    big = repr(list(range(300000)))  # ~0.1s to parse
+    harness.run_job({"code": "def solve(xs):\n    return len(xs)", "cases": [big]}, events.append)
+    case = events[-1]
+    assert case["status"] == "ok" and case["result"] == 300000
+    assert case["cpu_ms"] < 20
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import migrations
+import submission_sink
+from models import db, Problem, Submission, User, UserProgress
+from submission_sink import SubmissionSink
+
+
+@pytest.fixture
+def user_id(app):
+    migrations.upgrade()
+    for i in range(4):
+        db.session.add(Problem(id=f"p{i}", title=f"P{i}", difficulty="Easy"))
+    user = User(username="u", password_hash="x")
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def saved(user_id):
+    db.session.rollback()  # see the sink's commits
+    submissions = sorted((s.problem_id, s.status) for s in Submission.query.filter_by(user_id=user_id))
+    solved = sorted(p.problem_id for p in UserProgress.query.filter_by(user_id=user_id))
+    return submissions, solved
+
+
+def test_bad_row_is_dropped_after_retries(app, user_id, monkeypatch):
+    monkeypatch.setattr(submission_sink, "MAX_RETRIES", 2)
+    sink = SubmissionSink(app, flush_ms=60000)
+    sink.add(user_id, "p0", "a", "failed", datetime.utcnow())
+    sink.add(user_id, "p1", "b", None, datetime.utcnow())  # violates NOT NULL
+    sink.add(user_id, "p2", "c", "passed", datetime.utcnow(), difficulty="Easy")  # flushes: fails once
+
+    assert sink.stats()["buffered"] == 3
+    assert sink.flush() == 2  # second failure: written one by one
+    assert sink.stats()["dropped"] == 1
+    assert saved(user_id) == ([("p0", "failed"), ("p2", "passed")], ["p2"])
+
+
+def test_full_buffer_drops_oldest_rows_with_their_progress(app, user_id, monkeypatch):
+    monkeypatch.setattr(submission_sink, "BUFFER_LIMIT", 2)
+    monkeypatch.setattr(submission_sink, "MAX_RETRIES", 100)
+    insert = submission_sink._insert
+
+    def database_down(entries):
+        raise OperationalError("INSERT", {}, Exception("database is down"))
+
+    monkeypatch.setattr(submission_sink, "_insert", database_down)
+    sink = SubmissionSink(app, flush_ms=60000)
+    for i in range(4):
+        sink.add(user_id, f"p{i}", str(i), "passed", datetime.utcnow(), difficulty="Easy")
+    assert sink.stats()["buffered"] == 2
+    assert sink.stats()["dropped"] == 2
+
+    monkeypatch.setattr(submission_sink, "_insert", insert)
+    assert sink.flush() == 2
+    assert saved(user_id) == ([("p2", "passed"), ("p3", "passed")], ["p2", "p3"])
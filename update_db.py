@@ -1,8 +1,8 @@
-from app import app, db
-from models import User, Submission
+from app import app
+import migrations
 
 # Context ensures app config is loaded
 with app.app_context():
     print("Updating database schema...")
-    db.create_all()
-    print("Database schema updated! 'submissions' table created.")
+    count = migrations.upgrade()
+    print(f"Database schema updated! ({count} migrations applied)")